@@ -2,15 +2,15 @@ from __future__ import annotations
 import os
 from decimal import Decimal
 from enum import Enum
-from typing import List, Tuple, Dict, Callable, Any, Deque, Type, Iterator, Iterable, Optional
+from typing import List, Tuple, Dict, Callable, Any, Deque, Type, Iterator, Iterable, Optional, Set
 from abc import ABC, abstractmethod
 import hashlib
 import json
 from datetime import datetime, timedelta, date
 import time
-from threading import Semaphore, Lock
-from collections import deque
-from itertools import cycle, chain, repeat, groupby
+from threading import Semaphore, Lock, Thread, Condition, current_thread
+from collections import deque, OrderedDict, Counter
+from itertools import cycle, chain, repeat, groupby, compress, islice
 from timeit import default_timer
 import subprocess
 import re
@@ -21,6 +21,37 @@ import random
 import base64
 import io
 import pathlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, Executor, Future
+import heapq
+import bisect
+import asyncio
+import struct
+import mmap
+import marshal
+import pickle
+import zlib
+import lzma
+import bz2
+import functools
+import array
+import socket
+import stat
+import logging
+try:
+    import numpy
+except ImportError:
+    numpy = None
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+logger = logging.getLogger(__name__)
 
 
 class StringEnum(Enum):
@@ -189,232 +220,1695 @@ class DateTimeDeltaCalculator():
             raise NotImplementedError()
 
 
+class DependencyMatchingPolicyTypeEnum(StringEnum):
+    Fifo = "fifo"
+    Priority = "priority"
+    WeightedRoundRobin = "weighted_round_robin"
+    LeastRecentlyUsed = "least_recently_used"
+
+
+class DependencyMatchingPolicy(ABC):
+
+    @classmethod
+    @abstractmethod
+    def get_policy_type(cls) -> DependencyMatchingPolicyTypeEnum:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def add(self, *, item: Any, weight: int):
+        raise NotImplementedError()
+
+    @abstractmethod
+    def take(self, *, is_reusable: bool) -> Any:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def try_remove(self, *, is_match_method: Callable[[Any], bool]) -> Tuple[bool, Any]:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def compact(self, *, is_waiting_method: Callable[[Any], bool]):
+        raise NotImplementedError()
+
+    @abstractmethod
+    def __len__(self) -> int:
+        raise NotImplementedError()
+
+
+def _try_remove_from_heap(*, heap: List[Tuple[int, int, Any]], is_match_method: Callable[[Any], bool]) -> Tuple[bool, Any]:
+    # the item is always last in each heap entry, after the values that order the heap
+    for entry_index, entry in enumerate(heap):
+        if is_match_method(entry[-1]):
+            heap[entry_index] = heap[-1]
+            heap.pop()
+            heapq.heapify(heap)
+            return True, entry[-1]
+    return False, None
+
+
+class FifoDependencyMatchingPolicy(DependencyMatchingPolicy):
+
+    def __init__(self):
+        self.__items = deque()  # type: Deque[Any]
+
+    @classmethod
+    def get_policy_type(cls) -> DependencyMatchingPolicyTypeEnum:
+        return DependencyMatchingPolicyTypeEnum.Fifo
+
+    def add(self, *, item: Any, weight: int):
+        self.__items.append(item)
+
+    def take(self, *, is_reusable: bool) -> Any:
+        item = self.__items.popleft()
+        if is_reusable:
+            self.__items.append(item)
+        return item
+
+    def try_remove(self, *, is_match_method: Callable[[Any], bool]) -> Tuple[bool, Any]:
+        for item_index, item in enumerate(self.__items):
+            if is_match_method(item):
+                del self.__items[item_index]
+                return True, item
+        return False, None
+
+    def compact(self, *, is_waiting_method: Callable[[Any], bool]):
+        self.__items = deque(item for item in self.__items if is_waiting_method(item))
+
+    def __len__(self) -> int:
+        return len(self.__items)
+
+
+class PriorityDependencyMatchingPolicy(DependencyMatchingPolicy):
+
+    def __init__(self):
+        # the highest weight is taken first and equal weights are taken in the order that they were added
+        self.__heap = []  # type: List[Tuple[int, int, Any]]
+        self.__sequence_index = 0
+
+    @classmethod
+    def get_policy_type(cls) -> DependencyMatchingPolicyTypeEnum:
+        return DependencyMatchingPolicyTypeEnum.Priority
+
+    def add(self, *, item: Any, weight: int):
+        heapq.heappush(self.__heap, (-weight, self.__sequence_index, item))
+        self.__sequence_index += 1
+
+    def take(self, *, is_reusable: bool) -> Any:
+        negative_weight, _, item = heapq.heappop(self.__heap)
+        if is_reusable:
+            self.add(
+                item=item,
+                weight=-negative_weight
+            )
+        return item
+
+    def try_remove(self, *, is_match_method: Callable[[Any], bool]) -> Tuple[bool, Any]:
+        return _try_remove_from_heap(
+            heap=self.__heap,
+            is_match_method=is_match_method
+        )
+
+    def compact(self, *, is_waiting_method: Callable[[Any], bool]):
+        self.__heap = [entry for entry in self.__heap if is_waiting_method(entry[-1])]
+        heapq.heapify(self.__heap)
+
+    def __len__(self) -> int:
+        return len(self.__heap)
+
+
+class WeightedRoundRobinDependencyMatchingPolicy(DependencyMatchingPolicy):
+
+    def __init__(self):
+        # smooth weighted round robin spreads the turns of a heavy item between the turns of the others instead of taking it several times in a row
+        self.__entries = []  # type: List[List]
+        self.__weight_total = 0
+
+    @classmethod
+    def get_policy_type(cls) -> DependencyMatchingPolicyTypeEnum:
+        return DependencyMatchingPolicyTypeEnum.WeightedRoundRobin
+
+    def add(self, *, item: Any, weight: int):
+        if weight <= 0:
+            raise Exception(f"Weight must be positive for {DependencyMatchingPolicyTypeEnum.WeightedRoundRobin.value} but was {weight}.")
+        self.__entries.append([item, weight, 0])
+        self.__weight_total += weight
+
+    def take(self, *, is_reusable: bool) -> Any:
+        selected_entry_index = None
+        for entry_index, entry in enumerate(self.__entries):
+            entry[2] += entry[1]
+            if selected_entry_index is None or entry[2] > self.__entries[selected_entry_index][2]:
+                selected_entry_index = entry_index
+        selected_entry = self.__entries[selected_entry_index]
+        selected_entry[2] -= self.__weight_total
+        if not is_reusable:
+            del self.__entries[selected_entry_index]
+            self.__weight_total -= selected_entry[1]
+        return selected_entry[0]
+
+    def try_remove(self, *, is_match_method: Callable[[Any], bool]) -> Tuple[bool, Any]:
+        for entry_index, entry in enumerate(self.__entries):
+            if is_match_method(entry[0]):
+                del self.__entries[entry_index]
+                self.__weight_total -= entry[1]
+                return True, entry[0]
+        return False, None
+
+    def compact(self, *, is_waiting_method: Callable[[Any], bool]):
+        self.__entries = [entry for entry in self.__entries if is_waiting_method(entry[0])]
+        self.__weight_total = sum(entry[1] for entry in self.__entries)
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+
+class LeastRecentlyUsedDependencyMatchingPolicy(DependencyMatchingPolicy):
+
+    def __init__(self):
+        # items that were never taken are the least recently used, in the order that they were added
+        self.__heap = []  # type: List[Tuple[int, int, Any]]
+        self.__sequence_index = 0
+        self.__taken_index = 0
+
+    @classmethod
+    def get_policy_type(cls) -> DependencyMatchingPolicyTypeEnum:
+        return DependencyMatchingPolicyTypeEnum.LeastRecentlyUsed
+
+    def add(self, *, item: Any, weight: int):
+        heapq.heappush(self.__heap, (0, self.__sequence_index, item))
+        self.__sequence_index += 1
+
+    def take(self, *, is_reusable: bool) -> Any:
+        _, sequence_index, item = heapq.heappop(self.__heap)
+        if is_reusable:
+            self.__taken_index += 1
+            heapq.heappush(self.__heap, (self.__taken_index, sequence_index, item))
+        return item
+
+    def try_remove(self, *, is_match_method: Callable[[Any], bool]) -> Tuple[bool, Any]:
+        return _try_remove_from_heap(
+            heap=self.__heap,
+            is_match_method=is_match_method
+        )
+
+    def compact(self, *, is_waiting_method: Callable[[Any], bool]):
+        self.__heap = [entry for entry in self.__heap if is_waiting_method(entry[-1])]
+        heapq.heapify(self.__heap)
+
+    def __len__(self) -> int:
+        return len(self.__heap)
+
+
+def get_dependency_matching_policy_class(*, policy_type: DependencyMatchingPolicyTypeEnum) -> Type[DependencyMatchingPolicy]:
+    # the class is found once per manager since a policy is created for each key that has waiting items
+    for policy_class in get_subclasses(cls=DependencyMatchingPolicy, include_children=True):
+        if policy_class.get_policy_type() == policy_type:
+            return policy_class
+    raise Exception(f"Unexpected {DependencyMatchingPolicyTypeEnum.__name__} value {policy_type}.")
+
+
+class DeadlineScheduler():
+
+    def __init__(self):
+
+        # each entry is a list holding the callback so that cancelling an entry only has to clear it instead of finding it in the heap
+        self.__heap = []  # type: List[Tuple[float, int, List[Optional[Callable[[], None]]]]]
+        self.__sequence_index = 0
+        self.__cancelled_total = 0
+        self.__condition = Condition()
+        self.__thread = None  # type: Thread
+        self.__is_disposed = False
+
+    def __run(self):
+        while True:
+            on_deadline_callbacks = []  # type: List[Callable[[], None]]
+            with self.__condition:
+                while not self.__is_disposed and not on_deadline_callbacks:
+                    now = time.monotonic()
+                    while self.__heap and self.__heap[0][0] <= now:
+                        _, _, entry = heapq.heappop(self.__heap)
+                        if entry[0] is None:
+                            self.__cancelled_total -= 1
+                        else:
+                            on_deadline_callbacks.append(entry[0])
+                            entry[0] = None
+                    if not on_deadline_callbacks:
+                        self.__condition.wait(
+                            timeout=self.__heap[0][0] - now if self.__heap else None
+                        )
+                if self.__is_disposed:
+                    return
+            # the callbacks are called outside of the lock so that they can schedule and cancel other deadlines
+            for on_deadline_callback in on_deadline_callbacks:
+                # a failing callback is only logged, since ending the thread would stop every later deadline
+                try:
+                    on_deadline_callback()
+                except Exception:
+                    logger.exception("Deadline callback failed.")
+
+    def schedule(self, *, timeout_seconds: float, on_deadline_callback: Callable[[], None]) -> List[Optional[Callable[[], None]]]:
+        entry = [on_deadline_callback]
+        with self.__condition:
+            if self.__is_disposed:
+                raise Exception("Cannot schedule a deadline after the scheduler is disposed.")
+            heapq.heappush(self.__heap, (time.monotonic() + timeout_seconds, self.__sequence_index, entry))
+            self.__sequence_index += 1
+            if self.__thread is None:
+                self.__thread = Thread(
+                    target=self.__run,
+                    daemon=True
+                )
+                self.__thread.start()
+            self.__condition.notify()
+        return entry
+
+    def cancel(self, *, entry: List[Optional[Callable[[], None]]]) -> bool:
+        with self.__condition:
+            if entry[0] is None:
+                return False
+            entry[0] = None
+            self.__cancelled_total += 1
+            # cancelled entries are removed once they are the majority so that abandoned deadlines do not hold memory until they would have expired
+            if self.__cancelled_total * 2 > len(self.__heap):
+                self.__heap = [heap_entry for heap_entry in self.__heap if heap_entry[2][0] is not None]
+                heapq.heapify(self.__heap)
+                self.__cancelled_total = 0
+            return True
+
+    def get_scheduled_total(self) -> int:
+        with self.__condition:
+            return len(self.__heap) - self.__cancelled_total
+
+    def dispose(self):
+        with self.__condition:
+            self.__is_disposed = True
+            self.__condition.notify()
+        if self.__thread is not None and self.__thread is not current_thread():
+            self.__thread.join()
+
+
+class DependentDeadline():
+
+    def __init__(self, *, dependent: Any):
+        self.__dependent = dependent
+
+        self.__deadline_entry = None  # type: List[Optional[Callable[[], None]]]
+        # this is only changed while the stripe of the key is locked
+        self.__is_waiting = True
+
+    def get_dependent(self) -> Any:
+        return self.__dependent
+
+    def is_waiting(self) -> bool:
+        return self.__is_waiting
+
+    def stop_waiting(self):
+        self.__is_waiting = False
+
+    def get_deadline_entry(self) -> List[Optional[Callable[[], None]]]:
+        return self.__deadline_entry
+
+    def set_deadline_entry(self, *, deadline_entry: List[Optional[Callable[[], None]]]):
+        self.__deadline_entry = deadline_entry
+
+
 class SingleDependentDependencyManager():
 
-    def __init__(self, *, on_dependent_dependency_satisfied_callback: Callable[[Any, Any, Any], None], is_dependency_reusable: bool):
+    def __init__(self, *, on_dependent_dependency_satisfied_callback: Callable[[Any, Any, Any], None], is_dependency_reusable: bool, stripes_total: int = 16, on_dependent_dependency_batch_satisfied_callback: Callable[[List[Tuple[Any, Any, Any]]], None] = None, dependent_policy_type: DependencyMatchingPolicyTypeEnum = None, dependency_policy_type: DependencyMatchingPolicyTypeEnum = None, on_dependent_expired_callback: Callable[[Any, Any], None] = None, is_dependent_waiting_method: Callable[[Any], bool] = None):
 
         self.__on_dependent_dependency_satisfied_callback = on_dependent_dependency_satisfied_callback
         self.__is_dependency_reusable = is_dependency_reusable
+        self.__stripes_total = stripes_total
+        self.__on_dependent_dependency_batch_satisfied_callback = on_dependent_dependency_batch_satisfied_callback
+        self.__on_dependent_expired_callback = on_dependent_expired_callback
+        # dependents that stop waiting are left where they are and skipped when they are taken, so stopping a dependent does not search the dependents of its key
+        self.__is_dependent_waiting_method = is_dependent_waiting_method
+
+        # a dependent with a timeout waits as a DependentDeadline so that it can be found and removed when its deadline passes
+        self.__deadline_scheduler = DeadlineScheduler()
+
+        self.__dependent_policy_class = get_dependency_matching_policy_class(
+            policy_type=DependencyMatchingPolicyTypeEnum.Fifo if dependent_policy_type is None else dependent_policy_type
+        )
+        self.__dependency_policy_class = get_dependency_matching_policy_class(
+            policy_type=DependencyMatchingPolicyTypeEnum.Fifo if dependency_policy_type is None else dependency_policy_type
+        )
 
+        # each key belongs to one stripe, which has its own lock and dictionaries so that keys in different stripes are matched at the same time
         # this contains a list of dependents are are waiting for the same key as the dependency_cache
-        self.__dependents_per_key = {}  # type: Dict[Any, Deque[Any]]
+        self.__dependents_per_key_per_stripe = [{} for _ in range(stripes_total)]  # type: List[Dict[Any, DependencyMatchingPolicy]]
         # this contains each dependencies that a dependent may need
-        self.__dependencies_per_key = {}  # type: Dict[Any, Deque[Any]]
-        self.__semaphore = Semaphore()
+        self.__dependencies_per_key_per_stripe = [{} for _ in range(stripes_total)]  # type: List[Dict[Any, DependencyMatchingPolicy]]
+        # this contains how many of the dependents of each key stopped waiting, which are removed once they are the majority
+        self.__stopped_dependents_total_per_key_per_stripe = [{} for _ in range(stripes_total)]  # type: List[Dict[Any, int]]
+        self.__semaphore_per_stripe = [Semaphore() for _ in range(stripes_total)]  # type: List[Semaphore]
+
+    def __get_stripe(self, *, key: Any) -> int:
+        return hash(key) % self.__stripes_total
+
+    def __is_dependent_waiting(self, dependent: Any) -> bool:
+        if type(dependent) is DependentDeadline:
+            return dependent.is_waiting()
+        if self.__is_dependent_waiting_method is not None:
+            return self.__is_dependent_waiting_method(dependent)
+        return True
+
+    def __add_stopped_dependent(self, *, key: Any, stripe: int):
+        # the stripe must already be locked
+        dependents_per_key = self.__dependents_per_key_per_stripe[stripe]
+        if key in dependents_per_key:
+            stopped_dependents_total_per_key = self.__stopped_dependents_total_per_key_per_stripe[stripe]
+            stopped_dependents_total = stopped_dependents_total_per_key.get(key, 0) + 1
+            if stopped_dependents_total * 2 > len(dependents_per_key[key]):
+                dependents_per_key[key].compact(
+                    is_waiting_method=self.__is_dependent_waiting
+                )
+                stopped_dependents_total_per_key.pop(key, None)
+                if not dependents_per_key[key]:
+                    del dependents_per_key[key]
+            else:
+                stopped_dependents_total_per_key[key] = stopped_dependents_total
 
-    def __get_dependent_dependency_pairs(self, *, key: Any) -> List[Tuple[Any, Any]]:
+    def __get_dependent_dependency_pairs(self, *, key: Any, stripe: int) -> List[Tuple[Any, Any]]:
+        dependents_per_key = self.__dependents_per_key_per_stripe[stripe]
+        dependencies_per_key = self.__dependencies_per_key_per_stripe[stripe]
         pairs = []  # type: List[Tuple[Any, Any]]
-        if key in self.__dependents_per_key and key in self.__dependencies_per_key:
-            while self.__dependents_per_key[key] and self.__dependencies_per_key[key]:
-                dependent = self.__dependents_per_key[key].popleft()
-                dependency = self.__dependencies_per_key[key].popleft()
+        if key in dependents_per_key and key in dependencies_per_key:
+            dependents = dependents_per_key[key]
+            dependencies = dependencies_per_key[key]
+            while dependents and dependencies:
+                dependent = dependents.take(
+                    is_reusable=False
+                )
+                if not self.__is_dependent_waiting(dependent):
+                    stopped_dependents_total_per_key = self.__stopped_dependents_total_per_key_per_stripe[stripe]
+                    if stopped_dependents_total_per_key.get(key, 0) > 1:
+                        stopped_dependents_total_per_key[key] -= 1
+                    else:
+                        stopped_dependents_total_per_key.pop(key, None)
+                    continue
+                if type(dependent) is DependentDeadline:
+                    dependent.stop_waiting()
+                    self.__deadline_scheduler.cancel(
+                        entry=dependent.get_deadline_entry()
+                    )
+                    dependent = dependent.get_dependent()
+                dependency = dependencies.take(
+                    is_reusable=self.__is_dependency_reusable
+                )
                 pairs.append((dependent, dependency))
-                if self.__is_dependency_reusable:
-                    self.__dependencies_per_key[key].append(dependency)
-            if not self.__dependents_per_key[key]:
-                del self.__dependents_per_key[key]
-            if not self.__dependencies_per_key[key]:
-                del self.__dependencies_per_key[key]
+            if not dependents_per_key[key]:
+                del dependents_per_key[key]
+                self.__stopped_dependents_total_per_key_per_stripe[stripe].pop(key, None)
+            if not dependencies_per_key[key]:
+                del dependencies_per_key[key]
         return pairs
 
-    def add_dependency(self, *, key: Any, dependency: Any):
+    def __get_waiting_dependent(self, *, dependent: Any, key: Any, timeout_seconds: Optional[float]) -> Any:
+        if timeout_seconds is None:
+            return dependent
+        dependent_deadline = DependentDeadline(
+            dependent=dependent
+        )
+        dependent_deadline.set_deadline_entry(
+            deadline_entry=self.__deadline_scheduler.schedule(
+                timeout_seconds=timeout_seconds,
+                on_deadline_callback=functools.partial(self.__expire, dependent_deadline=dependent_deadline, key=key)
+            )
+        )
+        return dependent_deadline
+
+    def __expire(self, *, dependent_deadline: DependentDeadline, key: Any):
+        stripe = self.__get_stripe(
+            key=key
+        )
+        semaphore = self.__semaphore_per_stripe[stripe]
+        semaphore.acquire()
+        try:
+            is_expired = dependent_deadline.is_waiting()
+            if is_expired:
+                dependent_deadline.stop_waiting()
+                self.__add_stopped_dependent(
+                    key=key,
+                    stripe=stripe
+                )
+        finally:
+            semaphore.release()
+        if is_expired and self.__on_dependent_expired_callback is not None:
+            self.__on_dependent_expired_callback(dependent_deadline.get_dependent(), key)
+
+    def stop_waiting(self, *, key: Any):
+        # a dependent for which is_dependent_waiting_method now returns false is counted here for each key that it was still waiting on
+        stripe = self.__get_stripe(
+            key=key
+        )
+        semaphore = self.__semaphore_per_stripe[stripe]
+        semaphore.acquire()
+        try:
+            self.__add_stopped_dependent(
+                key=key,
+                stripe=stripe
+            )
+        finally:
+            semaphore.release()
+
+    def cancel(self, *, dependent: Any, key: Any) -> bool:
+        # the first waiting dependent that is equal to the dependent stops waiting for the key, which has to be found by comparing it to the dependents of the key
+        stripe = self.__get_stripe(
+            key=key
+        )
+        dependents_per_key = self.__dependents_per_key_per_stripe[stripe]
+        semaphore = self.__semaphore_per_stripe[stripe]
+        semaphore.acquire()
+        try:
+            if key not in dependents_per_key:
+                return False
+            is_removed, removed_dependent = dependents_per_key[key].try_remove(
+                is_match_method=lambda waiting_dependent: self.__is_dependent_waiting(waiting_dependent) and (waiting_dependent.get_dependent() if type(waiting_dependent) is DependentDeadline else waiting_dependent) == dependent
+            )
+            if not dependents_per_key[key]:
+                del dependents_per_key[key]
+                self.__stopped_dependents_total_per_key_per_stripe[stripe].pop(key, None)
+            if is_removed and type(removed_dependent) is DependentDeadline:
+                removed_dependent.stop_waiting()
+                self.__deadline_scheduler.cancel(
+                    entry=removed_dependent.get_deadline_entry()
+                )
+            return is_removed
+        finally:
+            semaphore.release()
+
+    def add_dependency(self, *, key: Any, dependency: Any, weight: int = 1):
 
-        self.__semaphore.acquire()
+        stripe = self.__get_stripe(
+            key=key
+        )
+        dependencies_per_key = self.__dependencies_per_key_per_stripe[stripe]
+        semaphore = self.__semaphore_per_stripe[stripe]
+        semaphore.acquire()
         try:
-            if key not in self.__dependencies_per_key:
-                self.__dependencies_per_key[key] = deque()
-            self.__dependencies_per_key[key].append(dependency)
+            if key not in dependencies_per_key:
+                dependencies_per_key[key] = self.__dependency_policy_class()
+            dependencies_per_key[key].add(
+                item=dependency,
+                weight=weight
+            )
 
             pairs = self.__get_dependent_dependency_pairs(
-                key=key
+                key=key,
+                stripe=stripe
             )
         finally:
-            self.__semaphore.release()
+            semaphore.release()
 
         if pairs:
             for pair in pairs:
                 self.__on_dependent_dependency_satisfied_callback(*pair, key)
 
-    def add_dependent(self, *, dependent: Any, key: Any):
+    def add_dependent(self, *, dependent: Any, key: Any, priority: int = 0, timeout_seconds: float = None):
 
-        self.__semaphore.acquire()
+        stripe = self.__get_stripe(
+            key=key
+        )
+        dependents_per_key = self.__dependents_per_key_per_stripe[stripe]
+        semaphore = self.__semaphore_per_stripe[stripe]
+        semaphore.acquire()
         try:
-            if key not in self.__dependents_per_key:
-                self.__dependents_per_key[key] = deque()
-            self.__dependents_per_key[key].append(dependent)
+            if key not in dependents_per_key:
+                dependents_per_key[key] = self.__dependent_policy_class()
+            dependents_per_key[key].add(
+                item=self.__get_waiting_dependent(
+                    dependent=dependent,
+                    key=key,
+                    timeout_seconds=timeout_seconds
+                ),
+                weight=priority
+            )
 
             pairs = self.__get_dependent_dependency_pairs(
-                key=key
+                key=key,
+                stripe=stripe
             )
         finally:
-            self.__semaphore.release()
+            semaphore.release()
 
         if pairs:
             for pair in pairs:
                 self.__on_dependent_dependency_satisfied_callback(*pair, key)
 
+    def __add_batch(self, *, item_and_key_pairs: Iterable[Tuple[Any, Any]], weight: int, is_dependent: bool, timeout_seconds: Optional[float]):
+
+        item_key_and_stripe_tuples = [(item, key, self.__get_stripe(key=key)) for item, key in item_and_key_pairs]
+        # the stripes of every key in the batch are held together, which keeps a dependent that waits on several keys in the same order relative to every other batch on each of those keys
+        # without this, two dependents that each take one of two nonreusable keys first could each hold a dependency while waiting forever for the one held by the other
+        # the stripes are locked in order so that batches that share stripes cannot deadlock
+        stripes = sorted(set(stripe for _, _, stripe in item_key_and_stripe_tuples))
+        items_per_key_per_stripe = self.__dependents_per_key_per_stripe if is_dependent else self.__dependencies_per_key_per_stripe
+        policy_class = self.__dependent_policy_class if is_dependent else self.__dependency_policy_class
+        dependent_dependency_key_tuples = []  # type: List[Tuple[Any, Any, Any]]
+        acquired_stripes_total = 0
+        try:
+            for stripe in stripes:
+                self.__semaphore_per_stripe[stripe].acquire()
+                acquired_stripes_total += 1
+            # the items are still added one at a time so that they are matched as if added separately
+            for item, key, stripe in item_key_and_stripe_tuples:
+                items_per_key = items_per_key_per_stripe[stripe]
+                if key not in items_per_key:
+                    items_per_key[key] = policy_class()
+                items_per_key[key].add(
+                    item=self.__get_waiting_dependent(
+                        dependent=item,
+                        key=key,
+                        timeout_seconds=timeout_seconds
+                    ) if is_dependent else item,
+                    weight=weight
+                )
+
+                for dependent, dependency in self.__get_dependent_dependency_pairs(key=key, stripe=stripe):
+                    dependent_dependency_key_tuples.append((dependent, dependency, key))
+        finally:
+            for stripe in stripes[:acquired_stripes_total]:
+                self.__semaphore_per_stripe[stripe].release()
+
+        if dependent_dependency_key_tuples:
+            if self.__on_dependent_dependency_batch_satisfied_callback is not None:
+                self.__on_dependent_dependency_batch_satisfied_callback(dependent_dependency_key_tuples)
+            else:
+                for dependent_dependency_key_tuple in dependent_dependency_key_tuples:
+                    self.__on_dependent_dependency_satisfied_callback(*dependent_dependency_key_tuple)
+
+    def add_dependencies(self, *, dependency_and_key_pairs: Iterable[Tuple[Any, Any]], weight: int = 1):
+        self.__add_batch(
+            item_and_key_pairs=dependency_and_key_pairs,
+            weight=weight,
+            is_dependent=False,
+            timeout_seconds=None
+        )
+
+    def add_dependents(self, *, dependent_and_key_pairs: Iterable[Tuple[Any, Any]], priority: int = 0, timeout_seconds: float = None):
+        self.__add_batch(
+            item_and_key_pairs=dependent_and_key_pairs,
+            weight=priority,
+            is_dependent=True,
+            timeout_seconds=timeout_seconds
+        )
+
+    def dispose(self):
+        self.__deadline_scheduler.dispose()
+
+
+class AggregateDependentHandle():
+
+    def __init__(self, *, dependent: Any, reusable_keys: List[Any], nonreusable_keys: List[Any]):
+        self.__dependent = dependent
+        self.__reusable_keys = reusable_keys
+        self.__nonreusable_keys = nonreusable_keys
+        self.__remaining_dependencies_total = len(reusable_keys) + len(nonreusable_keys)
+
+        self.__dependency_and_key_pairs = []  # type: List[Tuple[Any, Any]]
+        self.__nonreusable_dependency_and_key_pairs = []  # type: List[Tuple[Any, Any]]
+        self.__is_waiting = True
+        self.__deadline_entry = None  # type: List[Optional[Callable[[], None]]]
+        self.__lock = Lock()
+
+    def get_dependent(self) -> Any:
+        return self.__dependent
+
+    def get_reusable_keys(self) -> List[Any]:
+        return self.__reusable_keys
+
+    def get_nonreusable_keys(self) -> List[Any]:
+        return self.__nonreusable_keys
+
+    def get_remaining_dependencies_total(self) -> int:
+        return self.__remaining_dependencies_total
+
+    def get_dependency_and_key_pairs(self) -> List[Tuple[Any, Any]]:
+        return self.__dependency_and_key_pairs
+
+    def get_nonreusable_dependency_and_key_pairs(self) -> List[Tuple[Any, Any]]:
+        return self.__nonreusable_dependency_and_key_pairs
+
+    def is_waiting(self) -> bool:
+        return self.__is_waiting
+
+    def get_deadline_entry(self) -> List[Optional[Callable[[], None]]]:
+        return self.__deadline_entry
+
+    def set_deadline_entry(self, *, deadline_entry: List[Optional[Callable[[], None]]]):
+        self.__deadline_entry = deadline_entry
+
+    def try_satisfy(self, *, dependency: Any, key: Any, is_reusable: bool) -> Tuple[bool, bool]:
+        # the keys of one dependent can be matched by different threads at once, so only the thread that takes the last dependency sees the count reach zero
+        # a dependent that was cancelled or expired does not take the dependency, which is returned as whether it was taken and whether the dependent is now satisfied
+        with self.__lock:
+            if not self.__is_waiting:
+                return False, False
+            self.__dependency_and_key_pairs.append((dependency, key))
+            if not is_reusable:
+                self.__nonreusable_dependency_and_key_pairs.append((dependency, key))
+            self.__remaining_dependencies_total -= 1
+            if self.__remaining_dependencies_total == 0:
+                self.__is_waiting = False
+                return True, True
+            return True, False
+
+    def try_stop_waiting(self) -> bool:
+        with self.__lock:
+            if not self.__is_waiting:
+                return False
+            self.__is_waiting = False
+            return True
+
 
 class AggregateDependentDependencyManager():
 
-    def __init__(self, *, on_dependent_dependency_satisfied_callback: Callable[[Any, List[Tuple[Any, Any]]], None]):
+    def __init__(self, *, on_dependent_dependency_satisfied_callback: Callable[[Any, List[Tuple[Any, Any]]], None], on_dependent_dependency_batch_satisfied_callback: Callable[[List[Tuple[Any, List[Tuple[Any, Any]]]]], None] = None, stripes_total: int = 16, dependent_policy_type: DependencyMatchingPolicyTypeEnum = None, reusable_dependency_policy_type: DependencyMatchingPolicyTypeEnum = None, on_dependent_expired_callback: Callable[[Any], None] = None):
 
         self.__on_dependent_dependency_satisfied_callback = on_dependent_dependency_satisfied_callback
-
-        self.__expected_dependencies_total_per_dependent = {}  # type: Dict[Any, int]
-        self.__dependency_and_key_pair_per_dependent = {}  # type: Dict[Any, List[Tuple[Any, Any]]]
-        self.__dependencies_per_dependent_semaphore = Semaphore()
+        self.__on_dependent_expired_callback = on_dependent_expired_callback
+        self.__on_dependent_dependency_batch_satisfied_callback = on_dependent_dependency_batch_satisfied_callback
+        self.__stripes_total = stripes_total
+        self.__dependent_policy_type = dependent_policy_type
+        # nonreusable dependencies are each taken once, so only the order of reusable dependencies is worth choosing
+        self.__reusable_dependency_policy_type = reusable_dependency_policy_type
+
+        # each dependent is tracked by its own handle, so the manager keeps no state of its own beyond the dependents waiting for each key
         self.__single_dependent_dependency_manager_per_is_reusable = {}  # type: Dict[bool, SingleDependentDependencyManager]
+        self.__deadline_scheduler = DeadlineScheduler()
 
         self.__initialize()
 
     def __initialize(self):
         for is_reusable in [True, False]:
             self.__single_dependent_dependency_manager_per_is_reusable[is_reusable] = SingleDependentDependencyManager(
-                on_dependent_dependency_satisfied_callback=self.__single_dependent_dependency_manager_on_dependent_dependency_satisfied_callback,
-                is_dependency_reusable=is_reusable
+                on_dependent_dependency_satisfied_callback=functools.partial(self.__single_dependent_dependency_manager_on_dependent_dependency_satisfied_callback, is_reusable=is_reusable),
+                is_dependency_reusable=is_reusable,
+                stripes_total=self.__stripes_total,
+                on_dependent_dependency_batch_satisfied_callback=functools.partial(self.__single_dependent_dependency_manager_on_dependent_dependency_batch_satisfied_callback, is_reusable=is_reusable),
+                dependent_policy_type=self.__dependent_policy_type,
+                dependency_policy_type=self.__reusable_dependency_policy_type if is_reusable else None,
+                is_dependent_waiting_method=AggregateDependentHandle.is_waiting
             )
 
-    def __single_dependent_dependency_manager_on_dependent_dependency_satisfied_callback(self, dependent: Any, dependency: Any, key: Any):
-        self.__dependency_and_key_pair_per_dependent[dependent].append((dependency, key))
-        if len(self.__dependency_and_key_pair_per_dependent[dependent]) == self.__expected_dependencies_total_per_dependent[dependent]:
-            self.__on_dependent_dependency_satisfied_callback(dependent, self.__dependency_and_key_pair_per_dependent[dependent])
-            del self.__dependency_and_key_pair_per_dependent[dependent]
-            del self.__expected_dependencies_total_per_dependent[dependent]
+    # the single dependent dependency managers call these after releasing their locks, so user callbacks are never called while a lock is held
+    def __single_dependent_dependency_manager_on_dependent_dependency_satisfied_callback(self, aggregate_dependent_handle: AggregateDependentHandle, dependency: Any, key: Any, *, is_reusable: bool):
+        for satisfied_aggregate_dependent_handle in self.__get_satisfied_aggregate_dependent_handles(dependent_dependency_key_tuples=[(aggregate_dependent_handle, dependency, key)], is_reusable=is_reusable):
+            self.__on_dependent_dependency_satisfied_callback(satisfied_aggregate_dependent_handle.get_dependent(), satisfied_aggregate_dependent_handle.get_dependency_and_key_pairs())
 
-    def add_dependent(self, *, dependent: Any, reusable_keys: List[Any], nonreusable_keys: List[Any]):
-        self.__dependencies_per_dependent_semaphore.acquire()
-        try:
-            self.__expected_dependencies_total_per_dependent[dependent] = len(reusable_keys) + len(nonreusable_keys)
-            self.__dependency_and_key_pair_per_dependent[dependent] = []
-            for dependency_key, is_reusable in chain(zip(reusable_keys, cycle([True])), zip(nonreusable_keys, cycle([False]))):
-                self.__single_dependent_dependency_manager_per_is_reusable[is_reusable].add_dependent(
-                    key=dependency_key,
-                    dependent=dependent
-                )
-        finally:
-            self.__dependencies_per_dependent_semaphore.release()
+    def __single_dependent_dependency_manager_on_dependent_dependency_batch_satisfied_callback(self, dependent_dependency_key_tuples: List[Tuple[AggregateDependentHandle, Any, Any]], *, is_reusable: bool):
+        self.__on_satisfied(
+            aggregate_dependent_handles=self.__get_satisfied_aggregate_dependent_handles(
+                dependent_dependency_key_tuples=dependent_dependency_key_tuples,
+                is_reusable=is_reusable
+            )
+        )
 
-    def add_dependency(self, *, key: Any, dependency: Any, is_reusable: bool):
-        self.__dependencies_per_dependent_semaphore.acquire()
-        try:
-            self.__single_dependent_dependency_manager_per_is_reusable[is_reusable].add_dependency(
+    def __get_satisfied_aggregate_dependent_handles(self, *, dependent_dependency_key_tuples: List[Tuple[AggregateDependentHandle, Any, Any]], is_reusable: bool) -> List[AggregateDependentHandle]:
+        satisfied_aggregate_dependent_handles = []  # type: List[AggregateDependentHandle]
+        untaken_dependency_and_key_pairs = []  # type: List[Tuple[Any, Any]]
+        for aggregate_dependent_handle, dependency, key in dependent_dependency_key_tuples:
+            is_taken, is_satisfied = aggregate_dependent_handle.try_satisfy(
+                dependency=dependency,
                 key=key,
-                dependency=dependency
+                is_reusable=is_reusable
             )
-        finally:
-            self.__dependencies_per_dependent_semaphore.release()
+            if is_satisfied:
+                satisfied_aggregate_dependent_handles.append(aggregate_dependent_handle)
+            elif not is_taken:
+                untaken_dependency_and_key_pairs.append((dependency, key))
+        # a dependent can be matched after it was cancelled but before it was removed from every key, so a nonreusable dependency that it did not take goes back to its pool
+        if untaken_dependency_and_key_pairs and not is_reusable:
+            self.__single_dependent_dependency_manager_per_is_reusable[False].add_dependencies(
+                dependency_and_key_pairs=untaken_dependency_and_key_pairs
+            )
+        for satisfied_aggregate_dependent_handle in satisfied_aggregate_dependent_handles:
+            if satisfied_aggregate_dependent_handle.get_deadline_entry() is not None:
+                self.__deadline_scheduler.cancel(
+                    entry=satisfied_aggregate_dependent_handle.get_deadline_entry()
+                )
+        return satisfied_aggregate_dependent_handles
 
+    def __on_satisfied(self, *, aggregate_dependent_handles: List[AggregateDependentHandle]):
+        if aggregate_dependent_handles:
+            if self.__on_dependent_dependency_batch_satisfied_callback is not None:
+                self.__on_dependent_dependency_batch_satisfied_callback([(aggregate_dependent_handle.get_dependent(), aggregate_dependent_handle.get_dependency_and_key_pairs()) for aggregate_dependent_handle in aggregate_dependent_handles])
+            else:
+                for aggregate_dependent_handle in aggregate_dependent_handles:
+                    self.__on_dependent_dependency_satisfied_callback(aggregate_dependent_handle.get_dependent(), aggregate_dependent_handle.get_dependency_and_key_pairs())
+
+    def __try_stop_waiting(self, *, aggregate_dependent_handle: AggregateDependentHandle) -> bool:
+        if not aggregate_dependent_handle.try_stop_waiting():
+            return False
+        if aggregate_dependent_handle.get_deadline_entry() is not None:
+            self.__deadline_scheduler.cancel(
+                entry=aggregate_dependent_handle.get_deadline_entry()
+            )
+        # the handle is skipped wherever it is still waiting, so only the keys it has not been matched to are counted as stopped
+        key_tuples = [(True, aggregate_dependent_handle.get_reusable_keys()), (False, aggregate_dependent_handle.get_nonreusable_keys())]  # type: List[Tuple[bool, Iterable[Any]]]
+        if aggregate_dependent_handle.get_dependency_and_key_pairs():
+            matched_nonreusable_keys = Counter(key for _, key in aggregate_dependent_handle.get_nonreusable_dependency_and_key_pairs())
+            matched_reusable_keys = Counter(key for _, key in aggregate_dependent_handle.get_dependency_and_key_pairs()) - matched_nonreusable_keys
+            key_tuples = [(True, (Counter(key_tuples[0][1]) - matched_reusable_keys).elements()), (False, (Counter(key_tuples[1][1]) - matched_nonreusable_keys).elements())]
+        for is_reusable, keys in key_tuples:
+            for key in keys:
+                self.__single_dependent_dependency_manager_per_is_reusable[is_reusable].stop_waiting(
+                    key=key
+                )
+        # the nonreusable dependencies that were already taken would otherwise be held by a dependent that will never use them
+        if aggregate_dependent_handle.get_nonreusable_dependency_and_key_pairs():
+            self.__single_dependent_dependency_manager_per_is_reusable[False].add_dependencies(
+                dependency_and_key_pairs=aggregate_dependent_handle.get_nonreusable_dependency_and_key_pairs()
+            )
+        return True
 
-class ElapsedTimer():
+    def __expire(self, *, aggregate_dependent_handle: AggregateDependentHandle):
+        if self.__try_stop_waiting(aggregate_dependent_handle=aggregate_dependent_handle) and self.__on_dependent_expired_callback is not None:
+            self.__on_dependent_expired_callback(aggregate_dependent_handle.get_dependent())
 
-    def __init__(self):
+    def cancel(self, *, aggregate_dependent_handle: AggregateDependentHandle) -> bool:
+        return self.__try_stop_waiting(
+            aggregate_dependent_handle=aggregate_dependent_handle
+        )
 
-        # TODO add ability to specify formats, etc.
+    def add_dependent(self, *, dependent: Any, reusable_keys: List[Any], nonreusable_keys: List[Any], priority: int = 0, timeout_seconds: float = None) -> AggregateDependentHandle:
+        return self.add_dependents(
+            dependent_and_keys_tuples=[(dependent, reusable_keys, nonreusable_keys)],
+            priority=priority,
+            timeout_seconds=timeout_seconds
+        )[0]
+
+    def add_dependency(self, *, key: Any, dependency: Any, is_reusable: bool, weight: int = 1):
+        self.__single_dependent_dependency_manager_per_is_reusable[is_reusable].add_dependency(
+            key=key,
+            dependency=dependency,
+            weight=weight
+        )
 
-        self.__start_timer_value = default_timer()
+    def add_dependents(self, *, dependent_and_keys_tuples: Iterable[Tuple[Any, List[Any], List[Any]]], priority: int = 0, timeout_seconds: float = None) -> List[AggregateDependentHandle]:
+        # each tuple holds a dependent, its reusable keys and its nonreusable keys
+        aggregate_dependent_handles = []  # type: List[AggregateDependentHandle]
+        dependent_and_key_pairs_per_is_reusable = {True: [], False: []}  # type: Dict[bool, List[Tuple[AggregateDependentHandle, Any]]]
+        for dependent, reusable_keys, nonreusable_keys in dependent_and_keys_tuples:
+            aggregate_dependent_handle = AggregateDependentHandle(
+                dependent=dependent,
+                reusable_keys=reusable_keys,
+                nonreusable_keys=nonreusable_keys
+            )
+            # the deadline is scheduled before the dependent can take any dependency so that satisfying it always finds the deadline to cancel
+            if timeout_seconds is not None and aggregate_dependent_handle.get_remaining_dependencies_total() != 0:
+                aggregate_dependent_handle.set_deadline_entry(
+                    deadline_entry=self.__deadline_scheduler.schedule(
+                        timeout_seconds=timeout_seconds,
+                        on_deadline_callback=functools.partial(self.__expire, aggregate_dependent_handle=aggregate_dependent_handle)
+                    )
+                )
+            aggregate_dependent_handles.append(aggregate_dependent_handle)
+            dependent_and_key_pairs_per_is_reusable[True].extend((aggregate_dependent_handle, dependency_key) for dependency_key in reusable_keys)
+            dependent_and_key_pairs_per_is_reusable[False].extend((aggregate_dependent_handle, dependency_key) for dependency_key in nonreusable_keys)
+        for is_reusable, dependent_and_key_pairs in dependent_and_key_pairs_per_is_reusable.items():
+            if dependent_and_key_pairs:
+                self.__single_dependent_dependency_manager_per_is_reusable[is_reusable].add_dependents(
+                    dependent_and_key_pairs=dependent_and_key_pairs,
+                    priority=priority
+                )
+        # a dependent without any keys has nothing to wait for
+        self.__on_satisfied(
+            aggregate_dependent_handles=[aggregate_dependent_handle for aggregate_dependent_handle in aggregate_dependent_handles if aggregate_dependent_handle.get_remaining_dependencies_total() == 0 and not aggregate_dependent_handle.get_dependency_and_key_pairs() and aggregate_dependent_handle.try_stop_waiting()]
+        )
+        return aggregate_dependent_handles
+
+    def add_dependencies(self, *, dependency_key_and_is_reusable_tuples: Iterable[Tuple[Any, Any, bool]], weight: int = 1):
+        # each tuple holds a dependency, its key and whether it is reusable
+        dependency_and_key_pairs_per_is_reusable = {True: [], False: []}  # type: Dict[bool, List[Tuple[Any, Any]]]
+        for dependency, key, is_reusable in dependency_key_and_is_reusable_tuples:
+            dependency_and_key_pairs_per_is_reusable[is_reusable].append((dependency, key))
+        for is_reusable, dependency_and_key_pairs in dependency_and_key_pairs_per_is_reusable.items():
+            if dependency_and_key_pairs:
+                self.__single_dependent_dependency_manager_per_is_reusable[is_reusable].add_dependencies(
+                    dependency_and_key_pairs=dependency_and_key_pairs,
+                    weight=weight
+                )
 
-    def get_time_seconds(self) -> float:
-        next_timer_value = default_timer()
-        time_seconds, self.__start_timer_value = next_timer_value - self.__start_timer_value, next_timer_value
-        return time_seconds
+    def dispose(self):
+        self.__deadline_scheduler.dispose()
+        for single_dependent_dependency_manager in self.__single_dependent_dependency_manager_per_is_reusable.values():
+            single_dependent_dependency_manager.dispose()
+
+
+class AsyncDependencyFutureWaiter():
+
+    def __init__(self, *, dependency_future: asyncio.Future, key: Any, async_single_dependent_dependency_manager: AsyncSingleDependentDependencyManager):
+        self.__dependency_future = dependency_future
+        self.__key = key
+        self.__async_single_dependent_dependency_manager = async_single_dependent_dependency_manager
+
+    def __call__(self, dependency: Any) -> bool:
+        if self.__dependency_future.done():
+            return False
+        # the done callback is only needed if the dependent stops waiting, so it is not scheduled for every dependency
+        self.__dependency_future.remove_done_callback(self.on_done)
+        self.__dependency_future.set_result(dependency)
+        return True
+
+    def on_done(self, dependency_future: asyncio.Future):
+        if dependency_future.cancelled():
+            self.__async_single_dependent_dependency_manager.stop_waiting(
+                key=self.__key,
+                on_dependency_available_callback=self
+            )
 
-    def peek_time_seconds(self) -> float:
-        return (default_timer() - self.__start_timer_value)
 
+class AsyncSingleDependentDependencyManager():
 
-class ElapsedTimerMessageManager():
+    def __init__(self, *, is_dependency_reusable: bool, on_dependent_dependency_satisfied_callback: Callable[[Any, Any, Any], None] = None):
 
-    def __init__(self, *, include_datetime_prefix: bool, include_stack: bool, stack_offset: int = 0):
+        self.__is_dependency_reusable = is_dependency_reusable
+        self.__on_dependent_dependency_satisfied_callback = on_dependent_dependency_satisfied_callback
 
-        self.__include_datetime_prefix = include_datetime_prefix
-        self.__include_stack = include_stack
-        self.__stack_offset = stack_offset
+        # everything runs on one event loop, so the dictionaries are only ever changed by one caller at a time and need no lock
+        # this contains the callbacks of the dependents that are waiting for each key, which return whether the dependent took the dependency
+        self.__on_dependency_available_callbacks_per_key = {}  # type: Dict[Any, Deque[Callable[[Any], bool]]]
+        # this contains the callbacks of each key whose dependents stopped waiting, which are skipped when they are reached or removed once they are the majority
+        self.__stopped_on_dependency_available_callbacks_per_key = {}  # type: Dict[Any, Set[Callable[[Any], bool]]]
+        # this contains each dependencies that a dependent may need
+        self.__dependencies_per_key = {}  # type: Dict[Any, Deque[Any]]
 
-        self.__elapsed_timer = ElapsedTimer()
-        self.__elapsed_seconds_total_per_message = {}  # type: Dict[str, int]
+    def __try_satisfy_dependents(self, *, key: Any):
+        if key in self.__on_dependency_available_callbacks_per_key and key in self.__dependencies_per_key:
+            on_dependency_available_callbacks = self.__on_dependency_available_callbacks_per_key[key]
+            stopped_on_dependency_available_callbacks = self.__stopped_on_dependency_available_callbacks_per_key.get(key)
+            dependencies = self.__dependencies_per_key[key]
+            while on_dependency_available_callbacks and dependencies:
+                on_dependency_available_callback = on_dependency_available_callbacks.popleft()
+                if stopped_on_dependency_available_callbacks and on_dependency_available_callback in stopped_on_dependency_available_callbacks:
+                    stopped_on_dependency_available_callbacks.remove(on_dependency_available_callback)
+                # a dependent that stopped waiting does not take a dependency
+                elif on_dependency_available_callback(dependencies[0]):
+                    dependency = dependencies.popleft()
+                    if self.__is_dependency_reusable:
+                        dependencies.append(dependency)
+            if not on_dependency_available_callbacks:
+                del self.__on_dependency_available_callbacks_per_key[key]
+                self.__stopped_on_dependency_available_callbacks_per_key.pop(key, None)
+            elif stopped_on_dependency_available_callbacks is not None and not stopped_on_dependency_available_callbacks:
+                del self.__stopped_on_dependency_available_callbacks_per_key[key]
+            if not dependencies:
+                del self.__dependencies_per_key[key]
 
-    def print(self, message: str, override_stack_offset: int = None):
+    def stop_waiting(self, *, key: Any, on_dependency_available_callback: Callable[[Any], bool]):
+        # the callback of a dependent that stopped waiting would otherwise stay until a dependency arrives for the key, which may never happen
+        if key in self.__on_dependency_available_callbacks_per_key:
+            on_dependency_available_callbacks = self.__on_dependency_available_callbacks_per_key[key]
+            if key not in self.__stopped_on_dependency_available_callbacks_per_key:
+                self.__stopped_on_dependency_available_callbacks_per_key[key] = set()
+            stopped_on_dependency_available_callbacks = self.__stopped_on_dependency_available_callbacks_per_key[key]
+            stopped_on_dependency_available_callbacks.add(on_dependency_available_callback)
+            if len(stopped_on_dependency_available_callbacks) * 2 > len(on_dependency_available_callbacks):
+                on_dependency_available_callbacks = deque(waiting_on_dependency_available_callback for waiting_on_dependency_available_callback in on_dependency_available_callbacks if waiting_on_dependency_available_callback not in stopped_on_dependency_available_callbacks)
+                del self.__stopped_on_dependency_available_callbacks_per_key[key]
+                if on_dependency_available_callbacks:
+                    self.__on_dependency_available_callbacks_per_key[key] = on_dependency_available_callbacks
+                else:
+                    del self.__on_dependency_available_callbacks_per_key[key]
 
-        elapsed_seconds = self.__elapsed_timer.get_time_seconds()
-        if message not in self.__elapsed_seconds_total_per_message:
-            self.__elapsed_seconds_total_per_message[message] = 0
-        self.__elapsed_seconds_total_per_message[message] += elapsed_seconds
-        formatted_message = f"{str(datetime.utcnow()) + ': ' if self.__include_datetime_prefix else ''}{inspect.stack()[1 + (override_stack_offset if override_stack_offset is not None else self.__stack_offset)][3] + ': ' if self.__include_stack else ''}{elapsed_seconds}: {message}"
-        print(formatted_message)
+    def add_dependency(self, *, key: Any, dependency: Any):
+        if key not in self.__dependencies_per_key:
+            self.__dependencies_per_key[key] = deque()
+        self.__dependencies_per_key[key].append(dependency)
 
-    def get_elapsed_seconds_total_per_message(self) -> Dict[str, int]:
-        return self.__elapsed_seconds_total_per_message.copy()
+        self.__try_satisfy_dependents(
+            key=key
+        )
 
+    def add_dependencies(self, *, dependency_and_key_pairs: Iterable[Tuple[Any, Any]]):
+        for dependency, key in dependency_and_key_pairs:
+            self.add_dependency(
+                key=key,
+                dependency=dependency
+            )
 
-DateFormat_Year_Month_Day_Hour_Minute_Second_Millisecond = "%Y-%m-%d %H:%M:%S.%f"
+    def add_dependency_available_callback(self, *, key: Any, on_dependency_available_callback: Callable[[Any], bool]):
+        # the callback is called with the next dependency for the key and must not block, since it is called by whoever added the dependency
+        if key not in self.__on_dependency_available_callbacks_per_key:
+            self.__on_dependency_available_callbacks_per_key[key] = deque()
+        self.__on_dependency_available_callbacks_per_key[key].append(on_dependency_available_callback)
 
+        self.__try_satisfy_dependents(
+            key=key
+        )
 
-class SubprocessWrapper():
+    def get_dependency_future(self, *, key: Any) -> asyncio.Future:
+        # the future is resolved with the dependency, and whatever awaits it is resumed by the event loop rather than by the caller that added the dependency
+        dependency_future = asyncio.get_running_loop().create_future()
 
-    def __init__(self, *, command: str, arguments: List[str]):
+        # the waiter is both callbacks, since a closure and its cells for each of them make every waiting dependent more work for the garbage collector
+        async_dependency_future_waiter = AsyncDependencyFutureWaiter(
+            dependency_future=dependency_future,
+            key=key,
+            async_single_dependent_dependency_manager=self
+        )
+        self.add_dependency_available_callback(
+            key=key,
+            on_dependency_available_callback=async_dependency_future_waiter
+        )
+        if not dependency_future.done():
+            dependency_future.add_done_callback(async_dependency_future_waiter.on_done)
+        return dependency_future
 
-        self.__command = command
-        self.__arguments = arguments
+    async def wait_for(self, *, key: Any) -> Any:
+        return await self.get_dependency_future(
+            key=key
+        )
 
-        self.__subprocess = None  # type: subprocess.Popen
+    def add_dependent(self, *, dependent: Any, key: Any):
+        if self.__on_dependent_dependency_satisfied_callback is None:
+            raise Exception("Cannot add a dependent without an on_dependent_dependency_satisfied_callback.")
 
-    def run(self) -> Tuple[int, str]:
+        def on_done_callback(dependency_future: asyncio.Future):
+            if not dependency_future.cancelled():
+                self.__on_dependent_dependency_satisfied_callback(dependent, dependency_future.result(), key)
 
-        formatted_command = [self.__command] + self.__arguments
+        self.get_dependency_future(
+            key=key
+        ).add_done_callback(on_done_callback)
 
-        with subprocess.Popen(formatted_command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT) as process_handle:
-            self.__subprocess = process_handle
-            process_handle.wait()
-            standard_output = process_handle.stdout.read().decode()
-            return_code = process_handle.returncode
-        self.__subprocess = None
 
-        return return_code, standard_output
+class AsyncDependenciesFutureKeyWaiter():
 
-    def kill(self):
-        if self.__subprocess is not None:
-            self.__subprocess.kill()
+    def __init__(self, *, async_dependencies_future_waiter: AsyncDependenciesFutureWaiter, key_index: int):
+        self.__async_dependencies_future_waiter = async_dependencies_future_waiter
+        self.__key_index = key_index
 
+    def __call__(self, dependency: Any) -> bool:
+        return self.__async_dependencies_future_waiter.try_take(
+            key_index=self.__key_index,
+            dependency=dependency
+        )
 
-def is_directory_empty(*, directory_path: str) -> bool:
-    with os.scandir(directory_path) as scan_dir:
-        return not next(scan_dir, None)
 
+class AsyncDependenciesFutureWaiter():
+
+    def __init__(self, *, dependencies_future: asyncio.Future, key_and_is_reusable_pairs: List[Tuple[Any, bool]], async_single_dependent_dependency_manager_per_is_reusable: Dict[bool, AsyncSingleDependentDependencyManager]):
+        self.__dependencies_future = dependencies_future
+        self.__key_and_is_reusable_pairs = key_and_is_reusable_pairs
+        self.__async_single_dependent_dependency_manager_per_is_reusable = async_single_dependent_dependency_manager_per_is_reusable
+
+        self.__dependency_and_key_pairs = [None] * len(key_and_is_reusable_pairs)  # type: List[Tuple[Any, Any]]
+        self.__remaining_dependencies_total = len(key_and_is_reusable_pairs)
+        self.__on_dependency_available_callbacks = [AsyncDependenciesFutureKeyWaiter(async_dependencies_future_waiter=self, key_index=key_index) for key_index in range(len(key_and_is_reusable_pairs))]  # type: List[AsyncDependenciesFutureKeyWaiter]
+
+    def get_on_dependency_available_callbacks(self) -> List[AsyncDependenciesFutureKeyWaiter]:
+        return self.__on_dependency_available_callbacks
+
+    def try_take(self, *, key_index: int, dependency: Any) -> bool:
+        # a dependent that stopped waiting stops taking dependencies for every one of its keys
+        if self.__dependencies_future.done():
+            return False
+        self.__dependency_and_key_pairs[key_index] = (dependency, self.__key_and_is_reusable_pairs[key_index][0])
+        self.__remaining_dependencies_total -= 1
+        if self.__remaining_dependencies_total == 0:
+            self.__dependencies_future.remove_done_callback(self.on_done)
+            self.__dependencies_future.set_result(self.__dependency_and_key_pairs)
+            # the callbacks refer back to the waiter, so they are released here rather than left for the garbage collector
+            self.__on_dependency_available_callbacks = None
+        return True
+
+    def on_done(self, dependencies_future: asyncio.Future):
+        if dependencies_future.cancelled():
+            for (key, is_reusable), dependency_and_key_pair, on_dependency_available_callback in zip(self.__key_and_is_reusable_pairs, self.__dependency_and_key_pairs, self.__on_dependency_available_callbacks):
+                if dependency_and_key_pair is None:
+                    self.__async_single_dependent_dependency_manager_per_is_reusable[is_reusable].stop_waiting(
+                        key=key,
+                        on_dependency_available_callback=on_dependency_available_callback
+                    )
+            # the nonreusable dependencies that were already taken would otherwise be held by a dependent that will never use them
+            self.__async_single_dependent_dependency_manager_per_is_reusable[False].add_dependencies(
+                dependency_and_key_pairs=[dependency_and_key_pair for (_, is_reusable), dependency_and_key_pair in zip(self.__key_and_is_reusable_pairs, self.__dependency_and_key_pairs) if not is_reusable and dependency_and_key_pair is not None]
+            )
+            self.__on_dependency_available_callbacks = None
 
-def delete_directory_contents(directory_path: str):
-    for file_name in os.listdir(directory_path):
-        file_path = os.path.join(directory_path, file_name)
-        if os.path.isfile(file_path):
-            os.remove(file_path)
-        elif os.path.islink(file_path):
-            os.unlink(file_path)
-        elif os.path.isdir(file_path):
-            shutil.rmtree(file_path)
 
+class AsyncAggregateDependentDependencyManager():
 
-class IterationTypeEnum(StringEnum):
-    Stutter = "stutter"
-    Cycle = "cycle"
+    def __init__(self, *, on_dependent_dependency_satisfied_callback: Callable[[Any, List[Tuple[Any, Any]]], None] = None):
 
+        self.__on_dependent_dependency_satisfied_callback = on_dependent_dependency_satisfied_callback
 
-def split_repeat(text: str, delimiter: str, is_delimiter_regex: bool, format: str, iteration_type: IterationTypeEnum, repetition_total: int) -> str:
+        self.__single_dependent_dependency_manager_per_is_reusable = {}  # type: Dict[bool, AsyncSingleDependentDependencyManager]
 
-    output_elements = []  # type: List[str]
+        self.__initialize()
 
-    if delimiter == "" or delimiter is None:
-        text_parts = [text]
-    else:
-        if is_delimiter_regex:
-            delimiters = re.search(delimiter, text)
-            if not delimiters:
-                text_parts = [text]
-            else:
-                text_parts = []  # type: List[str]
-                while delimiters:
-                    found_delimiter = delimiters.group(0)
-                    text_part = text[:text.index(found_delimiter)]
-                    text_parts.append(text_part)
-                    text = text[text.index(found_delimiter) + len(found_delimiter):]
+    def __initialize(self):
+        for is_reusable in [True, False]:
+            self.__single_dependent_dependency_manager_per_is_reusable[is_reusable] = AsyncSingleDependentDependencyManager(
+                is_dependency_reusable=is_reusable
+            )
+
+    def add_dependency(self, *, key: Any, dependency: Any, is_reusable: bool):
+        self.__single_dependent_dependency_manager_per_is_reusable[is_reusable].add_dependency(
+            key=key,
+            dependency=dependency
+        )
+
+    def add_dependencies(self, *, dependency_key_and_is_reusable_tuples: Iterable[Tuple[Any, Any, bool]]):
+        for dependency, key, is_reusable in dependency_key_and_is_reusable_tuples:
+            self.add_dependency(
+                key=key,
+                dependency=dependency,
+                is_reusable=is_reusable
+            )
+
+    def get_dependencies_future(self, *, reusable_keys: List[Any], nonreusable_keys: List[Any]) -> asyncio.Future:
+        # the future is resolved with a dependency and key pair for each reusable key and then each nonreusable key, in the order of the keys
+        dependencies_future = asyncio.get_running_loop().create_future()
+        key_and_is_reusable_pairs = list(chain(zip(reusable_keys, repeat(True)), zip(nonreusable_keys, repeat(False))))
+        if not key_and_is_reusable_pairs:
+            dependencies_future.set_result([])
+        else:
+            # the waiter keeps the dependencies found so far and gives each key its own callback, so that the callbacks of a cancelled dependent can be found again
+            async_dependencies_future_waiter = AsyncDependenciesFutureWaiter(
+                dependencies_future=dependencies_future,
+                key_and_is_reusable_pairs=key_and_is_reusable_pairs,
+                async_single_dependent_dependency_manager_per_is_reusable=self.__single_dependent_dependency_manager_per_is_reusable
+            )
+            for (key, is_reusable), on_dependency_available_callback in zip(key_and_is_reusable_pairs, async_dependencies_future_waiter.get_on_dependency_available_callbacks()):
+                self.__single_dependent_dependency_manager_per_is_reusable[is_reusable].add_dependency_available_callback(
+                    key=key,
+                    on_dependency_available_callback=on_dependency_available_callback
+                )
+            if not dependencies_future.done():
+                dependencies_future.add_done_callback(async_dependencies_future_waiter.on_done)
+        return dependencies_future
+
+    async def wait_for(self, *, reusable_keys: List[Any], nonreusable_keys: List[Any]) -> List[Tuple[Any, Any]]:
+        return await self.get_dependencies_future(
+            reusable_keys=reusable_keys,
+            nonreusable_keys=nonreusable_keys
+        )
+
+    def add_dependent(self, *, dependent: Any, reusable_keys: List[Any], nonreusable_keys: List[Any]):
+        if self.__on_dependent_dependency_satisfied_callback is None:
+            raise Exception("Cannot add a dependent without an on_dependent_dependency_satisfied_callback.")
+
+        def on_done_callback(dependencies_future: asyncio.Future):
+            if not dependencies_future.cancelled():
+                self.__on_dependent_dependency_satisfied_callback(dependent, dependencies_future.result())
+
+        self.get_dependencies_future(
+            reusable_keys=reusable_keys,
+            nonreusable_keys=nonreusable_keys
+        ).add_done_callback(on_done_callback)
+
+
+class DependencyBrokerMessageTypeEnum(StringEnum):
+    AddDependents = "add_dependents"
+    AddDependencies = "add_dependencies"
+    Cancel = "cancel"
+    Cancelled = "cancelled"
+    Satisfied = "satisfied"
+    Expired = "expired"
+
+
+class DependencyBrokerFraming():
+
+    # each frame holds a list of messages so that a batch of requests or results costs one write and one read
+    frame_header_struct = struct.Struct("<I")
+
+    @staticmethod
+    def write_frame(*, connection: socket.socket, messages: List[Tuple]):
+        # frames are pickled, so the socket must only be reachable by trusted local processes
+        frame_bytes = pickle.dumps(messages, protocol=pickle.HIGHEST_PROTOCOL)
+        connection.sendall(DependencyBrokerFraming.frame_header_struct.pack(len(frame_bytes)) + frame_bytes)
+
+    @staticmethod
+    def __read_bytes(*, connection: socket.socket, bytes_length: int) -> Optional[bytes]:
+        read_bytes = bytearray()
+        while len(read_bytes) < bytes_length:
+            chunk_bytes = connection.recv(bytes_length - len(read_bytes))
+            if not chunk_bytes:
+                return None
+            read_bytes.extend(chunk_bytes)
+        return bytes(read_bytes)
+
+    @staticmethod
+    def read_frame(*, connection: socket.socket) -> Optional[List[Tuple]]:
+        # None is returned once the other side has closed the connection
+        frame_header_bytes = DependencyBrokerFraming.__read_bytes(
+            connection=connection,
+            bytes_length=DependencyBrokerFraming.frame_header_struct.size
+        )
+        if frame_header_bytes is None:
+            return None
+        frame_bytes = DependencyBrokerFraming.__read_bytes(
+            connection=connection,
+            bytes_length=DependencyBrokerFraming.frame_header_struct.unpack(frame_header_bytes)[0]
+        )
+        if frame_bytes is None:
+            return None
+        return pickle.loads(frame_bytes)
+
+
+class DependencyBrokerConnection():
+
+    def __init__(self, *, connection: socket.socket, on_undelivered_messages_callback: Callable[[List[Tuple]], None]):
+
+        self.__connection = connection
+        self.__on_undelivered_messages_callback = on_undelivered_messages_callback
+
+        # messages are written by their own thread so that the reader threads of the broker never block on a client that is slow to read
+        self.__outbound_messages = []  # type: List[Tuple]
+        self.__condition = Condition()
+        self.__is_closed = False
+        self.__is_failed = False
+        # the waiting dependents of the connection are cancelled when it disconnects so that they do not take dependencies that nobody will receive
+        self.__waiting_key_per_dependent_id = {}  # type: Dict[int, Any]
+        self.__writer_thread = Thread(
+            target=self.__write,
+            daemon=True
+        )
+        self.__writer_thread.start()
+
+    def get_connection(self) -> socket.socket:
+        return self.__connection
+
+    def get_waiting_key_per_dependent_id(self) -> Dict[int, Any]:
+        return self.__waiting_key_per_dependent_id
+
+    def __write(self):
+        while True:
+            with self.__condition:
+                while not self.__outbound_messages and not self.__is_closed:
+                    self.__condition.wait()
+                if not self.__outbound_messages:
+                    return
+                # every message queued since the last write is sent as one frame
+                messages = self.__outbound_messages
+                self.__outbound_messages = []
+            try:
+                DependencyBrokerFraming.write_frame(
+                    connection=self.__connection,
+                    messages=messages
+                )
+            except OSError:
+                with self.__condition:
+                    self.__is_failed = True
+                    messages.extend(self.__outbound_messages)
+                    self.__outbound_messages = []
+                self.__on_undelivered_messages_callback(messages)
+                return
+
+    def try_send(self, *, messages: List[Tuple]) -> bool:
+        with self.__condition:
+            if self.__is_closed or self.__is_failed:
+                return False
+            self.__outbound_messages.extend(messages)
+            self.__condition.notify()
+            return True
+
+    def close(self):
+        # the messages that are already queued are still written before the socket is closed
+        with self.__condition:
+            self.__is_closed = True
+            self.__condition.notify()
+        self.__writer_thread.join()
+        self.__connection.close()
+
+
+class DependencyBrokerServer():
+
+    def __init__(self, *, socket_path: str, is_dependency_reusable: bool, stripes_total: int = 16, dependent_policy_type: DependencyMatchingPolicyTypeEnum = None, dependency_policy_type: DependencyMatchingPolicyTypeEnum = None):
+
+        self.__socket_path = socket_path
+        self.__is_dependency_reusable = is_dependency_reusable
+
+        # the dependents in the broker are pairs of the connection index and the dependent id from that client, so the dependents themselves never leave their process
+        self.__single_dependent_dependency_manager = SingleDependentDependencyManager(
+            on_dependent_dependency_satisfied_callback=self.__on_dependent_dependency_satisfied_callback,
+            is_dependency_reusable=is_dependency_reusable,
+            stripes_total=stripes_total,
+            on_dependent_dependency_batch_satisfied_callback=self.__on_dependent_dependency_batch_satisfied_callback,
+            dependent_policy_type=dependent_policy_type,
+            dependency_policy_type=dependency_policy_type,
+            on_dependent_expired_callback=self.__on_dependent_expired_callback
+        )
+        self.__listening_socket = None  # type: socket.socket
+        self.__accept_thread = None  # type: Thread
+        self.__connection_index = 0
+        self.__broker_connection_per_connection_index = {}  # type: Dict[int, DependencyBrokerConnection]
+        self.__read_thread_per_connection_index = {}  # type: Dict[int, Thread]
+        self.__connections_lock = Lock()
+        self.__is_disposed = False
+
+    def __on_undelivered_messages(self, *, messages: List[Tuple]):
+        # a nonreusable dependency matched to a client that disconnected goes back to its pool
+        if not self.__is_dependency_reusable:
+            undelivered_dependency_and_key_pairs = []  # type: List[Tuple[Any, Any]]
+            for message in messages:
+                if message[0] == DependencyBrokerMessageTypeEnum.Satisfied.value:
+                    undelivered_dependency_and_key_pairs.extend((dependency, key) for dependent_id, dependency, key in message[1])
+            if undelivered_dependency_and_key_pairs:
+                self.__single_dependent_dependency_manager.add_dependencies(
+                    dependency_and_key_pairs=undelivered_dependency_and_key_pairs
+                )
+
+    def __send(self, *, connection_index: int, messages: List[Tuple]):
+        with self.__connections_lock:
+            broker_connection = self.__broker_connection_per_connection_index.get(connection_index, None)
+        if broker_connection is None or not broker_connection.try_send(messages=messages):
+            self.__on_undelivered_messages(
+                messages=messages
+            )
+
+    def __on_dependent_dependency_satisfied_callback(self, dependent: Tuple[int, int], dependency: Any, key: Any):
+        self.__on_dependent_dependency_batch_satisfied_callback([(dependent, dependency, key)])
+
+    def __on_dependent_dependency_batch_satisfied_callback(self, dependent_dependency_key_tuples: List[Tuple[Tuple[int, int], Any, Any]]):
+        dependent_id_dependency_key_tuples_per_connection_index = {}  # type: Dict[int, List[Tuple[int, Any, Any]]]
+        with self.__connections_lock:
+            for (connection_index, dependent_id), dependency, key in dependent_dependency_key_tuples:
+                if connection_index not in dependent_id_dependency_key_tuples_per_connection_index:
+                    dependent_id_dependency_key_tuples_per_connection_index[connection_index] = []
+                dependent_id_dependency_key_tuples_per_connection_index[connection_index].append((dependent_id, dependency, key))
+                broker_connection = self.__broker_connection_per_connection_index.get(connection_index, None)
+                if broker_connection is not None:
+                    broker_connection.get_waiting_key_per_dependent_id().pop(dependent_id, None)
+        for connection_index, dependent_id_dependency_key_tuples in dependent_id_dependency_key_tuples_per_connection_index.items():
+            self.__send(
+                connection_index=connection_index,
+                messages=[(DependencyBrokerMessageTypeEnum.Satisfied.value, dependent_id_dependency_key_tuples)]
+            )
+
+    def __on_dependent_expired_callback(self, dependent: Tuple[int, int], key: Any):
+        connection_index, dependent_id = dependent
+        with self.__connections_lock:
+            broker_connection = self.__broker_connection_per_connection_index.get(connection_index, None)
+            if broker_connection is not None:
+                broker_connection.get_waiting_key_per_dependent_id().pop(dependent_id, None)
+        self.__send(
+            connection_index=connection_index,
+            messages=[(DependencyBrokerMessageTypeEnum.Expired.value, [(dependent_id, key)])]
+        )
+
+    def __process_messages(self, *, connection_index: int, broker_connection: DependencyBrokerConnection, messages: List[Tuple]):
+        for message in messages:
+            message_type = DependencyBrokerMessageTypeEnum(message[0])
+            if message_type == DependencyBrokerMessageTypeEnum.AddDependents:
+                _, priority, timeout_seconds, dependent_id_and_key_pairs = message
+                # the dependents are recorded before they are added since they may be satisfied immediately
+                with self.__connections_lock:
+                    waiting_key_per_dependent_id = broker_connection.get_waiting_key_per_dependent_id()
+                    for dependent_id, key in dependent_id_and_key_pairs:
+                        waiting_key_per_dependent_id[dependent_id] = key
+                self.__single_dependent_dependency_manager.add_dependents(
+                    dependent_and_key_pairs=[((connection_index, dependent_id), key) for dependent_id, key in dependent_id_and_key_pairs],
+                    priority=priority,
+                    timeout_seconds=timeout_seconds
+                )
+            elif message_type == DependencyBrokerMessageTypeEnum.AddDependencies:
+                _, weight, dependency_and_key_pairs = message
+                self.__single_dependent_dependency_manager.add_dependencies(
+                    dependency_and_key_pairs=dependency_and_key_pairs,
+                    weight=weight
+                )
+            elif message_type == DependencyBrokerMessageTypeEnum.Cancel:
+                _, request_id, dependent_id, key = message
+                is_removed = self.__single_dependent_dependency_manager.cancel(
+                    dependent=(connection_index, dependent_id),
+                    key=key
+                )
+                if is_removed:
+                    with self.__connections_lock:
+                        broker_connection.get_waiting_key_per_dependent_id().pop(dependent_id, None)
+                broker_connection.try_send(
+                    messages=[(DependencyBrokerMessageTypeEnum.Cancelled.value, request_id, is_removed)]
+                )
+            else:
+                raise Exception(f"Unexpected {DependencyBrokerMessageTypeEnum.__name__} value {message_type} from client.")
+
+    def __read(self, *, connection_index: int, broker_connection: DependencyBrokerConnection):
+        try:
+            while True:
+                try:
+                    messages = DependencyBrokerFraming.read_frame(
+                        connection=broker_connection.get_connection()
+                    )
+                except OSError:
+                    messages = None
+                if messages is None:
+                    break
+                self.__process_messages(
+                    connection_index=connection_index,
+                    broker_connection=broker_connection,
+                    messages=messages
+                )
+        finally:
+            with self.__connections_lock:
+                del self.__broker_connection_per_connection_index[connection_index]
+                waiting_key_per_dependent_id = dict(broker_connection.get_waiting_key_per_dependent_id())
+            broker_connection.close()
+            for dependent_id, key in waiting_key_per_dependent_id.items():
+                self.__single_dependent_dependency_manager.cancel(
+                    dependent=(connection_index, dependent_id),
+                    key=key
+                )
+            # the thread is forgotten once its work is done so that a long running broker only holds the threads of open connections
+            with self.__connections_lock:
+                del self.__read_thread_per_connection_index[connection_index]
+
+    def __accept(self):
+        while True:
+            try:
+                connection, _ = self.__listening_socket.accept()
+            except OSError:
+                # the listening socket was closed by dispose
+                return
+            with self.__connections_lock:
+                if self.__is_disposed:
+                    connection.close()
+                    return
+                connection_index = self.__connection_index
+                self.__connection_index += 1
+                broker_connection = DependencyBrokerConnection(
+                    connection=connection,
+                    on_undelivered_messages_callback=lambda messages: self.__on_undelivered_messages(messages=messages)
+                )
+                self.__broker_connection_per_connection_index[connection_index] = broker_connection
+                read_thread = Thread(
+                    target=self.__read,
+                    kwargs={
+                        "connection_index": connection_index,
+                        "broker_connection": broker_connection
+                    },
+                    daemon=True
+                )
+                self.__read_thread_per_connection_index[connection_index] = read_thread
+            read_thread.start()
+
+    def start(self):
+        if self.__listening_socket is not None:
+            raise Exception("Cannot start a broker that was already started.")
+        if os.path.lexists(self.__socket_path):
+            # only a socket left behind by a previous broker is replaced
+            if not stat.S_ISSOCK(os.lstat(self.__socket_path).st_mode):
+                raise Exception(f"Cannot start a broker at {self.__socket_path} since a file that is not a socket already exists there.")
+            os.unlink(self.__socket_path)
+        self.__listening_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.__listening_socket.bind(self.__socket_path)
+        # frames are unpickled, so only the user running the broker may connect, which is enforced before any connection is accepted
+        os.chmod(self.__socket_path, 0o600)
+        self.__listening_socket.listen()
+        self.__accept_thread = Thread(
+            target=self.__accept,
+            daemon=True
+        )
+        self.__accept_thread.start()
+
+    def get_connections_total(self) -> int:
+        with self.__connections_lock:
+            return len(self.__broker_connection_per_connection_index)
+
+    def dispose(self):
+        with self.__connections_lock:
+            self.__is_disposed = True
+            broker_connections = list(self.__broker_connection_per_connection_index.values())
+            read_threads = list(self.__read_thread_per_connection_index.values())
+        if self.__listening_socket is not None:
+            self.__listening_socket.shutdown(socket.SHUT_RDWR)
+            self.__listening_socket.close()
+            self.__accept_thread.join()
+            os.unlink(self.__socket_path)
+        for broker_connection in broker_connections:
+            try:
+                broker_connection.get_connection().shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        for read_thread in read_threads:
+            read_thread.join()
+        self.__single_dependent_dependency_manager.dispose()
+
+
+class DependencyBrokerClient():
+
+    def __init__(self, *, socket_path: str, on_dependent_dependency_satisfied_callback: Callable[[Any, Any, Any], None] = None, on_dependent_expired_callback: Callable[[Any, Any], None] = None):
+
+        self.__on_dependent_dependency_satisfied_callback = on_dependent_dependency_satisfied_callback
+        self.__on_dependent_expired_callback = on_dependent_expired_callback
+
+        # only the dependent ids are sent to the broker, so dependents do not need to be picklable while keys and dependencies do
+        self.__dependent_id = 0
+        self.__dependent_and_key_pair_per_dependent_id = {}  # type: Dict[int, Tuple[Any, Any]]
+        self.__request_id = 0
+        self.__cancelled_future_per_request_id = {}  # type: Dict[int, Future]
+        self.__is_reading = True
+        self.__lock = Lock()
+        self.__send_lock = Lock()
+
+        self.__connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.__connection.connect(socket_path)
+        self.__read_thread = Thread(
+            target=self.__read,
+            daemon=True
+        )
+        self.__read_thread.start()
+
+    def __read(self):
+        try:
+            while True:
+                try:
+                    messages = DependencyBrokerFraming.read_frame(
+                        connection=self.__connection
+                    )
+                except OSError:
+                    messages = None
+                if messages is None:
+                    break
+                for message in messages:
+                    message_type = DependencyBrokerMessageTypeEnum(message[0])
+                    if message_type == DependencyBrokerMessageTypeEnum.Satisfied:
+                        dependent_dependency_key_tuples = []  # type: List[Tuple[Any, Any, Any]]
+                        with self.__lock:
+                            for dependent_id, dependency, key in message[1]:
+                                dependent, _ = self.__dependent_and_key_pair_per_dependent_id.pop(dependent_id)
+                                dependent_dependency_key_tuples.append((dependent, dependency, key))
+                        for dependent_dependency_key_tuple in dependent_dependency_key_tuples:
+                            self.__on_dependent_dependency_satisfied_callback(*dependent_dependency_key_tuple)
+                    elif message_type == DependencyBrokerMessageTypeEnum.Expired:
+                        dependent_and_key_pairs = []  # type: List[Tuple[Any, Any]]
+                        with self.__lock:
+                            for dependent_id, key in message[1]:
+                                dependent_and_key_pairs.append(self.__dependent_and_key_pair_per_dependent_id.pop(dependent_id))
+                        if self.__on_dependent_expired_callback is not None:
+                            for dependent, key in dependent_and_key_pairs:
+                                self.__on_dependent_expired_callback(dependent, key)
+                    elif message_type == DependencyBrokerMessageTypeEnum.Cancelled:
+                        _, request_id, is_removed = message
+                        with self.__lock:
+                            cancelled_future = self.__cancelled_future_per_request_id.pop(request_id)
+                        cancelled_future.set_result(is_removed)
+                    else:
+                        raise Exception(f"Unexpected {DependencyBrokerMessageTypeEnum.__name__} value {message_type} from broker.")
+        finally:
+            # once nothing reads from the broker, which includes a callback raising an exception, the connection is closed and requests that were still waiting will never be answered
+            with self.__lock:
+                self.__is_reading = False
+                cancelled_futures = list(self.__cancelled_future_per_request_id.values())
+                self.__cancelled_future_per_request_id.clear()
+            try:
+                self.__connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            for cancelled_future in cancelled_futures:
+                cancelled_future.set_exception(Exception("The connection to the broker was closed."))
+
+    def __send(self, *, messages: List[Tuple]):
+        # requests are pipelined since they are written without waiting for the broker to process the previous ones
+        with self.__send_lock:
+            DependencyBrokerFraming.write_frame(
+                connection=self.__connection,
+                messages=messages
+            )
+
+    def add_dependent(self, *, dependent: Any, key: Any, priority: int = 0, timeout_seconds: float = None):
+        self.add_dependents(
+            dependent_and_key_pairs=[(dependent, key)],
+            priority=priority,
+            timeout_seconds=timeout_seconds
+        )
+
+    def add_dependents(self, *, dependent_and_key_pairs: Iterable[Tuple[Any, Any]], priority: int = 0, timeout_seconds: float = None):
+        if self.__on_dependent_dependency_satisfied_callback is None:
+            raise Exception("Cannot add a dependent without an on_dependent_dependency_satisfied_callback.")
+        dependent_id_and_key_pairs = []  # type: List[Tuple[int, Any]]
+        with self.__lock:
+            for dependent, key in dependent_and_key_pairs:
+                self.__dependent_and_key_pair_per_dependent_id[self.__dependent_id] = (dependent, key)
+                dependent_id_and_key_pairs.append((self.__dependent_id, key))
+                self.__dependent_id += 1
+        self.__send(
+            messages=[(DependencyBrokerMessageTypeEnum.AddDependents.value, priority, timeout_seconds, dependent_id_and_key_pairs)]
+        )
+
+    def add_dependency(self, *, key: Any, dependency: Any, weight: int = 1):
+        self.add_dependencies(
+            dependency_and_key_pairs=[(dependency, key)],
+            weight=weight
+        )
+
+    def add_dependencies(self, *, dependency_and_key_pairs: Iterable[Tuple[Any, Any]], weight: int = 1):
+        self.__send(
+            messages=[(DependencyBrokerMessageTypeEnum.AddDependencies.value, weight, list(dependency_and_key_pairs))]
+        )
+
+    def cancel(self, *, dependent: Any, key: Any) -> bool:
+        # the first waiting dependent from this client that is equal to the dependent stops waiting for the key
+        if current_thread() is self.__read_thread:
+            raise Exception("Cannot wait for the broker to cancel a dependent from within a callback.")
+        cancelled_future = Future()
+        with self.__lock:
+            if not self.__is_reading:
+                raise Exception("Cannot cancel a dependent after the connection to the broker was closed.")
+            for dependent_id, (waiting_dependent, waiting_key) in self.__dependent_and_key_pair_per_dependent_id.items():
+                if waiting_key == key and waiting_dependent == dependent:
+                    break
+            else:
+                return False
+            request_id = self.__request_id
+            self.__request_id += 1
+            self.__cancelled_future_per_request_id[request_id] = cancelled_future
+        self.__send(
+            messages=[(DependencyBrokerMessageTypeEnum.Cancel.value, request_id, dependent_id, key)]
+        )
+        is_removed = cancelled_future.result()
+        if is_removed:
+            with self.__lock:
+                del self.__dependent_and_key_pair_per_dependent_id[dependent_id]
+        return is_removed
+
+    def get_waiting_dependents_total(self) -> int:
+        with self.__lock:
+            return len(self.__dependent_and_key_pair_per_dependent_id)
+
+    def dispose(self):
+        try:
+            self.__connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.__read_thread.join()
+        self.__connection.close()
+
+
+class ElapsedTimer():
+
+    def __init__(self):
+
+        # TODO add ability to specify formats, etc.
+
+        self.__start_timer_value = default_timer()
+
+    def get_time_seconds(self) -> float:
+        next_timer_value = default_timer()
+        time_seconds, self.__start_timer_value = next_timer_value - self.__start_timer_value, next_timer_value
+        return time_seconds
+
+    def peek_time_seconds(self) -> float:
+        return (default_timer() - self.__start_timer_value)
+
+
+class ElapsedTimerMessageManager():
+
+    def __init__(self, *, include_datetime_prefix: bool, include_stack: bool, stack_offset: int = 0):
+
+        self.__include_datetime_prefix = include_datetime_prefix
+        self.__include_stack = include_stack
+        self.__stack_offset = stack_offset
+
+        self.__elapsed_timer = ElapsedTimer()
+        self.__elapsed_seconds_total_per_message = {}  # type: Dict[str, int]
+
+    def print(self, message: str, override_stack_offset: int = None):
+
+        elapsed_seconds = self.__elapsed_timer.get_time_seconds()
+        if message not in self.__elapsed_seconds_total_per_message:
+            self.__elapsed_seconds_total_per_message[message] = 0
+        self.__elapsed_seconds_total_per_message[message] += elapsed_seconds
+        formatted_message = f"{str(datetime.utcnow()) + ': ' if self.__include_datetime_prefix else ''}{inspect.stack()[1 + (override_stack_offset if override_stack_offset is not None else self.__stack_offset)][3] + ': ' if self.__include_stack else ''}{elapsed_seconds}: {message}"
+        print(formatted_message)
+
+    def get_elapsed_seconds_total_per_message(self) -> Dict[str, int]:
+        return self.__elapsed_seconds_total_per_message.copy()
+
+
+DateFormat_Year_Month_Day_Hour_Minute_Second_Millisecond = "%Y-%m-%d %H:%M:%S.%f"
+
+
+class SubprocessWrapper():
+
+    def __init__(self, *, command: str, arguments: List[str]):
+
+        self.__command = command
+        self.__arguments = arguments
+
+        self.__subprocess = None  # type: subprocess.Popen
+
+    def run(self) -> Tuple[int, str]:
+
+        formatted_command = [self.__command] + self.__arguments
+
+        with subprocess.Popen(formatted_command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT) as process_handle:
+            self.__subprocess = process_handle
+            process_handle.wait()
+            standard_output = process_handle.stdout.read().decode()
+            return_code = process_handle.returncode
+        self.__subprocess = None
+
+        return return_code, standard_output
+
+    def kill(self):
+        if self.__subprocess is not None:
+            self.__subprocess.kill()
+
+
+def is_directory_empty(*, directory_path: str) -> bool:
+    with os.scandir(directory_path) as scan_dir:
+        return not next(scan_dir, None)
+
+
+def delete_directory_contents(directory_path: str):
+    for file_name in os.listdir(directory_path):
+        file_path = os.path.join(directory_path, file_name)
+        if os.path.isfile(file_path):
+            os.remove(file_path)
+        elif os.path.islink(file_path):
+            os.unlink(file_path)
+        elif os.path.isdir(file_path):
+            shutil.rmtree(file_path)
+
+
+class IterationTypeEnum(StringEnum):
+    Stutter = "stutter"
+    Cycle = "cycle"
+
+
+def split_repeat(text: str, delimiter: str, is_delimiter_regex: bool, format: str, iteration_type: IterationTypeEnum, repetition_total: int) -> str:
+
+    output_elements = []  # type: List[str]
+
+    if delimiter == "" or delimiter is None:
+        text_parts = [text]
+    else:
+        if is_delimiter_regex:
+            delimiters = re.search(delimiter, text)
+            if not delimiters:
+                text_parts = [text]
+            else:
+                text_parts = []  # type: List[str]
+                while delimiters:
+                    found_delimiter = delimiters.group(0)
+                    text_part = text[:text.index(found_delimiter)]
+                    text_parts.append(text_part)
+                    text = text[text.index(found_delimiter) + len(found_delimiter):]
                     delimiters = re.search(delimiter, text)
                 if text != "":
                     text_parts.append(text)
@@ -467,134 +1961,701 @@ def split_repeat(text: str, delimiter: str, is_delimiter_regex: bool, format: st
     return "".join(output_elements)
 
 
-def get_non_maximum_suppression_rectangles(*, rectangles: List[Tuple[float, float, float, float]], overlap_threshold: float) -> List[Tuple[float, float, float, float]]:
+def _get_rectangle_intersections_and_unions_numpy(*, rectangles_array: numpy.ndarray, other_rectangles_array: numpy.ndarray) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    # (N, M) matrices of the area shared by each rectangle and each other rectangle and of the area that they cover together
+    x1 = numpy.maximum(rectangles_array[:, 0, None], other_rectangles_array[None, :, 0])
+    y1 = numpy.maximum(rectangles_array[:, 1, None], other_rectangles_array[None, :, 1])
+    x2 = numpy.minimum((rectangles_array[:, 0] + rectangles_array[:, 2])[:, None], (other_rectangles_array[:, 0] + other_rectangles_array[:, 2])[None, :])
+    y2 = numpy.minimum((rectangles_array[:, 1] + rectangles_array[:, 3])[:, None], (other_rectangles_array[:, 1] + other_rectangles_array[:, 3])[None, :])
+    intersections = numpy.maximum(0, x2 - x1) * numpy.maximum(0, y2 - y1)
+    areas = rectangles_array[:, 2] * rectangles_array[:, 3]
+    other_areas = other_rectangles_array[:, 2] * other_rectangles_array[:, 3]
+    return intersections, areas[:, None] + other_areas[None, :] - intersections
 
-    if len(rectangles) == 0:
-        return []
-    else:
 
-        areas = []  # type: List[float]
-        for rectangle in rectangles:
-            area = rectangle[2] * rectangle[3]
-            areas.append(area)
+def _get_rectangle_overlaps_numpy(*, rectangles_array: numpy.ndarray, other_rectangles_array: numpy.ndarray) -> numpy.ndarray:
+    # an (N, M) matrix of how much each rectangle overlaps each other rectangle
+    intersections, unions = _get_rectangle_intersections_and_unions_numpy(
+        rectangles_array=rectangles_array,
+        other_rectangles_array=other_rectangles_array
+    )
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        return intersections / unions
 
-        indexes = list(range(len(areas)))
-        for index, rectangle in enumerate(rectangles):
 
-            temp_indexes = [i for i in indexes if i != index]
+def _get_non_maximum_suppression_rectangle_indexes_numpy(*, rectangles: Any, overlap_threshold: float, block_size: int = 256) -> List[int]:
 
-            for temp_index in temp_indexes:
-                temp_x1 = max(rectangle[0], rectangles[temp_index][0])
-                temp_y1 = max(rectangle[1], rectangles[temp_index][1])
-                temp_x2 = min(rectangle[0] + rectangle[2], rectangles[temp_index][0] + rectangles[temp_index][2])
-                temp_y2 = min(rectangle[1] + rectangle[3], rectangles[temp_index][1] + rectangles[temp_index][3])
-                w = max(0, temp_x2 - temp_x1)
-                h = max(0, temp_y2 - temp_y1)
+    rectangles_array = numpy.asarray(rectangles, dtype=numpy.float64).reshape(-1, 4)
+    rectangles_total = rectangles_array.shape[0]
 
-                # a ratio of how much the rectangle and the rectangles[temp_index] overlap
-                overlap = (w * h) / (areas[temp_index] + areas[index] - (w * h))
+    is_kept = numpy.ones(rectangles_total, dtype=bool)
+    for block_start_index in range(0, rectangles_total, block_size):
+        block_end_index = min(block_start_index + block_size, rectangles_total)
 
-                # the higher the threshold, the rectangle will be removed since it overlaps more
-                if overlap > overlap_threshold:
-                    indexes.remove(index)
+        intersections, unions = _get_rectangle_intersections_and_unions_numpy(
+            rectangles_array=rectangles_array[block_start_index:block_end_index],
+            other_rectangles_array=rectangles_array
+        )
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            is_overlapping = intersections / unions > overlap_threshold
+        is_overlapping[numpy.arange(block_end_index - block_start_index), numpy.arange(block_start_index, block_end_index)] = False
+        # the overlap of two rectangles without area is undefined, which the python engine raises for once it compares them
+        is_undefined = unions == 0
+        is_undefined[numpy.arange(block_end_index - block_start_index), numpy.arange(block_start_index, block_end_index)] = False
+        is_undefined_row_per_block_index = is_undefined.any(axis=1)
+
+        # later rectangles have not been processed yet, so only the earlier rectangles depend on what was already removed
+        for block_index, index in enumerate(range(block_start_index, block_end_index)):
+            is_overlapping_row = is_overlapping[block_index]
+            if is_undefined_row_per_block_index[block_index]:
+                # the rectangles are compared in order until the first overlap, so an undefined overlap only raises if it comes first
+                is_compared_undefined_row = is_undefined[block_index] & is_kept
+                if is_compared_undefined_row.any():
+                    is_compared_overlapping_row = is_overlapping_row & is_kept
+                    if not is_compared_overlapping_row.any() or numpy.argmax(is_compared_undefined_row) < numpy.argmax(is_compared_overlapping_row):
+                        raise ZeroDivisionError(f"Cannot find the overlap of rectangle {index} and rectangle {numpy.argmax(is_compared_undefined_row)} since neither has an area.")
+            if is_overlapping_row[index + 1:].any() or (is_overlapping_row[:index] & is_kept[:index]).any():
+                is_kept[index] = False
+
+    return numpy.flatnonzero(is_kept).tolist()
+
+
+def _get_non_maximum_suppression_rectangle_indexes_python(*, rectangles: List[Tuple[float, float, float, float]], overlap_threshold: float) -> List[int]:
+
+    areas = []  # type: List[float]
+    for rectangle in rectangles:
+        area = rectangle[2] * rectangle[3]
+        areas.append(area)
+
+    is_kept = [True] * len(rectangles)  # type: List[bool]
+    for index, rectangle in enumerate(rectangles):
+        for temp_index, temp_rectangle in enumerate(rectangles):
+            if temp_index == index or not is_kept[temp_index]:
+                continue
+
+            temp_x1 = max(rectangle[0], temp_rectangle[0])
+            temp_y1 = max(rectangle[1], temp_rectangle[1])
+            temp_x2 = min(rectangle[0] + rectangle[2], temp_rectangle[0] + temp_rectangle[2])
+            temp_y2 = min(rectangle[1] + rectangle[3], temp_rectangle[1] + temp_rectangle[3])
+            w = max(0, temp_x2 - temp_x1)
+            h = max(0, temp_y2 - temp_y1)
+
+            # a ratio of how much the rectangle and the rectangles[temp_index] overlap
+            overlap = (w * h) / (areas[temp_index] + areas[index] - (w * h))
+
+            # the higher the threshold, the rectangle will be removed since it overlaps more
+            if overlap > overlap_threshold:
+                is_kept[index] = False
+                break
+
+    return [index for index in range(len(rectangles)) if is_kept[index]]
+
+
+def _get_score_ordered_non_maximum_suppression_rectangle_indexes(*, rectangles: List[Tuple[float, float, float, float]], overlap_threshold: float, scores: List[float]) -> List[int]:
+
+    if numpy is not None and isinstance(rectangles, numpy.ndarray):
+        rectangles = rectangles.tolist()
+
+    rectangles_total = len(rectangles)
+    if len(scores) != rectangles_total:
+        raise Exception(f"Expected {rectangles_total} scores but found {len(scores)}.")
+
+    # the highest scoring rectangles are kept first and can only suppress lower scoring rectangles
+    ordered_indexes = sorted(range(rectangles_total), key=scores.__getitem__, reverse=True)
+
+    if overlap_threshold < 0:
+        # even rectangles that do not touch overlap more than the threshold
+        return [ordered_indexes[0]]
+
+    # kept rectangles are placed into each grid cell that they cover so that only nearby rectangles are compared
+    # the median size is used since a few huge rectangles would make the mean, and so every cell, too large to tell nearby rectangles apart
+    cell_width = max(sorted(rectangle[2] for rectangle in rectangles)[rectangles_total // 2], 1e-9)
+    cell_height = max(sorted(rectangle[3] for rectangle in rectangles)[rectangles_total // 2], 1e-9)
+    kept_indexes_per_cell = {}  # type: Dict[Tuple[int, int], List[int]]
+    # rectangles that would cover more than the maximum number of cells are kept apart and compared with every rectangle instead
+    maximum_cells_total = 64
+    kept_oversized_indexes = []  # type: List[int]
+    compared_index_per_index = [-1] * rectangles_total  # type: List[int]
+
+    kept_indexes = []  # type: List[int]
+    for index in ordered_indexes:
+        x1, y1, width, height = rectangles[index]
+        x2 = x1 + width
+        y2 = y1 + height
+        area = width * height
+        cell_x_range = range(int(x1 // cell_width), int(x2 // cell_width) + 1)
+        cell_y_range = range(int(y1 // cell_height), int(y2 // cell_height) + 1)
+        is_oversized = len(cell_x_range) * len(cell_y_range) > maximum_cells_total
+        if is_oversized:
+            cells = []  # type: List[Tuple[int, int]]
+            # other oversized rectangles are the most likely to suppress it, so they are compared first
+            compared_indexes_iterables = [kept_oversized_indexes, kept_indexes]  # type: List[Iterable[int]]
+        else:
+            cells = [(cell_x, cell_y) for cell_x in cell_x_range for cell_y in cell_y_range]
+            compared_indexes_iterables = [kept_oversized_indexes]
+            compared_indexes_iterables.extend(kept_indexes_per_cell.get(cell, ()) for cell in cells)
+
+        is_suppressed = False
+        for compared_indexes in compared_indexes_iterables:
+            for kept_index in compared_indexes:
+                if compared_index_per_index[kept_index] == index:
+                    continue
+                compared_index_per_index[kept_index] = index
+
+                kept_x1, kept_y1, kept_width, kept_height = rectangles[kept_index]
+                w = min(x2, kept_x1 + kept_width) - max(x1, kept_x1)
+                h = min(y2, kept_y1 + kept_height) - max(y1, kept_y1)
+                if w <= 0 or h <= 0:
+                    continue
+                union = area + kept_width * kept_height - w * h
+                if union > 0 and (w * h) / union > overlap_threshold:
+                    is_suppressed = True
                     break
+            if is_suppressed:
+                break
+
+        if not is_suppressed:
+            kept_indexes.append(index)
+            if is_oversized:
+                kept_oversized_indexes.append(index)
+            for cell in cells:
+                if cell in kept_indexes_per_cell:
+                    kept_indexes_per_cell[cell].append(index)
+                else:
+                    kept_indexes_per_cell[cell] = [index]
 
-        return [rectangle for rectangle_index, rectangle in enumerate(rectangles) if rectangle_index in indexes]
+    kept_indexes.sort()
+    return kept_indexes
 
 
-def get_average_rectangles(*, rectangles: List[Tuple[float, float, float, float]], overlap_threshold: float) -> List[Tuple[float, float, float, float]]:
+def get_non_maximum_suppression_rectangle_indexes(*, rectangles: List[Tuple[float, float, float, float]], overlap_threshold: float, is_numpy_preferred: bool = True, scores: List[float] = None) -> List[int]:
+    if len(rectangles) == 0:
+        return []
+    if scores is not None:
+        return _get_score_ordered_non_maximum_suppression_rectangle_indexes(
+            rectangles=rectangles,
+            overlap_threshold=overlap_threshold,
+            scores=scores
+        )
+    if is_numpy_preferred and numpy is not None:
+        return _get_non_maximum_suppression_rectangle_indexes_numpy(
+            rectangles=rectangles,
+            overlap_threshold=overlap_threshold
+        )
+    return _get_non_maximum_suppression_rectangle_indexes_python(
+        rectangles=rectangles,
+        overlap_threshold=overlap_threshold
+    )
+
+
+def get_non_maximum_suppression_rectangles(*, rectangles: List[Tuple[float, float, float, float]], overlap_threshold: float, is_numpy_preferred: bool = True, scores: List[float] = None) -> List[Tuple[float, float, float, float]]:
 
     if len(rectangles) == 0:
         return []
     else:
 
-        areas = []  # type: List[float]
-        for rectangle in rectangles:
-            area = rectangle[2] * rectangle[3]
-            areas.append(area)
+        indexes = get_non_maximum_suppression_rectangle_indexes(
+            rectangles=rectangles,
+            overlap_threshold=overlap_threshold,
+            is_numpy_preferred=is_numpy_preferred,
+            scores=scores
+        )
 
-        nearby_rectangle_indexes_per_rectangle_index = {}  # type: Dict[int, List[int]]
-        nearby_rectangle_indexes_magnitude_per_rectangle_index = {}  # type: Dict[int, float]
+        # an (N, 4) array stays an array so that callers using numpy do not pay for a conversion
+        if numpy is not None and isinstance(rectangles, numpy.ndarray):
+            return rectangles[indexes]
+        return [rectangles[index] for index in indexes]
 
-        indexes = list(range(len(areas)))
-        for index, rectangle in enumerate(rectangles):
 
-            nearby_rectangle_indexes_per_rectangle_index[index] = []  # type: List[int]
-            nearby_rectangle_indexes_magnitude_per_rectangle_index[index] = 0.0  # type: float
-            temp_indexes = [i for i in indexes if i != index]
+def _get_overlapping_rectangle_index_pairs_numpy(*, rectangles: Any, overlap_threshold: float, block_size: int = 256) -> List[Tuple[int, int, float]]:
 
-            for temp_index in temp_indexes:
-                temp_x1 = max(rectangle[0], rectangles[temp_index][0])
-                temp_y1 = max(rectangle[1], rectangles[temp_index][1])
-                temp_x2 = min(rectangle[0] + rectangle[2], rectangles[temp_index][0] + rectangles[temp_index][2])
-                temp_y2 = min(rectangle[1] + rectangle[3], rectangles[temp_index][1] + rectangles[temp_index][3])
-                w = max(0, temp_x2 - temp_x1)
-                h = max(0, temp_y2 - temp_y1)
+    rectangles_array = numpy.asarray(rectangles, dtype=numpy.float64).reshape(-1, 4)
+    rectangles_total = rectangles_array.shape[0]
 
-                # a ratio of how much the rectangle and the rectangles[temp_index] overlap
-                overlap = (w * h) / (areas[temp_index] + areas[index] - (w * h))
-                print(f"{index}: overlap from {rectangle} to {rectangles[temp_index]} with {overlap}.")
+    pairs = []  # type: List[Tuple[int, int, float]]
+    for block_start_index in range(0, rectangles_total, block_size):
+        block_end_index = min(block_start_index + block_size, rectangles_total)
 
-                # the higher the threshold, the rectangle will be removed since it overlaps more
-                if overlap > overlap_threshold:
-                    nearby_rectangle_indexes_per_rectangle_index[index].append(temp_index)
-                    nearby_rectangle_indexes_magnitude_per_rectangle_index[index] += overlap
+        overlaps = _get_rectangle_overlaps_numpy(
+            rectangles_array=rectangles_array[block_start_index:block_end_index],
+            other_rectangles_array=rectangles_array[block_start_index:]
+        )
+        # only keep each pair once, where the first index is less than the second index
+        is_pair = numpy.triu(overlaps > overlap_threshold, k=1)
+        block_indexes, other_indexes = numpy.nonzero(is_pair)
+        pairs.extend(zip(
+            (block_indexes + block_start_index).tolist(),
+            (other_indexes + block_start_index).tolist(),
+            overlaps[block_indexes, other_indexes].tolist()
+        ))
+    return pairs
 
-        # start with the rectangles that have the most nearby rectangles
-        used_rectangle_index = set()
-        averaged_rectangles = []  # type: List[Tuple[float, float, float, float]]
-        for rectangle_index in sorted(nearby_rectangle_indexes_magnitude_per_rectangle_index, key=nearby_rectangle_indexes_magnitude_per_rectangle_index.get, reverse=True):
 
-            if rectangle_index not in used_rectangle_index:
+def _get_overlapping_rectangle_index_pairs_python(*, rectangles: List[Tuple[float, float, float, float]], overlap_threshold: float) -> List[Tuple[int, int, float]]:
 
-                used_rectangle_index.add(rectangle_index)
+    rectangles_total = len(rectangles)
 
-                acceptable_rectangle_indexes = []  # type: List[int]
-                for nearby_rectangle_index in nearby_rectangle_indexes_per_rectangle_index[rectangle_index]:
-                    if nearby_rectangle_index not in used_rectangle_index:
-                        acceptable_rectangle_indexes.append(nearby_rectangle_index)
-                acceptable_rectangle_indexes.append(rectangle_index)
+    # sweeping along x means that rectangles which cannot overlap are never compared, unless a threshold below zero makes every pair overlap
+    if overlap_threshold < 0:
+        ordered_indexes = list(range(rectangles_total))
+    else:
+        ordered_indexes = sorted(range(rectangles_total), key=lambda index: rectangles[index][0])
+
+    pairs = []  # type: List[Tuple[int, int, float]]
+    for ordered_index, index in enumerate(ordered_indexes):
+        rectangle = rectangles[index]
+        x2 = rectangle[0] + rectangle[2]
+        area = rectangle[2] * rectangle[3]
+        # the remaining indexes are walked in place, since copying them for every rectangle would cost as much as comparing all pairs
+        for other_ordered_index in range(ordered_index + 1, rectangles_total):
+            other_index = ordered_indexes[other_ordered_index]
+            other_rectangle = rectangles[other_index]
+            if overlap_threshold >= 0 and other_rectangle[0] >= x2:
+                break
+            w = max(0, min(x2, other_rectangle[0] + other_rectangle[2]) - max(rectangle[0], other_rectangle[0]))
+            h = max(0, min(rectangle[1] + rectangle[3], other_rectangle[1] + other_rectangle[3]) - max(rectangle[1], other_rectangle[1]))
+            union = area + other_rectangle[2] * other_rectangle[3] - (w * h)
+            overlap = (w * h) / union if union > 0 else 0.0
+            if overlap > overlap_threshold:
+                if index < other_index:
+                    pairs.append((index, other_index, overlap))
+                else:
+                    pairs.append((other_index, index, overlap))
+    return pairs
 
-                if acceptable_rectangle_indexes:
 
-                    x1 = 0
-                    y1 = 0
-                    x2 = 0
-                    y2 = 0
+def get_overlapping_rectangle_index_pairs(*, rectangles: List[Tuple[float, float, float, float]], overlap_threshold: float, is_numpy_preferred: bool = True) -> List[Tuple[int, int, float]]:
+    if len(rectangles) == 0:
+        return []
+    if is_numpy_preferred and numpy is not None:
+        return _get_overlapping_rectangle_index_pairs_numpy(
+            rectangles=rectangles,
+            overlap_threshold=overlap_threshold
+        )
+    return _get_overlapping_rectangle_index_pairs_python(
+        rectangles=rectangles,
+        overlap_threshold=overlap_threshold
+    )
 
-                    for acceptable_rectangle_index in acceptable_rectangle_indexes:
-                        x1 += rectangles[acceptable_rectangle_index][0]
-                        y1 += rectangles[acceptable_rectangle_index][1]
-                        x2 += rectangles[acceptable_rectangle_index][0] + rectangles[acceptable_rectangle_index][2]
-                        y2 += rectangles[acceptable_rectangle_index][1] + rectangles[acceptable_rectangle_index][3]
 
-                        used_rectangle_index.add(acceptable_rectangle_index)
+def _get_averaged_rectangle(*, rectangles: List[Tuple[float, float, float, float]], indexes: List[int]) -> Tuple[float, float, float, float]:
 
-                    x1 /= len(acceptable_rectangle_indexes)
-                    y1 /= len(acceptable_rectangle_indexes)
-                    x2 /= len(acceptable_rectangle_indexes)
-                    y2 /= len(acceptable_rectangle_indexes)
+    x1 = 0
+    y1 = 0
+    x2 = 0
+    y2 = 0
 
-                    averaged_rectangles.append((x1, y1, x2 - x1, y2 - y1))
+    for index in indexes:
+        x1 += rectangles[index][0]
+        y1 += rectangles[index][1]
+        x2 += rectangles[index][0] + rectangles[index][2]
+        y2 += rectangles[index][1] + rectangles[index][3]
 
-        return averaged_rectangles
+    x1 /= len(indexes)
+    y1 /= len(indexes)
+    x2 /= len(indexes)
+    y2 /= len(indexes)
 
+    return (x1, y1, x2 - x1, y2 - y1)
 
-def get_unique_directory_path(*, parent_directory_path: str) -> str:
-    _child_directory_path = None
-    while _child_directory_path is None:
-        _child_directory_name = str(uuid.uuid4())
-        _child_directory_path = os.path.join(parent_directory_path, _child_directory_name)
-        if os.path.exists(_child_directory_path):
-            _child_directory_path = None
-    return _child_directory_path
 
+def get_average_rectangles(*, rectangles: List[Tuple[float, float, float, float]], overlap_threshold: float, is_numpy_preferred: bool = True, is_clustered: bool = False, on_overlapping_rectangles_callback: Callable[[int, int, float], None] = None) -> List[Tuple[float, float, float, float]]:
 
-def get_unique_file_path(*, parent_directory_path: str, extension: str) -> str:
-    _formatted_extension = extension if extension.startswith(".") else f".{extension}"
-    _child_file_path = None
-    while _child_file_path is None:
-        _child_file_name = f"{uuid.uuid4()}{_formatted_extension}"
+    if len(rectangles) == 0:
+        return []
+    else:
+
+        if numpy is not None and isinstance(rectangles, numpy.ndarray):
+            rectangles = rectangles.tolist()
+
+        pairs = get_overlapping_rectangle_index_pairs(
+            rectangles=rectangles,
+            overlap_threshold=overlap_threshold,
+            is_numpy_preferred=is_numpy_preferred
+        )
+
+        if on_overlapping_rectangles_callback is not None:
+            for index, other_index, overlap in pairs:
+                on_overlapping_rectangles_callback(index, other_index, overlap)
+
+        if is_clustered:
+
+            # every rectangle that is connected through a chain of overlapping rectangles is averaged together
+            parent_index_per_index = list(range(len(rectangles)))  # type: List[int]
+
+            def get_root_index(index: int) -> int:
+                while parent_index_per_index[index] != index:
+                    parent_index_per_index[index] = parent_index_per_index[parent_index_per_index[index]]
+                    index = parent_index_per_index[index]
+                return index
+
+            for index, other_index, _ in pairs:
+                root_index = get_root_index(index)
+                other_root_index = get_root_index(other_index)
+                if root_index != other_root_index:
+                    parent_index_per_index[max(root_index, other_root_index)] = min(root_index, other_root_index)
+
+            indexes_per_root_index = {}  # type: Dict[int, List[int]]
+            for index in range(len(rectangles)):
+                root_index = get_root_index(index)
+                if root_index in indexes_per_root_index:
+                    indexes_per_root_index[root_index].append(index)
+                else:
+                    indexes_per_root_index[root_index] = [index]
+
+            return [
+                _get_averaged_rectangle(
+                    rectangles=rectangles,
+                    indexes=indexes
+                ) for indexes in indexes_per_root_index.values()
+            ]
+
+        nearby_rectangle_index_and_overlap_pairs_per_rectangle_index = [[] for _ in range(len(rectangles))]  # type: List[List[Tuple[int, float]]]
+        for index, other_index, overlap in pairs:
+            nearby_rectangle_index_and_overlap_pairs_per_rectangle_index[index].append((other_index, overlap))
+            nearby_rectangle_index_and_overlap_pairs_per_rectangle_index[other_index].append((index, overlap))
+
+        nearby_rectangle_indexes_per_rectangle_index = {}  # type: Dict[int, List[int]]
+        nearby_rectangle_indexes_magnitude_per_rectangle_index = {}  # type: Dict[int, float]
+        for index, nearby_rectangle_index_and_overlap_pairs in enumerate(nearby_rectangle_index_and_overlap_pairs_per_rectangle_index):
+            nearby_rectangle_index_and_overlap_pairs.sort()
+            nearby_rectangle_indexes_per_rectangle_index[index] = [nearby_rectangle_index for nearby_rectangle_index, _ in nearby_rectangle_index_and_overlap_pairs]
+            nearby_rectangle_indexes_magnitude_per_rectangle_index[index] = 0.0
+            for _, overlap in nearby_rectangle_index_and_overlap_pairs:
+                nearby_rectangle_indexes_magnitude_per_rectangle_index[index] += overlap
+
+        # start with the rectangles that have the most nearby rectangles
+        used_rectangle_index = set()
+        averaged_rectangles = []  # type: List[Tuple[float, float, float, float]]
+        for rectangle_index in sorted(nearby_rectangle_indexes_magnitude_per_rectangle_index, key=nearby_rectangle_indexes_magnitude_per_rectangle_index.get, reverse=True):
+
+            if rectangle_index not in used_rectangle_index:
+
+                used_rectangle_index.add(rectangle_index)
+
+                acceptable_rectangle_indexes = []  # type: List[int]
+                for nearby_rectangle_index in nearby_rectangle_indexes_per_rectangle_index[rectangle_index]:
+                    if nearby_rectangle_index not in used_rectangle_index:
+                        acceptable_rectangle_indexes.append(nearby_rectangle_index)
+                acceptable_rectangle_indexes.append(rectangle_index)
+
+                used_rectangle_index.update(acceptable_rectangle_indexes)
+
+                averaged_rectangles.append(_get_averaged_rectangle(
+                    rectangles=rectangles,
+                    indexes=acceptable_rectangle_indexes
+                ))
+
+        return averaged_rectangles
+
+
+def _get_items_per_frame(*, items: Any, frame_offsets: List[int]) -> List[Any]:
+    # each offset is where its frame starts and the frame ends where the next frame starts
+    items_total = len(items)
+    if len(frame_offsets) == 0:
+        if items_total != 0:
+            raise Exception(f"Expected frame offsets for {items_total} items but found none.")
+    elif frame_offsets[0] != 0:
+        raise Exception(f"Expected the first frame offset to be 0 but found {frame_offsets[0]}.")
+    previous_frame_offset = 0
+    for frame_offset in frame_offsets:
+        if frame_offset < previous_frame_offset or frame_offset > items_total:
+            raise Exception(f"Expected frame offsets that do not decrease and are at most {items_total} but found {frame_offset} after {previous_frame_offset}.")
+        previous_frame_offset = frame_offset
+    items_per_frame = []  # type: List[Any]
+    for frame_index, frame_offset in enumerate(frame_offsets):
+        next_frame_offset = frame_offsets[frame_index + 1] if frame_index + 1 < len(frame_offsets) else len(items)
+        items_per_frame.append(items[frame_offset:next_frame_offset])
+    return items_per_frame
+
+
+def _call_method(method: Callable[..., Any], keyword_arguments: Dict[str, Any]) -> Any:
+    return method(**keyword_arguments)
+
+
+def _get_results_per_frame(*, method: Callable[..., Any], keyword_arguments_per_frame: List[Dict[str, Any]], processes_total: int) -> List[Any]:
+    if processes_total is None or processes_total <= 1 or len(keyword_arguments_per_frame) <= 1:
+        return [method(**keyword_arguments) for keyword_arguments in keyword_arguments_per_frame]
+    # frames are sent to the processes in chunks so that each process is not waiting on one frame at a time
+    chunk_size = max(1, len(keyword_arguments_per_frame) // (processes_total * 4))
+    with ProcessPoolExecutor(max_workers=processes_total) as executor:
+        return list(executor.map(_call_method, repeat(method), keyword_arguments_per_frame, chunksize=chunk_size))
+
+
+def _get_rectangles_per_frame(*, rectangles_per_frame: List[List[Tuple[float, float, float, float]]], rectangles: Any, frame_offsets: List[int]) -> List[Any]:
+    if rectangles_per_frame is not None:
+        return list(rectangles_per_frame)
+    if rectangles is None or frame_offsets is None:
+        raise Exception(f"Either rectangles_per_frame or both rectangles and frame_offsets must be provided.")
+    return _get_items_per_frame(
+        items=rectangles,
+        frame_offsets=frame_offsets
+    )
+
+
+def get_non_maximum_suppression_rectangles_per_frame(*, overlap_threshold: float, rectangles_per_frame: List[List[Tuple[float, float, float, float]]] = None, rectangles: Any = None, frame_offsets: List[int] = None, scores_per_frame: List[List[float]] = None, scores: List[float] = None, is_numpy_preferred: bool = True, processes_total: int = None) -> List[List[Tuple[float, float, float, float]]]:
+
+    rectangles_per_frame = _get_rectangles_per_frame(
+        rectangles_per_frame=rectangles_per_frame,
+        rectangles=rectangles,
+        frame_offsets=frame_offsets
+    )
+    if scores_per_frame is None and scores is not None:
+        if frame_offsets is None:
+            raise Exception(f"Scores can only be provided with frame_offsets, otherwise scores_per_frame must be provided.")
+        scores_per_frame = _get_items_per_frame(
+            items=scores,
+            frame_offsets=frame_offsets
+        )
+
+    keyword_arguments_per_frame = []  # type: List[Dict[str, Any]]
+    for frame_index, frame_rectangles in enumerate(rectangles_per_frame):
+        keyword_arguments_per_frame.append({
+            "rectangles": frame_rectangles,
+            "overlap_threshold": overlap_threshold,
+            "is_numpy_preferred": is_numpy_preferred,
+            "scores": None if scores_per_frame is None else scores_per_frame[frame_index]
+        })
+
+    return _get_results_per_frame(
+        method=get_non_maximum_suppression_rectangles,
+        keyword_arguments_per_frame=keyword_arguments_per_frame,
+        processes_total=processes_total
+    )
+
+
+def get_average_rectangles_per_frame(*, overlap_threshold: float, rectangles_per_frame: List[List[Tuple[float, float, float, float]]] = None, rectangles: Any = None, frame_offsets: List[int] = None, is_numpy_preferred: bool = True, is_clustered: bool = False, processes_total: int = None) -> List[List[Tuple[float, float, float, float]]]:
+
+    rectangles_per_frame = _get_rectangles_per_frame(
+        rectangles_per_frame=rectangles_per_frame,
+        rectangles=rectangles,
+        frame_offsets=frame_offsets
+    )
+
+    keyword_arguments_per_frame = []  # type: List[Dict[str, Any]]
+    for frame_rectangles in rectangles_per_frame:
+        keyword_arguments_per_frame.append({
+            "rectangles": frame_rectangles,
+            "overlap_threshold": overlap_threshold,
+            "is_numpy_preferred": is_numpy_preferred,
+            "is_clustered": is_clustered
+        })
+
+    return _get_results_per_frame(
+        method=get_average_rectangles,
+        keyword_arguments_per_frame=keyword_arguments_per_frame,
+        processes_total=processes_total
+    )
+
+
+class IncrementalRectangleSuppressor():
+
+    def __init__(self, *, overlap_threshold: float, cell_size: float = None):
+
+        if overlap_threshold < 0:
+            raise Exception(f"Overlap threshold must not be negative for incremental suppression but was {overlap_threshold}.")
+
+        self.__overlap_threshold = overlap_threshold
+        self.__cell_size = cell_size
+        # a cell size that was not given follows the size of the rectangles, which can change from one update to the next
+        self.__is_cell_size_fixed = cell_size is not None
+        self.__cell_sized_rectangles_total = 0
+
+        self.__next_rectangle_id = 0
+        self.__rectangle_per_rectangle_id = {}  # type: Dict[int, Tuple[float, float, float, float]]
+        self.__score_per_rectangle_id = {}  # type: Dict[int, float]
+        self.__cells_per_rectangle_id = {}  # type: Dict[int, List[Tuple[int, int]]]
+        self.__rectangle_ids_per_cell = {}  # type: Dict[Tuple[int, int], Set[int]]
+        # rectangles that would cover more than the maximum number of cells are kept apart and compared with every rectangle instead
+        self.__maximum_cells_total = 64
+        self.__oversized_rectangle_ids = set()  # type: Set[int]
+        self.__kept_rectangle_ids = set()  # type: Set[int]
+
+    def __is_higher_priority(self, *, rectangle_id: int, other_rectangle_id: int) -> bool:
+        # higher scores come first and older rectangles come first when the scores are equal, just like score ordered suppression
+        score = self.__score_per_rectangle_id[rectangle_id]
+        other_score = self.__score_per_rectangle_id[other_rectangle_id]
+        return score > other_score or (score == other_score and rectangle_id < other_rectangle_id)
+
+    def __get_overlapping_rectangle_ids(self, *, rectangle_id: int) -> Set[int]:
+        x1, y1, width, height = self.__rectangle_per_rectangle_id[rectangle_id]
+        x2 = x1 + width
+        y2 = y1 + height
+        area = width * height
+
+        if rectangle_id in self.__oversized_rectangle_ids:
+            compared_rectangle_ids_iterables = [self.__rectangle_per_rectangle_id]  # type: List[Iterable[int]]
+        else:
+            compared_rectangle_ids_iterables = [self.__oversized_rectangle_ids]
+            compared_rectangle_ids_iterables.extend(self.__rectangle_ids_per_cell[cell] for cell in self.__cells_per_rectangle_id[rectangle_id])
+
+        overlapping_rectangle_ids = set()  # type: Set[int]
+        compared_rectangle_ids = {rectangle_id}  # type: Set[int]
+        for other_rectangle_ids in compared_rectangle_ids_iterables:
+            for other_rectangle_id in other_rectangle_ids:
+                if other_rectangle_id in compared_rectangle_ids:
+                    continue
+                compared_rectangle_ids.add(other_rectangle_id)
+
+                other_x1, other_y1, other_width, other_height = self.__rectangle_per_rectangle_id[other_rectangle_id]
+                w = min(x2, other_x1 + other_width) - max(x1, other_x1)
+                h = min(y2, other_y1 + other_height) - max(y1, other_y1)
+                if w <= 0 or h <= 0:
+                    continue
+                union = area + other_width * other_height - w * h
+                if union > 0 and (w * h) / union > self.__overlap_threshold:
+                    overlapping_rectangle_ids.add(other_rectangle_id)
+        return overlapping_rectangle_ids
+
+    def __place_rectangle(self, *, rectangle_id: int):
+        x1, y1, width, height = self.__rectangle_per_rectangle_id[rectangle_id]
+        cell_x_range = range(int(x1 // self.__cell_size), int((x1 + width) // self.__cell_size) + 1)
+        cell_y_range = range(int(y1 // self.__cell_size), int((y1 + height) // self.__cell_size) + 1)
+        if len(cell_x_range) * len(cell_y_range) > self.__maximum_cells_total:
+            cells = []  # type: List[Tuple[int, int]]
+            self.__oversized_rectangle_ids.add(rectangle_id)
+        else:
+            cells = [(cell_x, cell_y) for cell_x in cell_x_range for cell_y in cell_y_range]
+            for cell in cells:
+                if cell in self.__rectangle_ids_per_cell:
+                    self.__rectangle_ids_per_cell[cell].add(rectangle_id)
+                else:
+                    self.__rectangle_ids_per_cell[cell] = {rectangle_id}
+        self.__cells_per_rectangle_id[rectangle_id] = cells
+
+    def __try_resize_cells(self):
+        # the size is checked again whenever the number of rectangles has doubled or halved since it was chosen, so that checking it stays cheap per rectangle
+        rectangles_total = len(self.__rectangle_per_rectangle_id)
+        if self.__is_cell_size_fixed or not rectangles_total or (self.__cell_size is not None and self.__cell_sized_rectangles_total <= rectangles_total * 2 and rectangles_total <= self.__cell_sized_rectangles_total * 2):
+            return
+        self.__cell_sized_rectangles_total = rectangles_total
+        # the median size is used since a few huge rectangles would make every cell too large to tell nearby rectangles apart
+        cell_size = max(sorted(max(rectangle[2], rectangle[3]) for rectangle in self.__rectangle_per_rectangle_id.values())[rectangles_total // 2], 1e-9)
+        if self.__cell_size is not None and self.__cell_size / 2 <= cell_size <= self.__cell_size * 2:
+            return
+        self.__cell_size = cell_size
+        self.__rectangle_ids_per_cell.clear()
+        self.__oversized_rectangle_ids.clear()
+        for rectangle_id in self.__rectangle_per_rectangle_id:
+            self.__place_rectangle(
+                rectangle_id=rectangle_id
+            )
+
+    def __add_rectangle(self, *, rectangle: Tuple[float, float, float, float], score: float) -> int:
+        rectangle_id = self.__next_rectangle_id
+        self.__next_rectangle_id += 1
+
+        self.__rectangle_per_rectangle_id[rectangle_id] = tuple(rectangle)
+        self.__score_per_rectangle_id[rectangle_id] = score
+        if self.__cell_size is not None:
+            self.__place_rectangle(
+                rectangle_id=rectangle_id
+            )
+        return rectangle_id
+
+    def __remove_rectangle(self, *, rectangle_id: int):
+        for cell in self.__cells_per_rectangle_id[rectangle_id]:
+            self.__rectangle_ids_per_cell[cell].remove(rectangle_id)
+            if not self.__rectangle_ids_per_cell[cell]:
+                del self.__rectangle_ids_per_cell[cell]
+        del self.__rectangle_per_rectangle_id[rectangle_id]
+        del self.__score_per_rectangle_id[rectangle_id]
+        del self.__cells_per_rectangle_id[rectangle_id]
+        self.__oversized_rectangle_ids.discard(rectangle_id)
+        self.__kept_rectangle_ids.discard(rectangle_id)
+
+    def update(self, *, added_rectangles: List[Tuple[float, float, float, float]] = None, added_scores: List[float] = None, removed_rectangle_ids: Iterable[int] = None) -> List[int]:
+
+        if added_rectangles is None:
+            added_rectangles = []
+        if added_scores is not None and len(added_scores) != len(added_rectangles):
+            raise Exception(f"Expected {len(added_rectangles)} scores but found {len(added_scores)}.")
+
+        if removed_rectangle_ids is None:
+            removed_rectangle_ids = []
+        else:
+            # nothing is changed unless every removal is valid
+            removed_rectangle_ids = list(removed_rectangle_ids)
+            unremovable_rectangle_ids = [rectangle_id for rectangle_id in removed_rectangle_ids if rectangle_id not in self.__rectangle_per_rectangle_id]
+            if unremovable_rectangle_ids:
+                raise Exception(f"Cannot remove rectangle ids {unremovable_rectangle_ids} since they were never added or were already removed.")
+            if len(set(removed_rectangle_ids)) != len(removed_rectangle_ids):
+                raise Exception(f"Cannot remove the same rectangle id more than once but found {removed_rectangle_ids}.")
+
+        # only the rectangles near a change are evaluated again, in priority order, since a rectangle is kept when no kept rectangle of higher priority overlaps it
+        dirty_rectangle_ids = set()  # type: Set[int]
+
+        if removed_rectangle_ids:
+            for rectangle_id in removed_rectangle_ids:
+                if rectangle_id in self.__kept_rectangle_ids:
+                    for overlapping_rectangle_id in self.__get_overlapping_rectangle_ids(rectangle_id=rectangle_id):
+                        if self.__is_higher_priority(rectangle_id=rectangle_id, other_rectangle_id=overlapping_rectangle_id):
+                            dirty_rectangle_ids.add(overlapping_rectangle_id)
+                self.__remove_rectangle(rectangle_id=rectangle_id)
+                dirty_rectangle_ids.discard(rectangle_id)
+
+        added_rectangle_ids = []  # type: List[int]
+        for rectangle_index, rectangle in enumerate(added_rectangles):
+            rectangle_id = self.__add_rectangle(
+                rectangle=rectangle,
+                score=0.0 if added_scores is None else added_scores[rectangle_index]
+            )
+            added_rectangle_ids.append(rectangle_id)
+            dirty_rectangle_ids.add(rectangle_id)
+        self.__try_resize_cells()
+
+        dirty_rectangle_id_heap = [(-self.__score_per_rectangle_id[rectangle_id], rectangle_id) for rectangle_id in dirty_rectangle_ids]
+        heapq.heapify(dirty_rectangle_id_heap)
+        while dirty_rectangle_id_heap:
+            _, rectangle_id = heapq.heappop(dirty_rectangle_id_heap)
+            if rectangle_id not in dirty_rectangle_ids:
+                continue
+            dirty_rectangle_ids.remove(rectangle_id)
+
+            overlapping_rectangle_ids = self.__get_overlapping_rectangle_ids(rectangle_id=rectangle_id)
+            is_kept = True
+            for overlapping_rectangle_id in overlapping_rectangle_ids:
+                if overlapping_rectangle_id in self.__kept_rectangle_ids and self.__is_higher_priority(rectangle_id=overlapping_rectangle_id, other_rectangle_id=rectangle_id):
+                    is_kept = False
+                    break
+
+            if is_kept != (rectangle_id in self.__kept_rectangle_ids):
+                if is_kept:
+                    self.__kept_rectangle_ids.add(rectangle_id)
+                else:
+                    self.__kept_rectangle_ids.remove(rectangle_id)
+                for overlapping_rectangle_id in overlapping_rectangle_ids:
+                    if overlapping_rectangle_id not in dirty_rectangle_ids and self.__is_higher_priority(rectangle_id=rectangle_id, other_rectangle_id=overlapping_rectangle_id):
+                        dirty_rectangle_ids.add(overlapping_rectangle_id)
+                        heapq.heappush(dirty_rectangle_id_heap, (-self.__score_per_rectangle_id[overlapping_rectangle_id], overlapping_rectangle_id))
+
+        return added_rectangle_ids
+
+    def get_rectangle_ids(self) -> List[int]:
+        return sorted(self.__kept_rectangle_ids)
+
+    def get_rectangles(self) -> List[Tuple[float, float, float, float]]:
+        return [self.__rectangle_per_rectangle_id[rectangle_id] for rectangle_id in sorted(self.__kept_rectangle_ids)]
+
+    def get_rectangle(self, *, rectangle_id: int) -> Tuple[float, float, float, float]:
+        return self.__rectangle_per_rectangle_id[rectangle_id]
+
+
+def get_unique_directory_path(*, parent_directory_path: str) -> str:
+    _child_directory_path = None
+    while _child_directory_path is None:
+        _child_directory_name = str(uuid.uuid4())
+        _child_directory_path = os.path.join(parent_directory_path, _child_directory_name)
+        if os.path.exists(_child_directory_path):
+            _child_directory_path = None
+    return _child_directory_path
+
+
+def get_unique_file_path(*, parent_directory_path: str, extension: str) -> str:
+    _formatted_extension = extension if extension.startswith(".") else f".{extension}"
+    _child_file_path = None
+    while _child_file_path is None:
+        _child_file_name = f"{uuid.uuid4()}{_formatted_extension}"
         _child_file_path = os.path.join(parent_directory_path, _child_file_name)
         if os.path.exists(_child_file_path):
             _child_file_path = None
@@ -752,91 +2813,2265 @@ def get_delimited_string_regex_pattern_frequencies(*, text: str):
     return total_per_regex_pattern
 
 
-class StoredCollection():
+class StoredCollectionException(Exception):
+
+    def __init__(self, *args):
+        super().__init__(*args)
+
+        pass
+
+
+class StoredCollectionStorageTypeEnum(StringEnum):
+    File = "file"
+    Segment = "segment"
+
+
+class ExecutorTypeEnum(StringEnum):
+    Thread = "thread"
+    Process = "process"
+
+
+def _process_json_dicts(process_method: Callable[[dict], dict], json_dicts: List[dict]) -> List[dict]:
+    # deleted records are passed through as None so that the results stay aligned with their records
+    return [None if json_dict is None else process_method(json_dict) for json_dict in json_dicts]
+
+
+class StoredCollectionCodecTypeEnum(StringEnum):
+    Json = "json"
+    CompactJson = "compact_json"
+    # the marshal format may change between python versions, so it is only suitable when the same python version reads the collection
+    Marshal = "marshal"
+    Pickle = "pickle"
+    Orjson = "orjson"
+    Msgpack = "msgpack"
+
+
+class StoredCollectionCodec(ABC):
+
+    @classmethod
+    @abstractmethod
+    def get_codec_type(cls) -> StoredCollectionCodecTypeEnum:
+        raise NotImplementedError()
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return True
+
+    @abstractmethod
+    def encode(self, *, json_dict: dict) -> bytes:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def decode(self, *, record_bytes: bytes) -> dict:
+        raise NotImplementedError()
+
+
+class JsonStoredCollectionCodec(StoredCollectionCodec):
+
+    @classmethod
+    def get_codec_type(cls) -> StoredCollectionCodecTypeEnum:
+        return StoredCollectionCodecTypeEnum.Json
+
+    def encode(self, *, json_dict: dict) -> bytes:
+        return json.dumps(json_dict).encode()
+
+    def decode(self, *, record_bytes: bytes) -> dict:
+        return json.loads(record_bytes)
+
+
+class CompactJsonStoredCollectionCodec(StoredCollectionCodec):
+
+    @classmethod
+    def get_codec_type(cls) -> StoredCollectionCodecTypeEnum:
+        return StoredCollectionCodecTypeEnum.CompactJson
+
+    def encode(self, *, json_dict: dict) -> bytes:
+        return json.dumps(json_dict, separators=(",", ":")).encode()
+
+    def decode(self, *, record_bytes: bytes) -> dict:
+        return json.loads(record_bytes)
+
+
+class MarshalStoredCollectionCodec(StoredCollectionCodec):
+
+    @classmethod
+    def get_codec_type(cls) -> StoredCollectionCodecTypeEnum:
+        return StoredCollectionCodecTypeEnum.Marshal
+
+    def encode(self, *, json_dict: dict) -> bytes:
+        return marshal.dumps(json_dict)
+
+    def decode(self, *, record_bytes: bytes) -> dict:
+        return marshal.loads(record_bytes)
+
+
+class PickleStoredCollectionCodec(StoredCollectionCodec):
+
+    @classmethod
+    def get_codec_type(cls) -> StoredCollectionCodecTypeEnum:
+        return StoredCollectionCodecTypeEnum.Pickle
+
+    def encode(self, *, json_dict: dict) -> bytes:
+        return pickle.dumps(json_dict, protocol=5)
+
+    def decode(self, *, record_bytes: bytes) -> dict:
+        return pickle.loads(record_bytes)
+
+
+class OrjsonStoredCollectionCodec(StoredCollectionCodec):
+
+    @classmethod
+    def get_codec_type(cls) -> StoredCollectionCodecTypeEnum:
+        return StoredCollectionCodecTypeEnum.Orjson
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return orjson is not None
+
+    def encode(self, *, json_dict: dict) -> bytes:
+        return orjson.dumps(json_dict)
+
+    def decode(self, *, record_bytes: bytes) -> dict:
+        return orjson.loads(record_bytes)
+
+
+class MsgpackStoredCollectionCodec(StoredCollectionCodec):
+
+    @classmethod
+    def get_codec_type(cls) -> StoredCollectionCodecTypeEnum:
+        return StoredCollectionCodecTypeEnum.Msgpack
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return msgpack is not None
+
+    def encode(self, *, json_dict: dict) -> bytes:
+        return msgpack.packb(json_dict, use_bin_type=True)
+
+    def decode(self, *, record_bytes: bytes) -> dict:
+        return msgpack.unpackb(record_bytes, raw=False)
+
+
+def get_stored_collection_codec(*, codec_type: StoredCollectionCodecTypeEnum) -> StoredCollectionCodec:
+    for codec_class in get_subclasses(cls=StoredCollectionCodec, include_children=True):
+        if codec_class.get_codec_type() == codec_type:
+            if not codec_class.is_available():
+                raise StoredCollectionException(f"Codec {codec_type.value} is not available since its package is not installed.")
+            return codec_class()
+    raise StoredCollectionException(f"Unexpected {StoredCollectionCodecTypeEnum.__name__} value {codec_type}.")
+
+
+def get_fastest_stored_collection_codec_type() -> StoredCollectionCodecTypeEnum:
+    # only codecs that store plain json-like data across python versions are considered
+    for codec_class in [OrjsonStoredCollectionCodec, MsgpackStoredCollectionCodec, CompactJsonStoredCollectionCodec]:
+        if codec_class.is_available():
+            return codec_class.get_codec_type()
+
+
+class StoredCollectionCompressionTypeEnum(StringEnum):
+    Zlib = "zlib"
+    Lzma = "lzma"
+    Bz2 = "bz2"
+
+
+class StoredCollectionCompressor():
+
+    def __init__(self, *, compression_type: StoredCollectionCompressionTypeEnum, compression_level: int = None):
+        self.__compression_type = compression_type
+        self.__compression_level = compression_level
+
+    def compress(self, *, record_bytes: bytes) -> bytes:
+        if self.__compression_type == StoredCollectionCompressionTypeEnum.Zlib:
+            return zlib.compress(record_bytes, -1 if self.__compression_level is None else self.__compression_level)
+        elif self.__compression_type == StoredCollectionCompressionTypeEnum.Lzma:
+            return lzma.compress(record_bytes, preset=self.__compression_level)
+        elif self.__compression_type == StoredCollectionCompressionTypeEnum.Bz2:
+            return bz2.compress(record_bytes, 9 if self.__compression_level is None else self.__compression_level)
+        else:
+            raise StoredCollectionException(f"Unexpected {StoredCollectionCompressionTypeEnum.__name__} value {self.__compression_type}.")
+
+    def decompress(self, *, compressed_bytes: bytes) -> bytes:
+        if self.__compression_type == StoredCollectionCompressionTypeEnum.Zlib:
+            return zlib.decompress(compressed_bytes)
+        elif self.__compression_type == StoredCollectionCompressionTypeEnum.Lzma:
+            return lzma.decompress(compressed_bytes)
+        elif self.__compression_type == StoredCollectionCompressionTypeEnum.Bz2:
+            return bz2.decompress(compressed_bytes)
+        else:
+            raise StoredCollectionException(f"Unexpected {StoredCollectionCompressionTypeEnum.__name__} value {self.__compression_type}.")
+
+
+class StoredCollectionStorage(ABC):
+
+    @abstractmethod
+    def get_index_entry_length(self) -> int:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def write(self, *, record_bytes: bytes) -> bytes:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def overwrite(self, *, index_entry_bytes: bytes, record_bytes: bytes) -> bytes:
+        raise NotImplementedError()
+
+    def write_many(self, *, record_bytes_list: List[bytes]) -> List[bytes]:
+        return [self.write(record_bytes=record_bytes) for record_bytes in record_bytes_list]
+
+    @abstractmethod
+    def read(self, *, index_entry_bytes: bytes) -> bytes:
+        raise NotImplementedError()
+
+    # the view is only valid until it is released and must be released before the storage is used again
+    def read_view(self, *, index_entry_bytes: bytes) -> memoryview:
+        return memoryview(self.read(
+            index_entry_bytes=index_entry_bytes
+        ))
+
+    @abstractmethod
+    def is_readable(self, *, index_entry_bytes: bytes) -> bool:
+        raise NotImplementedError()
+
+    # may be called from any thread while records are being written, for any record written before the latest flush
+    @abstractmethod
+    def read_concurrently(self, *, index_entry_bytes: bytes) -> bytes:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def flush(self, *, is_durable: bool):
+        raise NotImplementedError()
+
+    @abstractmethod
+    def dispose(self):
+        raise NotImplementedError()
+
+
+def _synchronize_directory(*, directory_path: str):
+    # a new file is only durable once the directory entry pointing to it is durable, which cannot be synchronized on every platform
+    if hasattr(os, "O_DIRECTORY"):
+        directory_file_descriptor = os.open(directory_path, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(directory_file_descriptor)
+        finally:
+            os.close(directory_file_descriptor)
+
+
+def _get_path_bytes_length(*, path: str) -> int:
+    if os.path.isdir(path):
+        return sum(_get_path_bytes_length(path=os.path.join(path, file_name)) for file_name in os.listdir(path))
+    if os.path.exists(path):
+        return os.path.getsize(path)
+    return 0
+
+
+def _write_file_atomically(*, file_path: str, file_bytes: bytes, is_durable: bool):
+    # the file is either entirely the previous contents or entirely the new contents, even if writing is interrupted
+    temporary_file_path = f"{file_path}.tmp"
+    with open(temporary_file_path, "wb") as file_handle:
+        file_handle.write(file_bytes)
+        if is_durable:
+            file_handle.flush()
+            os.fsync(file_handle.fileno())
+    os.replace(temporary_file_path, file_path)
+    if is_durable:
+        _synchronize_directory(
+            directory_path=os.path.dirname(os.path.abspath(file_path))
+        )
+
+
+class FileStoredCollectionStorage(StoredCollectionStorage):
 
     def __init__(self, *, directory_path: str):
         self.__directory_path = directory_path
 
-        self.__subdirectory_path = None  # type: str
-        self.__index_file_path = None  # type: str
-        self.__index_file_handle = None  # type: io.BytesIO
-        self.__count_file_path = None  # type: str
-        self.__count = None  # type: int
-        self.__index_bytes_length = None  # type: int
-        self.__is_index_file_handle_at_end = None  # type: bool
+        self.__unsynchronized_file_paths = []  # type: List[str]
+
+        pathlib.Path(self.__directory_path).mkdir(parents=True, exist_ok=True)
+
+    def __get_file_path(self, *, index_entry_bytes: bytes) -> str:
+        return os.path.join(self.__directory_path, f"{uuid.UUID(bytes=index_entry_bytes)}.ser")
+
+    def get_index_entry_length(self) -> int:
+        return 16
+
+    def write(self, *, record_bytes: bytes) -> bytes:
+        index_entry_bytes = uuid.uuid4().bytes
+        return self.overwrite(
+            index_entry_bytes=index_entry_bytes,
+            record_bytes=record_bytes
+        )
+
+    def overwrite(self, *, index_entry_bytes: bytes, record_bytes: bytes) -> bytes:
+        file_path = self.__get_file_path(index_entry_bytes=index_entry_bytes)
+        if os.path.exists(file_path):
+            # the record file is replaced instead of rewritten so that a concurrent read never sees a partially written record
+            _write_file_atomically(
+                file_path=file_path,
+                file_bytes=record_bytes,
+                is_durable=False
+            )
+        else:
+            with open(file_path, "wb") as file_handle:
+                file_handle.write(record_bytes)
+        self.__unsynchronized_file_paths.append(file_path)
+        return index_entry_bytes
+
+    def read(self, *, index_entry_bytes: bytes) -> bytes:
+        with open(self.__get_file_path(index_entry_bytes=index_entry_bytes), "rb") as file_handle:
+            return file_handle.read()
+
+    def is_readable(self, *, index_entry_bytes: bytes) -> bool:
+        return os.path.exists(self.__get_file_path(index_entry_bytes=index_entry_bytes))
+
+    def read_concurrently(self, *, index_entry_bytes: bytes) -> bytes:
+        return self.read(
+            index_entry_bytes=index_entry_bytes
+        )
+
+    def flush(self, *, is_durable: bool):
+        # each record file is closed after it is written, so there is only something to do when the records must be durable
+        # the files are kept until a durable flush since checkpoints that are not durable flush the storage as well
+        if is_durable and self.__unsynchronized_file_paths:
+            for file_path in self.__unsynchronized_file_paths:
+                with open(file_path, "rb") as file_handle:
+                    os.fsync(file_handle.fileno())
+            _synchronize_directory(
+                directory_path=self.__directory_path
+            )
+            self.__unsynchronized_file_paths.clear()
+
+    def dispose(self):
+        pass
+
+
+class SegmentStoredCollectionStorage(StoredCollectionStorage):
+
+    # segment index, record offset within the segment, record length
+    index_entry_struct = struct.Struct("<IQI")
+    # each record in a segment is prefixed by its length so that a segment can be read without the index
+    record_header_struct = struct.Struct("<I")
+
+    def __init__(self, *, directory_path: str, maximum_segment_bytes_length: int):
+        self.__directory_path = directory_path
+        self.__maximum_segment_bytes_length = maximum_segment_bytes_length
+
+        self.__segment_index = None  # type: int
+        self.__segment_bytes_length = None  # type: int
+        self.__segment_file_handle = None  # type: io.BufferedWriter
+        self.__is_segment_file_handle_flushed = None  # type: bool
+        self.__unsynchronized_segment_indexes = set()  # type: Set[int]
+        self.__map_per_segment_index = {}  # type: Dict[int, mmap.mmap]
+        self.__file_descriptor_per_segment_index = {}  # type: Dict[int, int]
+        self.__file_descriptor_lock = Lock()
 
         self.__initialize()
 
     def __initialize(self):
-        self.__subdirectory_path = os.path.join(self.__directory_path, "collection")
-        pathlib.Path(self.__subdirectory_path).mkdir(parents=True, exist_ok=True)
-
-        self.__index_file_path = os.path.join(self.__directory_path, ".index")
-        self.__index_file_handle = open(self.__index_file_path, "w+b")
-        self.__index_file_handle.seek(0, io.SEEK_END)
-        self.__index_bytes_length = self.__index_file_handle.tell()
-        self.__is_index_file_handle_at_end = True
+        pathlib.Path(self.__directory_path).mkdir(parents=True, exist_ok=True)
+
+        segment_indexes = [int(file_name[:-len(".seg")]) for file_name in os.listdir(self.__directory_path) if file_name.endswith(".seg")]
+        self.__segment_index = max(segment_indexes) if segment_indexes else 0
+        self.__open_segment()
+
+    def __get_segment_file_path(self, *, segment_index: int) -> str:
+        return os.path.join(self.__directory_path, f"{segment_index:08d}.seg")
+
+    def __open_segment(self):
+        segment_file_path = self.__get_segment_file_path(segment_index=self.__segment_index)
+        self.__segment_file_handle = open(segment_file_path, "ab")
+        self.__segment_bytes_length = self.__segment_file_handle.tell()
+        self.__is_segment_file_handle_flushed = True
+
+    def get_index_entry_length(self) -> int:
+        return SegmentStoredCollectionStorage.index_entry_struct.size
+
+    def write(self, *, record_bytes: bytes) -> bytes:
+        return self.write_many(
+            record_bytes_list=[record_bytes]
+        )[0]
+
+    def write_many(self, *, record_bytes_list: List[bytes]) -> List[bytes]:
+        index_entries = []  # type: List[bytes]
+        pending_bytes = []  # type: List[bytes]
+        for record_bytes in record_bytes_list:
+            record_header_bytes = SegmentStoredCollectionStorage.record_header_struct.pack(len(record_bytes))
+            if self.__segment_bytes_length != 0 and self.__segment_bytes_length + len(record_header_bytes) + len(record_bytes) > self.__maximum_segment_bytes_length:
+                self.__segment_file_handle.write(b"".join(pending_bytes))
+                pending_bytes.clear()
+                self.__segment_file_handle.close()
+                self.__unsynchronized_segment_indexes.add(self.__segment_index)
+                self.__segment_index += 1
+                self.__open_segment()
+
+            pending_bytes.append(record_header_bytes)
+            pending_bytes.append(record_bytes)
+
+            record_offset = self.__segment_bytes_length + len(record_header_bytes)
+            self.__segment_bytes_length = record_offset + len(record_bytes)
+            index_entries.append(SegmentStoredCollectionStorage.index_entry_struct.pack(self.__segment_index, record_offset, len(record_bytes)))
+
+        # the records are written together so that a batch costs one write instead of two per record
+        self.__segment_file_handle.write(b"".join(pending_bytes))
+        self.__is_segment_file_handle_flushed = False
+        self.__unsynchronized_segment_indexes.add(self.__segment_index)
+        return index_entries
+
+    def overwrite(self, *, index_entry_bytes: bytes, record_bytes: bytes) -> bytes:
+        # segments are append-only, so the previous record is left behind and the index entry points to the new record
+        return self.write(
+            record_bytes=record_bytes
+        )
 
-        self.__count_file_path = os.path.join(self.__directory_path, ".count")
-        if os.path.exists(self.__count_file_path):
-            with open(self.__count_file_path, "r") as file_handle:
-                self.__count = int(file_handle.readline())
+    def __get_segment_map(self, *, segment_index: int, minimum_bytes_length: int) -> mmap.mmap:
+        segment_map = self.__map_per_segment_index.get(segment_index, None)
+        if segment_map is None or len(segment_map) < minimum_bytes_length:
+            # only the active segment grows, so the other segments are mapped once
+            if segment_index == self.__segment_index and not self.__is_segment_file_handle_flushed:
+                self.__segment_file_handle.flush()
+                self.__is_segment_file_handle_flushed = True
+            if segment_map is not None:
+                segment_map.close()
+            with open(self.__get_segment_file_path(segment_index=segment_index), "rb") as file_handle:
+                segment_map = mmap.mmap(file_handle.fileno(), 0, access=mmap.ACCESS_READ)
+            self.__map_per_segment_index[segment_index] = segment_map
+        return segment_map
+
+    def read(self, *, index_entry_bytes: bytes) -> bytes:
+        segment_index, record_offset, record_length = SegmentStoredCollectionStorage.index_entry_struct.unpack(index_entry_bytes)
+        segment_map = self.__get_segment_map(
+            segment_index=segment_index,
+            minimum_bytes_length=record_offset + record_length
+        )
+        # a copy is returned since the map is closed and replaced as the active segment grows, which fails while a view of it is held
+        return segment_map[record_offset:record_offset + record_length]
+
+    def read_view(self, *, index_entry_bytes: bytes) -> memoryview:
+        segment_index, record_offset, record_length = SegmentStoredCollectionStorage.index_entry_struct.unpack(index_entry_bytes)
+        segment_map = self.__get_segment_map(
+            segment_index=segment_index,
+            minimum_bytes_length=record_offset + record_length
+        )
+        return memoryview(segment_map)[record_offset:record_offset + record_length]
+
+    def is_readable(self, *, index_entry_bytes: bytes) -> bool:
+        segment_index, record_offset, record_length = SegmentStoredCollectionStorage.index_entry_struct.unpack(index_entry_bytes)
+        if segment_index == self.__segment_index:
+            segment_bytes_length = self.__segment_bytes_length
+        elif segment_index < self.__segment_index:
+            segment_file_path = self.__get_segment_file_path(segment_index=segment_index)
+            segment_bytes_length = os.path.getsize(segment_file_path) if os.path.exists(segment_file_path) else 0
         else:
-            self.__count = 0
+            return False
+        return record_offset + record_length <= segment_bytes_length
+
+    def read_concurrently(self, *, index_entry_bytes: bytes) -> bytes:
+        # positional reads do not share a file position or a map that the writer may replace
+        segment_index, record_offset, record_length = SegmentStoredCollectionStorage.index_entry_struct.unpack(index_entry_bytes)
+        file_descriptor = self.__file_descriptor_per_segment_index.get(segment_index, None)
+        if file_descriptor is None:
+            with self.__file_descriptor_lock:
+                file_descriptor = self.__file_descriptor_per_segment_index.get(segment_index, None)
+                if file_descriptor is None:
+                    file_descriptor = os.open(self.__get_segment_file_path(segment_index=segment_index), os.O_RDONLY)
+                    self.__file_descriptor_per_segment_index[segment_index] = file_descriptor
+        return os.pread(file_descriptor, record_length, record_offset)
+
+    def flush(self, *, is_durable: bool):
+        if not self.__is_segment_file_handle_flushed:
+            self.__segment_file_handle.flush()
+            self.__is_segment_file_handle_flushed = True
+        if is_durable:
+            for segment_index in self.__unsynchronized_segment_indexes:
+                if segment_index == self.__segment_index:
+                    os.fsync(self.__segment_file_handle.fileno())
+                else:
+                    with open(self.__get_segment_file_path(segment_index=segment_index), "rb") as file_handle:
+                        os.fsync(file_handle.fileno())
+            _synchronize_directory(
+                directory_path=self.__directory_path
+            )
+            self.__unsynchronized_segment_indexes.clear()
 
-    def append(self, *, json_dict: dict):
-        file_uuid = uuid.uuid4()
-        file_uuid_bytes = file_uuid.bytes
-        file_uuid_string = str(file_uuid)
-        file_path = os.path.join(self.__subdirectory_path, f"{file_uuid_string}.ser")
-        with open(file_path, "w") as file_handle:
-            json.dump(json_dict, file_handle)
-        if not self.__is_index_file_handle_at_end:
-            self.__index_file_handle.seek(0, io.SEEK_END)
-            self.__is_index_file_handle_at_end = True
-        self.__index_file_handle.write(file_uuid_bytes)
-        self.__index_bytes_length += 17
-        self.__count += 1
+    def dispose(self):
+        self.__segment_file_handle.close()
+        for segment_map in self.__map_per_segment_index.values():
+            segment_map.close()
+        self.__map_per_segment_index.clear()
+        for file_descriptor in self.__file_descriptor_per_segment_index.values():
+            os.close(file_descriptor)
+        self.__file_descriptor_per_segment_index.clear()
+
+
+class BlockStoredCollectionStorage(StoredCollectionStorage):
+
+    # block number, record offset within the decompressed block, record length
+    index_entry_struct = struct.Struct("<QII")
+
+    def __init__(self, *, storage: StoredCollectionStorage, block_table_file_path: str, compressor: StoredCollectionCompressor, block_bytes_length: int, cached_blocks_total: int):
+        self.__storage = storage
+        self.__block_table_file_path = block_table_file_path
+        self.__compressor = compressor
+        self.__block_bytes_length = block_bytes_length
+        self.__cached_blocks_total = cached_blocks_total
+
+        self.__block_table_entry_length = None  # type: int
+        self.__block_table_file_handle = None  # type: io.BufferedRandom
+        self.__block_table_bytes = None  # type: bytearray
+        self.__pending_records_bytes = None  # type: List[bytes]
+        self.__pending_bytes_length = None  # type: int
+        self.__decompressed_block_per_block_number = OrderedDict()  # type: OrderedDict[int, bytes]
+        self.__decompressed_block_lock = Lock()
 
-    def get(self) -> dict:
-        if not self.__is_index_file_handle_at_end:
-            file_uuid_bytes = self.__index_file_handle.read(16)
-            if self.__index_file_handle.tell() == self.__index_bytes_length:
-                self.__is_index_file_handle_at_end = True
-            file_uuid = uuid.UUID(bytes=file_uuid_bytes)
-            file_uuid_string = str(file_uuid)
-            file_path = os.path.join(self.__subdirectory_path, f"{file_uuid_string}.ser")
-            with open(file_path, "r") as file_handle:
-                return json.load(file_handle)
-        return None
+        self.__initialize()
 
-    def try_process(self, process_method: Callable[[dict], dict]) -> bool:
-        if not self.__is_index_file_handle_at_end:
-            file_uuid_bytes = self.__index_file_handle.read(16)
-            if self.__index_file_handle.tell() == self.__index_bytes_length:
-                self.__is_index_file_handle_at_end = True
-            file_uuid = uuid.UUID(bytes=file_uuid_bytes)
-            file_uuid_string = str(file_uuid)
-            file_path = os.path.join(self.__subdirectory_path, f"{file_uuid_string}.ser")
-            with open(file_path, "r") as file_handle:
-                json_dict = json.load(file_handle)
-            processed_json_dict = process_method(json_dict)
-            if processed_json_dict is not None:
-                with open(file_path, "w") as file_handle:
-                    json.dump(processed_json_dict, file_handle)
-            return True
-        return False
+    def __initialize(self):
+        # the block table holds where each compressed block was written by the underlying storage
+        self.__block_table_entry_length = self.__storage.get_index_entry_length()
+        self.__block_table_file_handle = open(self.__block_table_file_path, "r+b" if os.path.exists(self.__block_table_file_path) else "w+b")
+        block_table_bytes = self.__block_table_file_handle.read()
+        self.__block_table_bytes = bytearray(block_table_bytes[:len(block_table_bytes) - len(block_table_bytes) % self.__block_table_entry_length])
+        # blocks whose data did not reach the underlying storage before a failure are dropped from the end of the table
+        while self.__block_table_bytes and not self.__storage.is_readable(index_entry_bytes=bytes(self.__block_table_bytes[-self.__block_table_entry_length:])):
+            del self.__block_table_bytes[-self.__block_table_entry_length:]
+        self.__block_table_file_handle.truncate(len(self.__block_table_bytes))
+        self.__block_table_file_handle.seek(0, io.SEEK_END)
+        self.__pending_records_bytes = []
+        self.__pending_bytes_length = 0
+
+    def __get_blocks_total(self) -> int:
+        return len(self.__block_table_bytes) // self.__block_table_entry_length
+
+    def __write_pending_block(self):
+        if self.__pending_records_bytes:
+            block_table_entry_bytes = self.__storage.write(
+                record_bytes=self.__compressor.compress(
+                    record_bytes=b"".join(self.__pending_records_bytes)
+                )
+            )
+            self.__block_table_file_handle.write(block_table_entry_bytes)
+            self.__block_table_bytes += block_table_entry_bytes
+            self.__pending_records_bytes.clear()
+            self.__pending_bytes_length = 0
+
+    def __get_block(self, *, block_number: int, is_concurrent: bool) -> bytes:
+        if block_number == self.__get_blocks_total():
+            return b"".join(self.__pending_records_bytes)
+        with self.__decompressed_block_lock:
+            block = self.__decompressed_block_per_block_number.get(block_number, None)
+            if block is not None:
+                self.__decompressed_block_per_block_number.move_to_end(block_number)
+                return block
+        # blocks are decompressed outside of the lock so that concurrent reads of different blocks do not wait on each other
+        block_table_entry_offset = block_number * self.__block_table_entry_length
+        block_table_entry_bytes = bytes(self.__block_table_bytes[block_table_entry_offset:block_table_entry_offset + self.__block_table_entry_length])
+        if is_concurrent:
+            block = self.__compressor.decompress(
+                compressed_bytes=self.__storage.read_concurrently(
+                    index_entry_bytes=block_table_entry_bytes
+                )
+            )
+        else:
+            with self.__storage.read_view(index_entry_bytes=block_table_entry_bytes) as compressed_block_view:
+                block = self.__compressor.decompress(
+                    compressed_bytes=compressed_block_view
+                )
+        with self.__decompressed_block_lock:
+            self.__decompressed_block_per_block_number[block_number] = block
+            if len(self.__decompressed_block_per_block_number) > self.__cached_blocks_total:
+                self.__decompressed_block_per_block_number.popitem(last=False)
+        return block
+
+    def get_index_entry_length(self) -> int:
+        return BlockStoredCollectionStorage.index_entry_struct.size
+
+    def write(self, *, record_bytes: bytes) -> bytes:
+        index_entry_bytes = BlockStoredCollectionStorage.index_entry_struct.pack(self.__get_blocks_total(), self.__pending_bytes_length, len(record_bytes))
+        self.__pending_records_bytes.append(record_bytes)
+        self.__pending_bytes_length += len(record_bytes)
+        if self.__pending_bytes_length >= self.__block_bytes_length:
+            self.__write_pending_block()
+        return index_entry_bytes
+
+    def overwrite(self, *, index_entry_bytes: bytes, record_bytes: bytes) -> bytes:
+        return self.write(
+            record_bytes=record_bytes
+        )
 
-    def reset(self):
-        if self.__index_bytes_length != 0:
-            self.__index_file_handle.seek(0)
-            self.__is_index_file_handle_at_end = False
+    def read(self, *, index_entry_bytes: bytes) -> bytes:
+        block_number, record_offset, record_length = BlockStoredCollectionStorage.index_entry_struct.unpack(index_entry_bytes)
+        block = self.__get_block(
+            block_number=block_number,
+            is_concurrent=False
+        )
+        return block[record_offset:record_offset + record_length]
 
-    def count(self) -> int:
-        return self.__count
+    def read_view(self, *, index_entry_bytes: bytes) -> memoryview:
+        block_number, record_offset, record_length = BlockStoredCollectionStorage.index_entry_struct.unpack(index_entry_bytes)
+        block = self.__get_block(
+            block_number=block_number,
+            is_concurrent=False
+        )
+        return memoryview(block)[record_offset:record_offset + record_length]
+
+    def read_concurrently(self, *, index_entry_bytes: bytes) -> bytes:
+        block_number, record_offset, record_length = BlockStoredCollectionStorage.index_entry_struct.unpack(index_entry_bytes)
+        block = self.__get_block(
+            block_number=block_number,
+            is_concurrent=True
+        )
+        return block[record_offset:record_offset + record_length]
+
+    def is_readable(self, *, index_entry_bytes: bytes) -> bool:
+        block_number, record_offset, record_length = BlockStoredCollectionStorage.index_entry_struct.unpack(index_entry_bytes)
+        blocks_total = self.__get_blocks_total()
+        return block_number < blocks_total or (block_number == blocks_total and record_offset + record_length <= self.__pending_bytes_length)
+
+    def flush(self, *, is_durable: bool):
+        # a partially filled block is written as it is, so the next record starts a new block
+        self.__write_pending_block()
+        self.__storage.flush(
+            is_durable=is_durable
+        )
+        self.__block_table_file_handle.flush()
+        if is_durable:
+            os.fsync(self.__block_table_file_handle.fileno())
 
     def dispose(self):
-        self.__index_file_handle.close()
+        self.flush(
+            is_durable=False
+        )
+        self.__block_table_file_handle.close()
+        self.__storage.dispose()
+
+
+def _get_json_path_value(*, json_dict: dict, path: Tuple[Any, ...]) -> Tuple[bool, Any]:
+    value = json_dict
+    for key in path:
+        if isinstance(value, dict) and key in value:
+            value = value[key]
+        elif isinstance(value, list) and isinstance(key, int) and -len(value) <= key < len(value):
+            value = value[key]
+        else:
+            return False, None
+    # only single values can be ordered and found, so lists and dictionaries are not indexed
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return True, value
+    return False, None
+
+
+def _get_secondary_index_key(*, value: Any) -> Tuple[int, Any]:
+    # values of different types are kept apart and ordered by type first, so True is not the same key as 1
+    if value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        # NaN is not equal to or ordered against any number, including itself, so it gets a key of its own that no range of numbers reaches
+        if value != value:
+            return (4, 0)
+        return (2, value)
+    return (3, value)
+
+
+class StoredCollectionSecondaryIndex():
+
+    def __init__(self, *, path: Tuple[Any, ...], file_path: str, records_total: int):
+        self.__path = path
+        self.__file_path = file_path
+        self.__records_total = records_total
+
+        self.__file_handle = None  # type: io.BufferedWriter
+        self.__key_per_record_index = {}  # type: Dict[int, Tuple[int, Any]]
+        self.__record_indexes_per_key = {}  # type: Dict[Tuple[int, Any], List[int]]
+        self.__keys = []  # type: List[Tuple[int, Any]]
+
+        self.__initialize()
+
+    def __initialize(self):
+        # the file is a log of each record's latest value, where a record without a value has no value written
+        if os.path.exists(self.__file_path):
+            value_per_record_index = {}  # type: Dict[int, Any]
+            is_rewrite_required = False
+            with open(self.__file_path, "rb") as file_handle:
+                for line in file_handle:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # a line that was only partially written before a failure is ignored
+                        is_rewrite_required = True
+                        continue
+                    if entry[0] < self.__records_total:
+                        if len(entry) == 1:
+                            value_per_record_index.pop(entry[0], None)
+                        else:
+                            value_per_record_index[entry[0]] = entry[1]
+                    else:
+                        is_rewrite_required = True
+            if is_rewrite_required:
+                # records that were lost in a failure are removed from the log so that a later record with the same index is not confused with them
+                _write_file_atomically(
+                    file_path=self.__file_path,
+                    file_bytes=b"".join(json.dumps([record_index, value]).encode() + b"\n" for record_index, value in value_per_record_index.items()),
+                    is_durable=False
+                )
+            for record_index, value in value_per_record_index.items():
+                self.__key_per_record_index[record_index] = _get_secondary_index_key(value=value)
+            for record_index in sorted(self.__key_per_record_index):
+                key = self.__key_per_record_index[record_index]
+                if key in self.__record_indexes_per_key:
+                    self.__record_indexes_per_key[key].append(record_index)
+                else:
+                    self.__record_indexes_per_key[key] = [record_index]
+            self.__keys = sorted(self.__record_indexes_per_key)
+        self.__file_handle = open(self.__file_path, "ab")
+
+    def get_path(self) -> Tuple[Any, ...]:
+        return self.__path
+
+    def set(self, *, record_index: int, json_dict: dict):
+        is_found, value = _get_json_path_value(
+            json_dict=json_dict,
+            path=self.__path
+        )
+        key = _get_secondary_index_key(value=value) if is_found else None
+        previous_key = self.__key_per_record_index.get(record_index, None)
+        if key == previous_key:
+            return
+
+        if previous_key is not None:
+            previous_record_indexes = self.__record_indexes_per_key[previous_key]
+            del previous_record_indexes[bisect.bisect_left(previous_record_indexes, record_index)]
+            if not previous_record_indexes:
+                del self.__record_indexes_per_key[previous_key]
+                del self.__keys[bisect.bisect_left(self.__keys, previous_key)]
+            del self.__key_per_record_index[record_index]
+
+        if key is None:
+            self.__file_handle.write(json.dumps([record_index]).encode() + b"\n")
+        else:
+            self.__file_handle.write(json.dumps([record_index, value]).encode() + b"\n")
+            self.__key_per_record_index[record_index] = key
+            if key in self.__record_indexes_per_key:
+                record_indexes = self.__record_indexes_per_key[key]
+                if record_indexes[-1] < record_index:
+                    record_indexes.append(record_index)
+                else:
+                    bisect.insort(record_indexes, record_index)
+            else:
+                self.__record_indexes_per_key[key] = [record_index]
+                bisect.insort(self.__keys, key)
+
+    def find(self, *, value: Any) -> List[int]:
+        return list(self.__record_indexes_per_key.get(_get_secondary_index_key(value=value), []))
+
+    def find_range(self, *, minimum_value: Any, maximum_value: Any) -> List[int]:
+        # the range is inclusive and a missing bound only reaches as far as the values of the same type as the other bound
+        if minimum_value is None and maximum_value is None:
+            start_key_index = 0
+            end_key_index = len(self.__keys)
+        elif minimum_value is None:
+            maximum_key = _get_secondary_index_key(value=maximum_value)
+            start_key_index = bisect.bisect_left(self.__keys, (maximum_key[0],))
+            end_key_index = bisect.bisect_right(self.__keys, maximum_key)
+        elif maximum_value is None:
+            minimum_key = _get_secondary_index_key(value=minimum_value)
+            start_key_index = bisect.bisect_left(self.__keys, minimum_key)
+            end_key_index = bisect.bisect_left(self.__keys, (minimum_key[0] + 1,))
+        else:
+            start_key_index = bisect.bisect_left(self.__keys, _get_secondary_index_key(value=minimum_value))
+            end_key_index = bisect.bisect_right(self.__keys, _get_secondary_index_key(value=maximum_value))
+        record_indexes = []  # type: List[int]
+        for key in self.__keys[start_key_index:end_key_index]:
+            record_indexes.extend(self.__record_indexes_per_key[key])
+        return record_indexes
+
+    def flush(self, *, is_durable: bool):
+        self.__file_handle.flush()
+        if is_durable:
+            os.fsync(self.__file_handle.fileno())
+
+    def dispose(self):
+        self.__file_handle.close()
+
+
+class StoredCollectionColumnTypeEnum(StringEnum):
+    Boolean = "boolean"
+    Integer = "integer"
+    Float = "float"
+    String = "string"
+    Json = "json"
+
+
+def _get_stored_collection_column_type(*, value_types: Set[type]) -> StoredCollectionColumnTypeEnum:
+    if value_types == {bool}:
+        return StoredCollectionColumnTypeEnum.Boolean
+    if value_types == {int}:
+        return StoredCollectionColumnTypeEnum.Integer
+    if value_types == {float}:
+        return StoredCollectionColumnTypeEnum.Float
+    if value_types == {str}:
+        return StoredCollectionColumnTypeEnum.String
+    # values of different kinds, including integers mixed with floats, nested values and integers that do not fit in 64 bits are kept as their json text
+    return StoredCollectionColumnTypeEnum.Json
+
+
+class StoredCollectionColumns():
+
+    # the array type code of the values of each column type, where text columns hold the offset of the end of each value
+    typecode_per_column_type = {
+        StoredCollectionColumnTypeEnum.Boolean: "B",
+        StoredCollectionColumnTypeEnum.Integer: "q",
+        StoredCollectionColumnTypeEnum.Float: "d",
+        StoredCollectionColumnTypeEnum.String: "Q",
+        StoredCollectionColumnTypeEnum.Json: "Q"
+    }
+
+    def __init__(self, *, directory_path: str):
+        self.__directory_path = directory_path
+
+        self.__records_total = None  # type: int
+        self.__column_type_per_field = None  # type: Dict[str, StoredCollectionColumnTypeEnum]
+        self.__file_name_per_field = None  # type: Dict[str, str]
+        self.__maps = []  # type: List[mmap.mmap]
+        self.__views = []  # type: List[memoryview]
+        self.__view_per_file_name = {}  # type: Dict[str, memoryview]
+
+        self.__initialize()
+
+    def __initialize(self):
+        with open(os.path.join(self.__directory_path, ".columns"), "r") as file_handle:
+            metadata = json.load(file_handle)
+        self.__records_total = metadata["records_total"]
+        self.__column_type_per_field = {field: StoredCollectionColumnTypeEnum(column_type) for field, column_type in metadata["column_type_per_field"].items()}
+        self.__file_name_per_field = metadata["file_name_per_field"]
+
+    @staticmethod
+    def write(*, directory_path: str, json_dicts: Callable[[], Iterable[dict]], fields: List[str] = None, chunk_records_total: int = 1000) -> StoredCollectionColumns:
+        # the records are read twice, first to find the type of each column and then to fill the columns, so that no column needs to be converted part way through
+        value_types_per_field = {} if fields is None else {field: set() for field in fields}  # type: Dict[str, Set[type]]
+        records_total = 0
+        for json_dict in json_dicts():
+            records_total += 1
+            if json_dict is not None:
+                for field, value in json_dict.items():
+                    if fields is None or field in value_types_per_field:
+                        # a field that is only ever null still has a column so that its nulls are kept
+                        value_types = value_types_per_field.setdefault(field, set())
+                        if isinstance(value, int) and not isinstance(value, bool) and not -2**63 <= value < 2**63:
+                            value_types.add(object)
+                        elif value is not None:
+                            value_types.add(type(value))
+        column_type_per_field = {field: _get_stored_collection_column_type(value_types=value_types) for field, value_types in value_types_per_field.items()}
+
+        pathlib.Path(directory_path).mkdir(parents=True, exist_ok=True)
+        file_name_per_field = {field: f"column_{field_index}" for field_index, field in enumerate(column_type_per_field)}
+        text_bytes_length_per_field = {field: 0 for field, column_type in column_type_per_field.items() if column_type in (StoredCollectionColumnTypeEnum.String, StoredCollectionColumnTypeEnum.Json)}
+
+        # each chunk of records is appended to the files of the columns, so only one chunk is held in memory at a time
+        file_names = ["records.valid"]
+        for field, file_name in file_name_per_field.items():
+            file_names.extend([f"{file_name}.values", f"{file_name}.valid", f"{file_name}.null"])
+            if field in text_bytes_length_per_field:
+                file_names.append(f"{file_name}.text")
+        for file_name in file_names:
+            open(os.path.join(directory_path, file_name), "wb").close()
+
+        def append_file(*, file_name: str, file_bytes: Any):
+            with open(os.path.join(directory_path, file_name), "ab") as file_handle:
+                file_handle.write(file_bytes)
+
+        json_dicts_iterator = iter(json_dicts())
+        chunk = list(islice(json_dicts_iterator, chunk_records_total))
+        while chunk:
+            append_file(
+                file_name="records.valid",
+                file_bytes=array.array("B", [json_dict is not None for json_dict in chunk])
+            )
+            for field, column_type in column_type_per_field.items():
+                file_name = file_name_per_field[field]
+                values = [None if json_dict is None else json_dict.get(field, None) for json_dict in chunk]
+                if field in text_bytes_length_per_field:
+                    text_bytes = bytearray()
+                    values_array = array.array(StoredCollectionColumns.typecode_per_column_type[column_type])
+                    for value in values:
+                        if value is not None:
+                            text_bytes += (value if column_type == StoredCollectionColumnTypeEnum.String else json.dumps(value)).encode()
+                        values_array.append(text_bytes_length_per_field[field] + len(text_bytes))
+                    text_bytes_length_per_field[field] += len(text_bytes)
+                    append_file(
+                        file_name=f"{file_name}.text",
+                        file_bytes=text_bytes
+                    )
+                else:
+                    values_array = array.array(StoredCollectionColumns.typecode_per_column_type[column_type], [0 if value is None else value for value in values])
+                append_file(
+                    file_name=f"{file_name}.values",
+                    file_bytes=values_array
+                )
+                append_file(
+                    file_name=f"{file_name}.valid",
+                    file_bytes=array.array("B", [value is not None for value in values])
+                )
+                append_file(
+                    file_name=f"{file_name}.null",
+                    file_bytes=array.array("B", [value is None and json_dict is not None and field in json_dict for json_dict, value in zip(chunk, values)])
+                )
+            chunk = list(islice(json_dicts_iterator, chunk_records_total))
+
+        # the metadata is written last so that an interrupted export is never opened
+        _write_file_atomically(
+            file_path=os.path.join(directory_path, ".columns"),
+            file_bytes=json.dumps({
+                "records_total": records_total,
+                "column_type_per_field": {field: column_type.value for field, column_type in column_type_per_field.items()},
+                "file_name_per_field": file_name_per_field
+            }).encode(),
+            is_durable=False
+        )
+        return StoredCollectionColumns(
+            directory_path=directory_path
+        )
+
+    def __get_view(self, *, file_name: str, typecode: str) -> memoryview:
+        view = self.__view_per_file_name.get(file_name, None)
+        if view is None:
+            file_path = os.path.join(self.__directory_path, file_name)
+            if os.path.getsize(file_path) == 0:
+                # an empty file cannot be mapped
+                view = memoryview(b"").cast(typecode)
+            else:
+                with open(file_path, "rb") as file_handle:
+                    file_map = mmap.mmap(file_handle.fileno(), 0, access=mmap.ACCESS_READ)
+                self.__maps.append(file_map)
+                view = memoryview(file_map).cast(typecode)
+            self.__views.append(view)
+            self.__view_per_file_name[file_name] = view
+        return view
+
+    def __get_file_name(self, *, field: str) -> str:
+        if field not in self.__file_name_per_field:
+            raise StoredCollectionException(f"There is no column for field {field}.")
+        return self.__file_name_per_field[field]
+
+    def count(self) -> int:
+        return self.__records_total
+
+    def __len__(self) -> int:
+        return self.__records_total
+
+    def get_fields(self) -> List[str]:
+        return list(self.__column_type_per_field)
+
+    def get_column_type(self, *, field: str) -> StoredCollectionColumnTypeEnum:
+        self.__get_file_name(
+            field=field
+        )
+        return self.__column_type_per_field[field]
+
+    def get_is_record_column(self) -> memoryview:
+        return self.__get_view(
+            file_name="records.valid",
+            typecode="B"
+        )
+
+    def get_is_valid_column(self, *, field: str) -> memoryview:
+        return self.__get_view(
+            file_name=f"{self.__get_file_name(field=field)}.valid",
+            typecode="B"
+        )
+
+    def get_is_null_column(self, *, field: str) -> memoryview:
+        # a field that is present but null is not valid, which keeps it apart from a missing field only through this column
+        return self.__get_view(
+            file_name=f"{self.__get_file_name(field=field)}.null",
+            typecode="B"
+        )
+
+    def get_values_column(self, *, field: str) -> memoryview:
+        # missing values are 0 in the values column, so the values should be read together with the valid column
+        return self.__get_view(
+            file_name=f"{self.__get_file_name(field=field)}.values",
+            typecode=StoredCollectionColumns.typecode_per_column_type[self.__column_type_per_field[field]]
+        )
+
+    def __get_values(self, *, field: str) -> Iterator[Any]:
+        column_type = self.get_column_type(
+            field=field
+        )
+        values_column = self.get_values_column(
+            field=field
+        )
+        is_valid_column = self.get_is_valid_column(
+            field=field
+        )
+        if column_type == StoredCollectionColumnTypeEnum.String or column_type == StoredCollectionColumnTypeEnum.Json:
+            text_column = self.__get_view(
+                file_name=f"{self.__get_file_name(field=field)}.text",
+                typecode="B"
+            )
+            start_offset = 0
+            for end_offset, is_valid in zip(values_column, is_valid_column):
+                if is_valid:
+                    text = bytes(text_column[start_offset:end_offset]).decode()
+                    yield text if column_type == StoredCollectionColumnTypeEnum.String else json.loads(text)
+                else:
+                    yield None
+                start_offset = end_offset
+        elif column_type == StoredCollectionColumnTypeEnum.Boolean:
+            for value, is_valid in zip(values_column, is_valid_column):
+                yield bool(value) if is_valid else None
+        else:
+            for value, is_valid in zip(values_column, is_valid_column):
+                yield value if is_valid else None
+
+    def scan(self, *, fields: List[str]) -> Iterator[Tuple[Any, ...]]:
+        # only the columns of the requested fields are read and deleted records are skipped
+        return compress(zip(*[self.__get_values(field=field) for field in fields]), self.get_is_record_column())
+
+    def iterate(self, *, is_deleted_included: bool = False) -> Iterator[dict]:
+        # deleted records are given as None when included so that each record keeps its index
+        fields = self.get_fields()
+        rows = zip(zip(*[self.__get_values(field=field) for field in fields]), zip(*[self.get_is_null_column(field=field) for field in fields])) if fields else repeat(((), ()))
+        for is_record, (values, is_nulls) in zip(self.get_is_record_column(), rows):
+            if is_record:
+                yield {field: value for field, value, is_null in zip(fields, values, is_nulls) if value is not None or is_null}
+            elif is_deleted_included:
+                yield None
+
+    def __iter__(self) -> Iterator[dict]:
+        return self.iterate(
+            is_deleted_included=False
+        )
+
+    def __get_valid_values(self, *, field: str) -> Iterable[Any]:
+        column_type = self.get_column_type(
+            field=field
+        )
+        if column_type not in (StoredCollectionColumnTypeEnum.Boolean, StoredCollectionColumnTypeEnum.Integer, StoredCollectionColumnTypeEnum.Float):
+            raise StoredCollectionException(f"Cannot aggregate field {field} of column type {column_type.value}.")
+        return compress(self.get_values_column(field=field), self.get_is_valid_column(field=field))
+
+    def get_valid_count(self, *, field: str) -> int:
+        return sum(self.get_is_valid_column(field=field))
+
+    def get_sum(self, *, field: str) -> Any:
+        return sum(self.__get_valid_values(field=field))
+
+    def get_minimum(self, *, field: str) -> Any:
+        return min(self.__get_valid_values(field=field), default=None)
+
+    def get_maximum(self, *, field: str) -> Any:
+        return max(self.__get_valid_values(field=field), default=None)
+
+    def dispose(self):
+        # every view must be released before the map beneath it can be closed
+        for view in self.__views:
+            view.release()
+        self.__views.clear()
+        self.__view_per_file_name.clear()
+        for file_map in self.__maps:
+            file_map.close()
+        self.__maps.clear()
+
+
+class StoredCollectionCompaction():
+
+    def __init__(self, *, records_total: int, deleted_records_total: int, previous_bytes_length: int, bytes_length: int, elapsed_seconds: float):
+        self.__records_total = records_total
+        self.__deleted_records_total = deleted_records_total
+        self.__previous_bytes_length = previous_bytes_length
+        self.__bytes_length = bytes_length
+        self.__elapsed_seconds = elapsed_seconds
+
+    def get_records_total(self) -> int:
+        return self.__records_total
+
+    def get_deleted_records_total(self) -> int:
+        return self.__deleted_records_total
+
+    def get_previous_bytes_length(self) -> int:
+        return self.__previous_bytes_length
+
+    def get_bytes_length(self) -> int:
+        return self.__bytes_length
+
+    def get_reclaimed_bytes_length(self) -> int:
+        return self.__previous_bytes_length - self.__bytes_length
+
+    def get_elapsed_seconds(self) -> float:
+        return self.__elapsed_seconds
+
+    def get_records_per_second(self) -> float:
+        return (self.__records_total - self.__deleted_records_total) / self.__elapsed_seconds if self.__elapsed_seconds > 0 else 0.0
+
+    def get_bytes_per_second(self) -> float:
+        return self.__bytes_length / self.__elapsed_seconds if self.__elapsed_seconds > 0 else 0.0
+
+
+class StoredCollectionReader():
+
+    def __init__(self, *, count: int, read_method: Callable[[int], dict], on_disposed_callback: Callable[[StoredCollectionReader], None]):
+        self.__count = count
+        self.__read_method = read_method
+        self.__on_disposed_callback = on_disposed_callback
+
+        self.__index_position = 0
+
+    def get(self) -> dict:
+        while self.__index_position < self.__count:
+            json_dict = self.__read_method(self.__index_position)
+            self.__index_position += 1
+            if json_dict is not None:
+                return json_dict
+        return None
+
+    def reset(self):
+        self.__index_position = 0
+
+    def count(self) -> int:
+        return self.__count
+
+    def __len__(self) -> int:
+        return self.__count
+
+    def __getitem__(self, index: Any) -> Any:
+        if isinstance(index, slice):
+            return [self.__read_method(slice_index) for slice_index in range(*index.indices(self.__count))]
+        if index < 0:
+            index += self.__count
+        if index < 0 or index >= self.__count:
+            raise IndexError(f"Index {index} is out of range for reader of {self.__count} records.")
+        return self.__read_method(index)
+
+    def __iter__(self) -> Iterator[dict]:
+        for index in range(self.__count):
+            json_dict = self.__read_method(index)
+            if json_dict is not None:
+                yield json_dict
+
+    def dispose(self):
+        self.__on_disposed_callback(self)
+
+
+class StoredCollection():
+
+    # the length and checksum of a log entry, followed by the index of the record and its new index entry
+    log_entry_header_struct = struct.Struct("<II")
+    log_entry_index_struct = struct.Struct("<Q")
+    # the files that compaction writes again, each named with the generation it belongs to
+    generation_file_name_pattern = re.compile(r"(collection|segments|\.blocks|\.index)(?:\.(\d+))?")
+
+    def __init__(self, *, directory_path: str, storage_type: StoredCollectionStorageTypeEnum = None, maximum_segment_bytes_length: int = 2**26, commit_records_total: int = None, commit_milliseconds: float = None, codec_type: StoredCollectionCodecTypeEnum = None, compression_type: StoredCollectionCompressionTypeEnum = None, compression_level: int = None, compression_block_bytes_length: int = None, compression_cached_blocks_total: int = 16, checkpoint_records_total: int = 2**16):
+        self.__directory_path = directory_path
+        self.__storage_type = storage_type
+        self.__codec_type = codec_type
+        self.__maximum_segment_bytes_length = maximum_segment_bytes_length
+        self.__commit_records_total = commit_records_total
+        self.__commit_milliseconds = commit_milliseconds
+        self.__compression_type = compression_type
+        self.__compression_level = compression_level
+        self.__compression_block_bytes_length = compression_block_bytes_length
+        self.__compression_cached_blocks_total = compression_cached_blocks_total
+        self.__checkpoint_records_total = checkpoint_records_total
+
+        self.__storage = None  # type: StoredCollectionStorage
+        self.__codec = None  # type: StoredCollectionCodec
+        self.__record_compressor = None  # type: StoredCollectionCompressor
+        self.__index_file_path = None  # type: str
+        self.__index_file_handle = None  # type: io.BufferedRandom
+        self.__index_map = None  # type: mmap.mmap
+        self.__index_entry_length = None  # type: int
+        self.__count = None  # type: int
+        self.__index_position = None  # type: int
+        self.__uncommitted_records_total = None  # type: int
+        self.__commit_timer_value = None  # type: float
+        self.__secondary_indexes_file_path = None  # type: str
+        self.__secondary_index_per_path = {}  # type: Dict[Tuple[Any, ...], StoredCollectionSecondaryIndex]
+        self.__checkpoint_file_path = None  # type: str
+        self.__log_file_path = None  # type: str
+        self.__log_file_handle = None  # type: io.BufferedWriter
+        self.__logged_index_entry_bytes_per_index = {}  # type: Dict[int, bytes]
+        self.__uncheckpointed_records_total = None  # type: int
+        self.__snapshot_per_reader = {}  # type: Dict[StoredCollectionReader, Tuple[int, int, Dict[int, bytes]]]
+        self.__snapshot_lock = Lock()
+        self.__generation = None  # type: int
+        self.__retired_generation_per_generation = {}  # type: Dict[int, Tuple[StoredCollectionStorage, io.BufferedRandom]]
+        self.__tombstone_index_entry_bytes = None  # type: bytes
+        self.__deleted_records_total = None  # type: int
+
+        self.__initialize()
+
+    def __initialize(self):
+        pathlib.Path(self.__directory_path).mkdir(parents=True, exist_ok=True)
+
+        # the metadata records how the collection was created so that it is opened the same way again
+        metadata_file_path = os.path.join(self.__directory_path, ".metadata")
+        if os.path.exists(metadata_file_path):
+            with open(metadata_file_path, "r") as file_handle:
+                metadata = json.load(file_handle)
+
+            def get_metadata_value(*, key: str, value: Any, default_value: Any) -> Any:
+                # settings missing from older collections have the value that those collections were always created with
+                metadata_value = metadata.get(key, default_value)
+                if value is not None and value != metadata_value:
+                    raise StoredCollectionException(f"Cannot open collection with {key} {value} when it was created with {key} {metadata_value}.")
+                return metadata_value
+
+            self.__storage_type = StoredCollectionStorageTypeEnum(get_metadata_value(
+                key="storage_type",
+                value=None if self.__storage_type is None else self.__storage_type.value,
+                default_value=StoredCollectionStorageTypeEnum.File.value
+            ))
+            self.__maximum_segment_bytes_length = metadata["maximum_segment_bytes_length"]
+            self.__codec_type = StoredCollectionCodecTypeEnum(get_metadata_value(
+                key="codec_type",
+                value=None if self.__codec_type is None else self.__codec_type.value,
+                default_value=StoredCollectionCodecTypeEnum.Json.value
+            ))
+            metadata_compression_type = get_metadata_value(
+                key="compression_type",
+                value=None if self.__compression_type is None else self.__compression_type.value,
+                default_value=None
+            )
+            self.__compression_type = None if metadata_compression_type is None else StoredCollectionCompressionTypeEnum(metadata_compression_type)
+            self.__compression_level = get_metadata_value(
+                key="compression_level",
+                value=self.__compression_level,
+                default_value=None
+            )
+            self.__compression_block_bytes_length = get_metadata_value(
+                key="compression_block_bytes_length",
+                value=self.__compression_block_bytes_length,
+                default_value=None
+            )
+        else:
+            if self.__storage_type is None:
+                self.__storage_type = StoredCollectionStorageTypeEnum.File
+            if self.__codec_type is None:
+                self.__codec_type = StoredCollectionCodecTypeEnum.Json
+            if self.__compression_block_bytes_length is not None and (self.__compression_type is None or self.__storage_type != StoredCollectionStorageTypeEnum.Segment):
+                raise StoredCollectionException(f"Compressing blocks requires a compression type and the {StoredCollectionStorageTypeEnum.Segment.value} storage type.")
+            if self.__compression_level is not None and self.__compression_type is None:
+                raise StoredCollectionException("A compression level requires a compression type.")
+            _write_file_atomically(
+                file_path=metadata_file_path,
+                file_bytes=json.dumps({
+                    "storage_type": self.__storage_type.value,
+                    "maximum_segment_bytes_length": self.__maximum_segment_bytes_length,
+                    "codec_type": self.__codec_type.value,
+                    "compression_type": None if self.__compression_type is None else self.__compression_type.value,
+                    "compression_level": self.__compression_level,
+                    "compression_block_bytes_length": self.__compression_block_bytes_length
+                }).encode(),
+                is_durable=True
+            )
+
+        self.__codec = get_stored_collection_codec(
+            codec_type=self.__codec_type
+        )
+        if self.__compression_type is not None and self.__compression_block_bytes_length is None:
+            self.__record_compressor = StoredCollectionCompressor(
+                compression_type=self.__compression_type,
+                compression_level=self.__compression_level
+            )
+
+        # the checkpoint holds how many index entries were known to refer to written records when it was taken and which generation of files holds them
+        self.__checkpoint_file_path = os.path.join(self.__directory_path, ".checkpoint")
+        if os.path.exists(self.__checkpoint_file_path):
+            with open(self.__checkpoint_file_path, "r") as file_handle:
+                checkpoint = json.load(file_handle)
+        else:
+            checkpoint = {"count": 0}
+        self.__generation = checkpoint.get("generation", 0)
+        self.__deleted_records_total = checkpoint.get("deleted_records_total", None)
+
+        # files of any other generation were left behind by a compaction that was interrupted or whose previous generation was not yet removed
+        for file_name in os.listdir(self.__directory_path):
+            file_name_match = StoredCollection.generation_file_name_pattern.fullmatch(file_name)
+            if file_name_match is not None and int(file_name_match.group(2) or 0) != self.__generation:
+                self.__remove_generation_path(
+                    path=os.path.join(self.__directory_path, file_name)
+                )
+
+        self.__storage = self.__open_storage(
+            generation=self.__generation
+        )
+        self.__index_entry_length = self.__storage.get_index_entry_length()
+        # an index entry that refers to no record marks a deleted record, which keeps the index of every other record unchanged
+        self.__tombstone_index_entry_bytes = b"\xff" * self.__index_entry_length
+
+        # only the index entries appended after the checkpoint are checked, stopping at the first one whose record was not written
+        self.__index_file_path = self.__get_generation_path(
+            name=".index",
+            generation=self.__generation
+        )
+        self.__index_file_handle = open(self.__index_file_path, "r+b" if os.path.exists(self.__index_file_path) else "w+b")
+        index_bytes_length = self.__index_file_handle.seek(0, io.SEEK_END)
+        self.__count = min(checkpoint["count"], index_bytes_length // self.__index_entry_length)
+        self.__index_file_handle.seek(self.__count * self.__index_entry_length)
+        while True:
+            index_entry_bytes = self.__index_file_handle.read(self.__index_entry_length)
+            if len(index_entry_bytes) != self.__index_entry_length or not self.__is_readable(index_entry_bytes=index_entry_bytes):
+                break
+            self.__count += 1
+        self.__index_file_handle.truncate(self.__count * self.__index_entry_length)
+        self.__index_file_handle.seek(0, io.SEEK_END)
+        self.__index_position = self.__count
+
+        self.__uncommitted_records_total = 0
+        self.__commit_timer_value = default_timer()
+        self.__uncheckpointed_records_total = 0
+
+        # the log holds index entries that replaced existing entries since the checkpoint and is replayed up to the first incomplete entry
+        self.__log_file_path = os.path.join(self.__directory_path, ".wal")
+        if os.path.exists(self.__log_file_path):
+            with open(self.__log_file_path, "rb") as file_handle:
+                log_bytes = file_handle.read()
+            log_offset = 0
+            while log_offset + StoredCollection.log_entry_header_struct.size <= len(log_bytes):
+                log_entry_length, log_entry_checksum = StoredCollection.log_entry_header_struct.unpack_from(log_bytes, log_offset)
+                log_entry_bytes = log_bytes[log_offset + StoredCollection.log_entry_header_struct.size:log_offset + StoredCollection.log_entry_header_struct.size + log_entry_length]
+                if len(log_entry_bytes) != log_entry_length or zlib.crc32(log_entry_bytes) != log_entry_checksum:
+                    break
+                index = StoredCollection.log_entry_index_struct.unpack_from(log_entry_bytes)[0]
+                index_entry_bytes = log_entry_bytes[StoredCollection.log_entry_index_struct.size:]
+                if index >= self.__count or not self.__is_readable(index_entry_bytes=index_entry_bytes):
+                    break
+                self.__logged_index_entry_bytes_per_index[index] = index_entry_bytes
+                log_offset += StoredCollection.log_entry_header_struct.size + log_entry_length
+            if log_bytes:
+                # the index may already hold some of the logged entries, so the deleted records cannot be counted from the checkpoint
+                self.__deleted_records_total = None
+        self.__log_file_handle = open(self.__log_file_path, "ab")
+
+        if self.__deleted_records_total is None:
+            self.__deleted_records_total = sum(1 for index in range(self.__count) if self.__get_index_entry_bytes(index=index) == self.__tombstone_index_entry_bytes)
+
+        self.__secondary_indexes_file_path = os.path.join(self.__directory_path, ".secondary_indexes")
+        if os.path.exists(self.__secondary_indexes_file_path):
+            with open(self.__secondary_indexes_file_path, "r") as file_handle:
+                for path in json.load(file_handle):
+                    self.__open_secondary_index(
+                        path=tuple(path)
+                    )
+
+        self.__checkpoint(
+            is_durable=False
+        )
+
+    def __get_generation_path(self, *, name: str, generation: int) -> str:
+        # the first generation keeps the names that were used before collections could be compacted
+        return os.path.join(self.__directory_path, name if generation == 0 else f"{name}.{generation}")
+
+    def __remove_generation_path(self, *, path: str):
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+
+    def __open_storage(self, *, generation: int) -> StoredCollectionStorage:
+        if self.__storage_type == StoredCollectionStorageTypeEnum.File:
+            storage = FileStoredCollectionStorage(
+                directory_path=self.__get_generation_path(
+                    name="collection",
+                    generation=generation
+                )
+            )
+        elif self.__storage_type == StoredCollectionStorageTypeEnum.Segment:
+            storage = SegmentStoredCollectionStorage(
+                directory_path=self.__get_generation_path(
+                    name="segments",
+                    generation=generation
+                ),
+                maximum_segment_bytes_length=self.__maximum_segment_bytes_length
+            )
+        else:
+            raise StoredCollectionException(f"Unexpected {StoredCollectionStorageTypeEnum.__name__} value {self.__storage_type}.")
+
+        # records are either compressed one at a time or together in blocks that are decompressed when first read
+        if self.__compression_type is not None and self.__compression_block_bytes_length is not None:
+            storage = BlockStoredCollectionStorage(
+                storage=storage,
+                block_table_file_path=self.__get_generation_path(
+                    name=".blocks",
+                    generation=generation
+                ),
+                compressor=StoredCollectionCompressor(
+                    compression_type=self.__compression_type,
+                    compression_level=self.__compression_level
+                ),
+                block_bytes_length=self.__compression_block_bytes_length,
+                cached_blocks_total=self.__compression_cached_blocks_total
+            )
+        return storage
+
+    def __get_storage_bytes_length(self, *, generation: int) -> int:
+        return sum(_get_path_bytes_length(path=self.__get_generation_path(name=name, generation=generation)) for name in ["collection", "segments", ".blocks"])
+
+    def __is_readable(self, *, index_entry_bytes: bytes) -> bool:
+        return index_entry_bytes == self.__tombstone_index_entry_bytes or self.__storage.is_readable(
+            index_entry_bytes=index_entry_bytes
+        )
+
+    def __open_secondary_index(self, *, path: Tuple[Any, ...]) -> StoredCollectionSecondaryIndex:
+        path_hash = hashlib.sha256(json.dumps(list(path)).encode()).hexdigest()
+        secondary_index = StoredCollectionSecondaryIndex(
+            path=path,
+            file_path=os.path.join(self.__directory_path, f".index_{path_hash}"),
+            records_total=self.__count
+        )
+        self.__secondary_index_per_path[path] = secondary_index
+        return secondary_index
+
+    def __get_secondary_index(self, *, path: Tuple[Any, ...]) -> StoredCollectionSecondaryIndex:
+        path = tuple(path)
+        if path not in self.__secondary_index_per_path:
+            raise StoredCollectionException(f"There is no secondary index for path {list(path)}.")
+        return self.__secondary_index_per_path[path]
+
+    def add_secondary_index(self, *, path: Tuple[Any, ...]):
+        path = tuple(path)
+        if path not in self.__secondary_index_per_path:
+            secondary_index = self.__open_secondary_index(
+                path=path
+            )
+            for index in range(self.__count):
+                json_dict = self.__read(
+                    index=index
+                )
+                if json_dict is not None:
+                    secondary_index.set(
+                        record_index=index,
+                        json_dict=json_dict
+                    )
+            secondary_index.flush(
+                is_durable=False
+            )
+            _write_file_atomically(
+                file_path=self.__secondary_indexes_file_path,
+                file_bytes=json.dumps([list(path) for path in self.__secondary_index_per_path]).encode(),
+                is_durable=False
+            )
+
+    def find_indexes(self, *, path: Tuple[Any, ...], value: Any) -> List[int]:
+        return self.__get_secondary_index(path=path).find(
+            value=value
+        )
+
+    def find(self, *, path: Tuple[Any, ...], value: Any) -> List[dict]:
+        return [self.__read(index=index) for index in self.find_indexes(path=path, value=value)]
+
+    def find_range_indexes(self, *, path: Tuple[Any, ...], minimum_value: Any = None, maximum_value: Any = None) -> List[int]:
+        return self.__get_secondary_index(path=path).find_range(
+            minimum_value=minimum_value,
+            maximum_value=maximum_value
+        )
+
+    def find_range(self, *, path: Tuple[Any, ...], minimum_value: Any = None, maximum_value: Any = None) -> List[dict]:
+        return [self.__read(index=index) for index in self.find_range_indexes(path=path, minimum_value=minimum_value, maximum_value=maximum_value)]
+
+    def __get_index_map(self, *, minimum_bytes_length: int) -> mmap.mmap:
+        if self.__index_map is None or len(self.__index_map) < minimum_bytes_length:
+            self.__index_file_handle.flush()
+            if self.__index_map is not None:
+                self.__index_map.close()
+            self.__index_map = mmap.mmap(self.__index_file_handle.fileno(), 0)
+        return self.__index_map
+
+    def __get_index_entry_bytes(self, *, index: int) -> bytes:
+        if index in self.__logged_index_entry_bytes_per_index:
+            return self.__logged_index_entry_bytes_per_index[index]
+        index_entry_offset = index * self.__index_entry_length
+        index_map = self.__get_index_map(
+            minimum_bytes_length=index_entry_offset + self.__index_entry_length
+        )
+        return index_map[index_entry_offset:index_entry_offset + self.__index_entry_length]
+
+    def __set_index_entry_bytes(self, *, index: int, index_entry_bytes: bytes):
+        # the index itself is only changed at a checkpoint, so a failure never leaves an entry referring to a record that was not written
+        log_entry_bytes = StoredCollection.log_entry_index_struct.pack(index) + index_entry_bytes
+        self.__log_file_handle.write(StoredCollection.log_entry_header_struct.pack(len(log_entry_bytes), zlib.crc32(log_entry_bytes)) + log_entry_bytes)
+        with self.__snapshot_lock:
+            # readers keep the entry they would have seen before the record was replaced
+            for reader_generation, reader_count, preserved_index_entry_bytes_per_index in self.__snapshot_per_reader.values():
+                if reader_generation == self.__generation and index < reader_count and index not in preserved_index_entry_bytes_per_index:
+                    preserved_index_entry_bytes_per_index[index] = self.__get_index_entry_bytes(
+                        index=index
+                    )
+            self.__logged_index_entry_bytes_per_index[index] = index_entry_bytes
+
+    def __encode(self, *, json_dict: dict) -> bytes:
+        record_bytes = self.__codec.encode(
+            json_dict=json_dict
+        )
+        if self.__record_compressor is not None:
+            record_bytes = self.__record_compressor.compress(
+                record_bytes=record_bytes
+            )
+        return record_bytes
+
+    def __decode(self, *, record_bytes: bytes) -> dict:
+        if self.__record_compressor is not None:
+            record_bytes = self.__record_compressor.decompress(
+                compressed_bytes=record_bytes
+            )
+        return self.__codec.decode(
+            record_bytes=record_bytes
+        )
+
+    def __read_record(self, *, index_entry_bytes: bytes) -> dict:
+        if self.__record_compressor is not None:
+            # compressed records are decompressed straight out of the storage, while the codecs need bytes
+            with self.__storage.read_view(index_entry_bytes=index_entry_bytes) as record_view:
+                record_bytes = self.__record_compressor.decompress(
+                    compressed_bytes=record_view
+                )
+            return self.__codec.decode(
+                record_bytes=record_bytes
+            )
+        return self.__codec.decode(
+            record_bytes=self.__storage.read(
+                index_entry_bytes=index_entry_bytes
+            )
+        )
+
+    def __read(self, *, index: int) -> dict:
+        index_entry_bytes = self.__get_index_entry_bytes(
+            index=index
+        )
+        if index_entry_bytes == self.__tombstone_index_entry_bytes:
+            return None
+        return self.__read_record(
+            index_entry_bytes=index_entry_bytes
+        )
+
+    # without a commit policy, records are left to the operating system and are only durable once commit is called
+    # with commit_records_total, at most commit_records_total - 1 of the most recent records can be lost if the machine fails
+    # with commit_milliseconds, only the records written within commit_milliseconds of the latest write can be lost if the machine fails
+    def __try_commit(self, *, records_total: int):
+        self.__uncommitted_records_total += records_total
+        self.__uncheckpointed_records_total += records_total
+        if self.__commit_records_total is not None and self.__uncommitted_records_total >= self.__commit_records_total:
+            self.commit()
+        elif self.__commit_milliseconds is not None and (default_timer() - self.__commit_timer_value) * 1000 >= self.__commit_milliseconds:
+            self.commit()
+        elif self.__uncheckpointed_records_total >= self.__checkpoint_records_total:
+            # a checkpoint keeps the replayed part of the log and the checked part of the index short when the collection is next opened
+            self.__checkpoint(
+                is_durable=False
+            )
+
+    def __checkpoint(self, *, is_durable: bool):
+        # the records must be written before the index entries that refer to them and the index before the checkpoint that counts them
+        self.__storage.flush(
+            is_durable=is_durable
+        )
+        self.__log_file_handle.flush()
+        if self.__logged_index_entry_bytes_per_index:
+            for index, index_entry_bytes in self.__logged_index_entry_bytes_per_index.items():
+                index_entry_offset = index * self.__index_entry_length
+                index_map = self.__get_index_map(
+                    minimum_bytes_length=index_entry_offset + self.__index_entry_length
+                )
+                index_map[index_entry_offset:index_entry_offset + self.__index_entry_length] = index_entry_bytes
+        self.__index_file_handle.flush()
+        if self.__index_map is not None:
+            self.__index_map.flush()
+        if is_durable:
+            os.fsync(self.__index_file_handle.fileno())
+        for secondary_index in self.__secondary_index_per_path.values():
+            secondary_index.flush(
+                is_durable=is_durable
+            )
+        _write_file_atomically(
+            file_path=self.__checkpoint_file_path,
+            file_bytes=json.dumps({
+                "count": self.__count,
+                "generation": self.__generation,
+                "deleted_records_total": self.__deleted_records_total
+            }).encode(),
+            is_durable=is_durable
+        )
+        # the log is replayed again if a failure happens before it is emptied, which gives the same index
+        self.__log_file_handle.truncate(0)
+        with self.__snapshot_lock:
+            self.__logged_index_entry_bytes_per_index.clear()
+        self.__uncheckpointed_records_total = 0
+
+    def commit(self):
+        self.__checkpoint(
+            is_durable=True
+        )
+        self.__uncommitted_records_total = 0
+        self.__commit_timer_value = default_timer()
+
+    def append(self, *, json_dict: dict):
+        self.append_many(
+            json_dicts=[json_dict]
+        )
+
+    def append_many(self, *, json_dicts: Iterable[dict]):
+        self.__append_many(
+            json_dicts=list(json_dicts)
+        )
+
+    def __append_many(self, *, json_dicts: List[dict]):
+        # a record given as None is appended as deleted so that the records after it keep their index
+        written_index_entries = iter(self.__storage.write_many(
+            record_bytes_list=[self.__encode(json_dict=json_dict) for json_dict in json_dicts if json_dict is not None]
+        ))
+        index_entries = [self.__tombstone_index_entry_bytes if json_dict is None else next(written_index_entries) for json_dict in json_dicts]
+        if index_entries:
+            # the index file handle is never moved away from the end since the index is otherwise accessed through its map
+            self.__index_file_handle.write(b"".join(index_entries))
+            for secondary_index in self.__secondary_index_per_path.values():
+                for index_offset, json_dict in enumerate(json_dicts):
+                    if json_dict is not None:
+                        secondary_index.set(
+                            record_index=self.__count + index_offset,
+                            json_dict=json_dict
+                        )
+            self.__count += len(index_entries)
+            self.__deleted_records_total += sum(1 for json_dict in json_dicts if json_dict is None)
+            self.__index_position = self.__count
+            self.__try_commit(
+                records_total=len(index_entries)
+            )
+
+    def get(self) -> dict:
+        while self.__index_position < self.__count:
+            json_dict = self.__read(
+                index=self.__index_position
+            )
+            self.__index_position += 1
+            if json_dict is not None:
+                return json_dict
+        return None
+
+    def try_process(self, process_method: Callable[[dict], dict]) -> bool:
+        while self.__index_position < self.__count:
+            index = self.__index_position
+            self.__index_position += 1
+            index_entry_bytes = self.__get_index_entry_bytes(
+                index=index
+            )
+            if index_entry_bytes == self.__tombstone_index_entry_bytes:
+                continue
+            json_dict = self.__read_record(
+                index_entry_bytes=index_entry_bytes
+            )
+            processed_json_dict = process_method(json_dict)
+            if processed_json_dict is not None:
+                self.__overwrite(
+                    index=index,
+                    index_entry_bytes=index_entry_bytes,
+                    json_dict=processed_json_dict
+                )
+            return True
+        return False
+
+    def __overwrite(self, *, index: int, index_entry_bytes: bytes, json_dict: dict):
+        with self.__snapshot_lock:
+            is_read_by_reader = any(reader_generation == self.__generation and index < reader_count for reader_generation, reader_count, _ in self.__snapshot_per_reader.values())
+        if is_read_by_reader:
+            # a reader may still read the previous record, so the record is written to a new location instead of over it
+            processed_index_entry_bytes = self.__storage.write(
+                record_bytes=self.__encode(json_dict=json_dict)
+            )
+        else:
+            processed_index_entry_bytes = self.__storage.overwrite(
+                index_entry_bytes=index_entry_bytes,
+                record_bytes=self.__encode(json_dict=json_dict)
+            )
+        if processed_index_entry_bytes != index_entry_bytes:
+            self.__set_index_entry_bytes(
+                index=index,
+                index_entry_bytes=processed_index_entry_bytes
+            )
+        for secondary_index in self.__secondary_index_per_path.values():
+            secondary_index.set(
+                record_index=index,
+                json_dict=json_dict
+            )
+        self.__try_commit(
+            records_total=1
+        )
+
+    def process_all(self, process_method: Callable[[dict], dict], *, workers_total: int = 1, executor_type: ExecutorTypeEnum = ExecutorTypeEnum.Thread, chunk_records_total: int = 1000, on_progress_callback: Callable[[int, int], None] = None) -> int:
+
+        # records are read and written back on the calling thread, in order, so only process_method runs concurrently
+        # the executor type may also be given as its value, such as "thread" or "process"
+        try:
+            executor_type = ExecutorTypeEnum(executor_type)
+        except ValueError:
+            raise StoredCollectionException(f"Unexpected {ExecutorTypeEnum.__name__} value {executor_type}.")
+        records_total = self.__count
+
+        def write_chunk(*, start_index: int, index_entries: List[bytes], processed_json_dicts: List[dict]):
+            for index_offset, processed_json_dict in enumerate(processed_json_dicts):
+                if processed_json_dict is not None:
+                    self.__overwrite(
+                        index=start_index + index_offset,
+                        index_entry_bytes=index_entries[index_offset],
+                        json_dict=processed_json_dict
+                    )
+            if on_progress_callback is not None:
+                on_progress_callback(start_index + len(processed_json_dicts), records_total)
+
+        def read_chunk(*, start_index: int) -> Tuple[List[bytes], List[dict]]:
+            index_entries = [self.__get_index_entry_bytes(index=index) for index in range(start_index, min(start_index + chunk_records_total, records_total))]
+            json_dicts = [None if index_entry_bytes == self.__tombstone_index_entry_bytes else self.__read_record(index_entry_bytes=index_entry_bytes) for index_entry_bytes in index_entries]
+            return index_entries, json_dicts
+
+        if workers_total <= 1:
+            for start_index in range(0, records_total, chunk_records_total):
+                index_entries, json_dicts = read_chunk(
+                    start_index=start_index
+                )
+                write_chunk(
+                    start_index=start_index,
+                    index_entries=index_entries,
+                    processed_json_dicts=_process_json_dicts(process_method, json_dicts)
+                )
+            return records_total
+
+        if executor_type == ExecutorTypeEnum.Thread:
+            executor = ThreadPoolExecutor(max_workers=workers_total)  # type: Executor
+        else:
+            executor = ProcessPoolExecutor(max_workers=workers_total)
+
+        with executor:
+            # only a few chunks per worker are in flight so that the records are not all held in memory at once
+            pending_chunks = deque()  # type: Deque[Tuple[int, List[bytes], Future]]
+            for start_index in range(0, records_total, chunk_records_total):
+                index_entries, json_dicts = read_chunk(
+                    start_index=start_index
+                )
+                pending_chunks.append((start_index, index_entries, executor.submit(_process_json_dicts, process_method, json_dicts)))
+                if len(pending_chunks) >= workers_total * 2:
+                    pending_start_index, pending_index_entries, pending_future = pending_chunks.popleft()
+                    write_chunk(
+                        start_index=pending_start_index,
+                        index_entries=pending_index_entries,
+                        processed_json_dicts=pending_future.result()
+                    )
+            while pending_chunks:
+                pending_start_index, pending_index_entries, pending_future = pending_chunks.popleft()
+                write_chunk(
+                    start_index=pending_start_index,
+                    index_entries=pending_index_entries,
+                    processed_json_dicts=pending_future.result()
+                )
+
+        return records_total
+
+    def reset(self):
+        self.__index_position = 0
+
+    def reader(self) -> StoredCollectionReader:
+        # must be called by the thread that writes, but the reader can then be used by any thread while records are written
+        self.__storage.flush(
+            is_durable=False
+        )
+        self.__index_file_handle.flush()
+
+        # the reader keeps using the files of this generation even after a compaction replaces them
+        reader_generation = self.__generation
+        reader_count = self.__count
+        preserved_index_entry_bytes_per_index = {}  # type: Dict[int, bytes]
+        storage = self.__storage
+        index_file_descriptor = self.__index_file_handle.fileno()
+
+        def read_method(index: int) -> dict:
+            with self.__snapshot_lock:
+                index_entry_bytes = preserved_index_entry_bytes_per_index.get(index, None)
+                if index_entry_bytes is None:
+                    if reader_generation == self.__generation:
+                        index_entry_bytes = self.__logged_index_entry_bytes_per_index.get(index, None)
+                    if index_entry_bytes is None:
+                        index_entry_bytes = os.pread(index_file_descriptor, self.__index_entry_length, index * self.__index_entry_length)
+            if index_entry_bytes == self.__tombstone_index_entry_bytes:
+                return None
+            return self.__decode(
+                record_bytes=storage.read_concurrently(
+                    index_entry_bytes=index_entry_bytes
+                )
+            )
+
+        def on_disposed_callback(disposed_reader: StoredCollectionReader):
+            with self.__snapshot_lock:
+                self.__snapshot_per_reader.pop(disposed_reader, None)
+                self.__try_remove_retired_generation(
+                    generation=reader_generation
+                )
+
+        reader = StoredCollectionReader(
+            count=reader_count,
+            read_method=read_method,
+            on_disposed_callback=on_disposed_callback
+        )
+        with self.__snapshot_lock:
+            self.__snapshot_per_reader[reader] = (reader_generation, reader_count, preserved_index_entry_bytes_per_index)
+        return reader
+
+    def __try_remove_retired_generation(self, *, generation: int):
+        # a retired generation is only removed once no reader can read from it
+        if generation in self.__retired_generation_per_generation and not any(reader_generation == generation for reader_generation, _, _ in self.__snapshot_per_reader.values()):
+            storage, index_file_handle = self.__retired_generation_per_generation.pop(generation)
+            storage.dispose()
+            index_file_handle.close()
+            for name in ["collection", "segments", ".blocks", ".index"]:
+                self.__remove_generation_path(
+                    path=self.__get_generation_path(
+                        name=name,
+                        generation=generation
+                    )
+                )
+
+    def delete(self, *, index: int) -> bool:
+        if index < 0:
+            index += self.__count
+        if index < 0 or index >= self.__count:
+            raise IndexError(f"Index {index} is out of range for collection of {self.__count} records.")
+        if self.__get_index_entry_bytes(index=index) == self.__tombstone_index_entry_bytes:
+            return False
+        # the record itself is left where it is until the collection is compacted
+        self.__set_index_entry_bytes(
+            index=index,
+            index_entry_bytes=self.__tombstone_index_entry_bytes
+        )
+        self.__deleted_records_total += 1
+        for secondary_index in self.__secondary_index_per_path.values():
+            secondary_index.set(
+                record_index=index,
+                json_dict={}
+            )
+        self.__try_commit(
+            records_total=1
+        )
+        return True
+
+    def deleted_count(self) -> int:
+        return self.__deleted_records_total
+
+    def export_columns(self, *, directory_path: str, fields: List[str] = None) -> StoredCollectionColumns:
+        # deleted records keep their row so that each row has the index of its record
+        return StoredCollectionColumns.write(
+            directory_path=directory_path,
+            json_dicts=lambda: (self.__read(index=index) for index in range(self.__count)),
+            fields=fields
+        )
+
+    def import_columns(self, *, stored_collection_columns: StoredCollectionColumns, chunk_records_total: int = 1000):
+        # deleted records are imported as deleted so that every record keeps the index that it had when exported
+        json_dicts = stored_collection_columns.iterate(
+            is_deleted_included=True
+        )
+        chunk = list(islice(json_dicts, chunk_records_total))
+        while chunk:
+            self.__append_many(
+                json_dicts=chunk
+            )
+            chunk = list(islice(json_dicts, chunk_records_total))
+
+    def compact(self, *, chunk_records_total: int = 1000) -> StoredCollectionCompaction:
+        start_timer_value = default_timer()
+        self.__checkpoint(
+            is_durable=True
+        )
+        previous_bytes_length = self.__get_storage_bytes_length(
+            generation=self.__generation
+        )
+
+        # the live records are copied in order into the files of the next generation, which replace the current files only once they are complete
+        generation = self.__generation + 1
+        storage = self.__open_storage(
+            generation=generation
+        )
+        index_file_path = self.__get_generation_path(
+            name=".index",
+            generation=generation
+        )
+        with open(index_file_path, "wb") as index_file_handle:
+            for start_index in range(0, self.__count, chunk_records_total):
+                index_entries = [self.__get_index_entry_bytes(index=index) for index in range(start_index, min(start_index + chunk_records_total, self.__count))]
+                compacted_index_entries = iter(storage.write_many(
+                    record_bytes_list=[self.__storage.read(index_entry_bytes=index_entry_bytes) for index_entry_bytes in index_entries if index_entry_bytes != self.__tombstone_index_entry_bytes]
+                ))
+                index_file_handle.write(b"".join(index_entry_bytes if index_entry_bytes == self.__tombstone_index_entry_bytes else next(compacted_index_entries) for index_entry_bytes in index_entries))
+            index_file_handle.flush()
+            os.fsync(index_file_handle.fileno())
+        storage.flush(
+            is_durable=True
+        )
+        _synchronize_directory(
+            directory_path=self.__directory_path
+        )
+
+        with self.__snapshot_lock:
+            self.__retired_generation_per_generation[self.__generation] = (self.__storage, self.__index_file_handle)
+            if self.__index_map is not None:
+                self.__index_map.close()
+                self.__index_map = None
+            previous_generation = self.__generation
+            self.__generation = generation
+            self.__storage = storage
+            self.__index_file_path = index_file_path
+            self.__index_file_handle = open(self.__index_file_path, "r+b")
+            self.__index_file_handle.seek(0, io.SEEK_END)
+
+        # the collection uses the next generation from the moment that the checkpoint refers to it
+        self.__checkpoint(
+            is_durable=True
+        )
+        with self.__snapshot_lock:
+            self.__try_remove_retired_generation(
+                generation=previous_generation
+            )
+
+        return StoredCollectionCompaction(
+            records_total=self.__count,
+            deleted_records_total=self.__deleted_records_total,
+            previous_bytes_length=previous_bytes_length,
+            bytes_length=self.__get_storage_bytes_length(
+                generation=generation
+            ),
+            elapsed_seconds=default_timer() - start_timer_value
+        )
+
+    def count(self) -> int:
+        return self.__count
+
+    def __len__(self) -> int:
+        return self.__count
+
+    def __getitem__(self, index: Any) -> Any:
+        if isinstance(index, slice):
+            return [self.__read(index=slice_index) for slice_index in range(*index.indices(self.__count))]
+        if index < 0:
+            index += self.__count
+        if index < 0 or index >= self.__count:
+            raise IndexError(f"Index {index} is out of range for collection of {self.__count} records.")
+        return self.__read(
+            index=index
+        )
+
+    def dispose(self):
+        self.__checkpoint(
+            is_durable=False
+        )
+        if self.__index_map is not None:
+            self.__index_map.close()
+            self.__index_map = None
+        self.__index_file_handle.close()
+        self.__log_file_handle.close()
+        self.__storage.dispose()
+        for secondary_index in self.__secondary_index_per_path.values():
+            secondary_index.dispose()
+        with self.__snapshot_lock:
+            for storage, index_file_handle in self.__retired_generation_per_generation.values():
+                storage.dispose()
+                index_file_handle.close()
+            self.__retired_generation_per_generation.clear()
+
+
+class AsyncStoredCollection():
+
+    def __init__(self, *, stored_collection: StoredCollection, prefetch_records_total: int = 8):
+        self.__stored_collection = stored_collection
+        self.__prefetch_records_total = prefetch_records_total
+
+        # one worker means the stored collection is only ever used by one thread and operations run in the order they were requested
+        self.__executor = ThreadPoolExecutor(max_workers=1)
+        self.__index_position = stored_collection.count()
+        self.__prefetched_json_dicts = deque()  # type: Deque[asyncio.Future]
+
+    def __try_get_json_dict(self, index: int) -> Tuple[bool, Optional[dict]]:
+        # a deleted record is found but has no value, while an index past the end is not found
+        if index < self.__stored_collection.count():
+            return True, self.__stored_collection[index]
+        return False, None
+
+    def __append_many(self, json_dicts: List[dict]) -> int:
+        self.__stored_collection.append_many(
+            json_dicts=json_dicts
+        )
+        return self.__stored_collection.count()
+
+    async def __run(self, method: Callable[..., Any], *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self.__executor, method, *args)
+
+    async def append(self, *, json_dict: dict):
+        await self.append_many(
+            json_dicts=[json_dict]
+        )
+
+    async def append_many(self, *, json_dicts: Iterable[dict]):
+        count = await self.__run(self.__append_many, list(json_dicts))
+        # anything read ahead may have reached the previous end of the collection before these records existed
+        self.__prefetched_json_dicts.clear()
+        self.__index_position = count
+
+    async def get(self) -> Optional[dict]:
+        loop = asyncio.get_running_loop()
+        while True:
+            while len(self.__prefetched_json_dicts) < max(1, self.__prefetch_records_total):
+                self.__prefetched_json_dicts.append(loop.run_in_executor(self.__executor, self.__try_get_json_dict, self.__index_position + len(self.__prefetched_json_dicts)))
+            is_found, json_dict = await self.__prefetched_json_dicts.popleft()
+            if not is_found:
+                self.__prefetched_json_dicts.clear()
+                return None
+            self.__index_position += 1
+            if json_dict is not None:
+                return json_dict
+
+    def reset(self):
+        self.__prefetched_json_dicts.clear()
+        self.__index_position = 0
+
+    async def count(self) -> int:
+        return await self.__run(self.__stored_collection.count)
+
+    async def commit(self):
+        await self.__run(self.__stored_collection.commit)
+
+    async def delete(self, *, index: int) -> bool:
+        self.__prefetched_json_dicts.clear()
+        return await self.__run(functools.partial(self.__stored_collection.delete, index=index))
+
+    async def compact(self) -> StoredCollectionCompaction:
+        # the collection is compacted on the worker thread, so the event loop keeps running while the records are copied
+        return await self.__run(self.__stored_collection.compact)
+
+    def __aiter__(self):
+        return self.__iterate()
+
+    async def __iterate(self):
+        loop = asyncio.get_running_loop()
+        prefetched_json_dicts = deque()  # type: Deque[asyncio.Future]
+        index = 0
+        while True:
+            while len(prefetched_json_dicts) < max(1, self.__prefetch_records_total):
+                prefetched_json_dicts.append(loop.run_in_executor(self.__executor, self.__try_get_json_dict, index + len(prefetched_json_dicts)))
+            is_found, json_dict = await prefetched_json_dicts.popleft()
+            if not is_found:
+                break
+            index += 1
+            if json_dict is not None:
+                yield json_dict
+
+    async def dispose(self):
+        self.__prefetched_json_dicts.clear()
+        await self.__run(self.__stored_collection.dispose)
+        self.__executor.shutdown(wait=True)
+
+
+class ShardedStoredCollectionPartitionTypeEnum(StringEnum):
+    RoundRobin = "round_robin"
+    Hash = "hash"
+
+
+class ShardedStoredCollection():
+
+    def __init__(self, *, directory_path: str, stored_collections: List[StoredCollection], partition_type: ShardedStoredCollectionPartitionTypeEnum = None, partition_path: Tuple[Any, ...] = None, chunk_records_total: int = 1000):
+        self.__directory_path = directory_path
+        self.__stored_collections = stored_collections
+        self.__partition_type = partition_type
+        self.__partition_path = None if partition_path is None else tuple(partition_path)
+        self.__chunk_records_total = chunk_records_total
+
+        self.__sequence_file_path = None  # type: str
+        self.__sequence_file_handle = None  # type: io.BufferedWriter
+        self.__shard_index_per_sequence_index = None  # type: array.array
+        self.__executor = None  # type: ThreadPoolExecutor
+
+        self.__initialize()
+
+    def __initialize(self):
+        pathlib.Path(self.__directory_path).mkdir(parents=True, exist_ok=True)
+
+        # the metadata records how records were partitioned so that they are found in the same shards when opened again
+        metadata_file_path = os.path.join(self.__directory_path, ".metadata")
+        if os.path.exists(metadata_file_path):
+            with open(metadata_file_path, "r") as file_handle:
+                metadata = json.load(file_handle)
+            if metadata["shards_total"] != len(self.__stored_collections):
+                raise StoredCollectionException(f"Cannot open sharded collection with {len(self.__stored_collections)} shards when it was created with {metadata['shards_total']} shards.")
+            if self.__partition_type is not None and self.__partition_type.value != metadata["partition_type"]:
+                raise StoredCollectionException(f"Cannot open sharded collection with partition_type {self.__partition_type.value} when it was created with partition_type {metadata['partition_type']}.")
+            if self.__partition_path is not None and list(self.__partition_path) != metadata["partition_path"]:
+                raise StoredCollectionException(f"Cannot open sharded collection with partition_path {list(self.__partition_path)} when it was created with partition_path {metadata['partition_path']}.")
+            self.__partition_type = ShardedStoredCollectionPartitionTypeEnum(metadata["partition_type"])
+            self.__partition_path = None if metadata["partition_path"] is None else tuple(metadata["partition_path"])
+        else:
+            if not self.__stored_collections or len(self.__stored_collections) > 2**16:
+                raise StoredCollectionException(f"Cannot create sharded collection with {len(self.__stored_collections)} shards.")
+            if self.__partition_type is None:
+                self.__partition_type = ShardedStoredCollectionPartitionTypeEnum.RoundRobin
+            if self.__partition_type == ShardedStoredCollectionPartitionTypeEnum.Hash and self.__partition_path is None:
+                raise StoredCollectionException(f"Partitioning by {ShardedStoredCollectionPartitionTypeEnum.Hash.value} requires a partition_path.")
+            _write_file_atomically(
+                file_path=metadata_file_path,
+                file_bytes=json.dumps({
+                    "shards_total": len(self.__stored_collections),
+                    "partition_type": self.__partition_type.value,
+                    "partition_path": None if self.__partition_path is None else list(self.__partition_path)
+                }).encode(),
+                is_durable=True
+            )
+
+        # the sequence holds the shard of each record in the order that the records were appended
+        self.__sequence_file_path = os.path.join(self.__directory_path, ".sequence")
+        self.__shard_index_per_sequence_index = array.array("H")
+        if os.path.exists(self.__sequence_file_path):
+            with open(self.__sequence_file_path, "rb") as file_handle:
+                sequence_bytes = file_handle.read()
+            self.__shard_index_per_sequence_index.frombytes(sequence_bytes[:len(sequence_bytes) - len(sequence_bytes) % self.__shard_index_per_sequence_index.itemsize])
+
+        # a failure between appending to a shard and appending to the sequence leaves them disagreeing, so the sequence is made to match the shards
+        counts = [stored_collection.count() for stored_collection in self.__stored_collections]
+        sequenced_counts = [0] * len(self.__stored_collections)
+        shard_index_per_sequence_index = array.array("H")
+        for shard_index in self.__shard_index_per_sequence_index:
+            if shard_index < len(counts) and sequenced_counts[shard_index] < counts[shard_index]:
+                shard_index_per_sequence_index.append(shard_index)
+                sequenced_counts[shard_index] += 1
+        for shard_index, count in enumerate(counts):
+            shard_index_per_sequence_index.extend([shard_index] * (count - sequenced_counts[shard_index]))
+        if shard_index_per_sequence_index != self.__shard_index_per_sequence_index or not os.path.exists(self.__sequence_file_path):
+            self.__shard_index_per_sequence_index = shard_index_per_sequence_index
+            _write_file_atomically(
+                file_path=self.__sequence_file_path,
+                file_bytes=self.__shard_index_per_sequence_index.tobytes(),
+                is_durable=True
+            )
+        self.__sequence_file_handle = open(self.__sequence_file_path, "ab")
+
+        # each shard is only ever used by one worker at a time, so shards on different disks are read and written at the same time
+        self.__executor = ThreadPoolExecutor(max_workers=len(self.__stored_collections))
+
+    def __get_shard_index(self, *, json_dict: dict, sequence_index: int) -> int:
+        if self.__partition_type == ShardedStoredCollectionPartitionTypeEnum.RoundRobin:
+            return sequence_index % len(self.__stored_collections)
+        if self.__partition_type == ShardedStoredCollectionPartitionTypeEnum.Hash:
+            is_found, value = _get_json_path_value(
+                json_dict=json_dict,
+                path=self.__partition_path
+            )
+            # records without a single value at the partition path would all be placed in the same shard
+            if not is_found:
+                raise StoredCollectionException(f"Cannot partition record by {ShardedStoredCollectionPartitionTypeEnum.Hash.value} without a single value at partition_path {list(self.__partition_path)}.")
+            # the hash must not change between processes, which rules out the builtin hash
+            value_hash = hashlib.blake2b(json.dumps(value, sort_keys=True).encode(), digest_size=8).digest()
+            return int.from_bytes(value_hash, "little") % len(self.__stored_collections)
+        raise StoredCollectionException(f"Unexpected {ShardedStoredCollectionPartitionTypeEnum.__name__} value {self.__partition_type}.")
+
+    def __map_shards(self, method: Callable[[StoredCollection], Any]) -> List[Any]:
+        futures = [self.__executor.submit(method, stored_collection) for stored_collection in self.__stored_collections]
+        return [future.result() for future in futures]
+
+    def append(self, *, json_dict: dict):
+        self.append_many(
+            json_dicts=[json_dict]
+        )
+
+    def append_many(self, *, json_dicts: Iterable[dict]):
+        json_dicts_per_shard_index = [[] for _ in self.__stored_collections]  # type: List[List[dict]]
+        shard_index_per_sequence_index = array.array("H")
+        for json_dict in json_dicts:
+            shard_index = self.__get_shard_index(
+                json_dict=json_dict,
+                sequence_index=len(self.__shard_index_per_sequence_index) + len(shard_index_per_sequence_index)
+            )
+            json_dicts_per_shard_index[shard_index].append(json_dict)
+            shard_index_per_sequence_index.append(shard_index)
+
+        futures = [self.__executor.submit(functools.partial(stored_collection.append_many, json_dicts=shard_json_dicts)) for stored_collection, shard_json_dicts in zip(self.__stored_collections, json_dicts_per_shard_index) if shard_json_dicts]
+        for future in futures:
+            future.result()
+
+        # the sequence is written after the records so that it never refers to a record that does not exist
+        self.__sequence_file_handle.write(shard_index_per_sequence_index.tobytes())
+        self.__sequence_file_handle.flush()
+        self.__shard_index_per_sequence_index.extend(shard_index_per_sequence_index)
+
+    def count(self) -> int:
+        return len(self.__shard_index_per_sequence_index)
+
+    def __len__(self) -> int:
+        return len(self.__shard_index_per_sequence_index)
+
+    def get_shard_counts(self) -> List[int]:
+        return [stored_collection.count() for stored_collection in self.__stored_collections]
+
+    def process_all(self, process_method: Callable[[dict], dict], *, workers_total: int = 1, executor_type: ExecutorTypeEnum = ExecutorTypeEnum.Thread) -> int:
+        # the workers are per shard, since every shard is already processed by its own worker
+        return sum(self.__map_shards(lambda stored_collection: stored_collection.process_all(process_method, workers_total=workers_total, executor_type=executor_type, chunk_records_total=self.__chunk_records_total)))
+
+    def scan(self, scan_method: Callable[[StoredCollectionReader], Any]) -> List[Any]:
+        # each shard is scanned by its own worker and the results are in the order of the shards
+        readers = [stored_collection.reader() for stored_collection in self.__stored_collections]
+        try:
+            futures = [self.__executor.submit(scan_method, reader) for reader in readers]
+            return [future.result() for future in futures]
+        finally:
+            for reader in readers:
+                reader.dispose()
+
+    def iterate(self, *, is_ordered: bool = False) -> Iterator[dict]:
+        # the next chunk of each shard is read by a worker while the current chunk is being consumed
+        readers = [stored_collection.reader() for stored_collection in self.__stored_collections]
+        shard_index_per_sequence_index = self.__shard_index_per_sequence_index[:]
+        try:
+            chunk_futures_per_shard_index = [deque() for _ in readers]  # type: List[Deque[Future]]
+            chunk_start_index_per_shard_index = [0] * len(readers)
+
+            def get_chunk(shard_index: int) -> List[dict]:
+                chunk_futures = chunk_futures_per_shard_index[shard_index]
+                while len(chunk_futures) < 2 and chunk_start_index_per_shard_index[shard_index] < readers[shard_index].count():
+                    chunk_start_index = chunk_start_index_per_shard_index[shard_index]
+                    chunk_futures.append(self.__executor.submit(readers[shard_index].__getitem__, slice(chunk_start_index, chunk_start_index + self.__chunk_records_total)))
+                    chunk_start_index_per_shard_index[shard_index] += self.__chunk_records_total
+                return chunk_futures.popleft().result() if chunk_futures else []
+
+            if is_ordered:
+                chunk_per_shard_index = [[] for _ in readers]  # type: List[List[dict]]
+                chunk_offset_per_shard_index = [0] * len(readers)
+                for shard_index in shard_index_per_sequence_index:
+                    if chunk_offset_per_shard_index[shard_index] == len(chunk_per_shard_index[shard_index]):
+                        chunk_per_shard_index[shard_index] = get_chunk(shard_index)
+                        chunk_offset_per_shard_index[shard_index] = 0
+                    json_dict = chunk_per_shard_index[shard_index][chunk_offset_per_shard_index[shard_index]]
+                    chunk_offset_per_shard_index[shard_index] += 1
+                    if json_dict is not None:
+                        yield json_dict
+            else:
+                shard_indexes = deque(range(len(readers)))
+                while shard_indexes:
+                    shard_index = shard_indexes.popleft()
+                    chunk = get_chunk(shard_index)
+                    if chunk:
+                        shard_indexes.append(shard_index)
+                        for json_dict in chunk:
+                            if json_dict is not None:
+                                yield json_dict
+        finally:
+            for reader in readers:
+                reader.dispose()
+
+    def __iter__(self) -> Iterator[dict]:
+        return self.iterate(
+            is_ordered=False
+        )
+
+    def commit(self):
+        self.__map_shards(lambda stored_collection: stored_collection.commit())
+        os.fsync(self.__sequence_file_handle.fileno())
+
+    def dispose(self):
+        self.__map_shards(lambda stored_collection: stored_collection.dispose())
+        self.__sequence_file_handle.close()
+        self.__executor.shutdown(wait=True)
 
 
 datetime_string_format = "%Y-%m-%d %H:%M:%S.%f"
@@ -3,7 +3,9 @@ import unittest
 from typing import List, Tuple, Dict, Type, Callable
 import gc
 import random
-from src.austin_heller_repo.common import AggregateDependentDependencyManager
+import time
+from threading import Thread, Lock
+from src.austin_heller_repo.common import AggregateDependentDependencyManager, DependencyMatchingPolicyTypeEnum
 
 
 class AggregateDependentDependencyManagerTest(unittest.TestCase):
@@ -373,3 +375,499 @@ class AggregateDependentDependencyManagerTest(unittest.TestCase):
 				self.assertEqual(expected, [(found_pairs[0][0], actual)])
 			else:
 				self.assertEqual(index + 1, len(found_pairs))
+
+	def test_batches(self):
+
+		found_pairs = []  # type: List[Tuple[str, List[Tuple[str, str]]]]
+		def on_dependent_dependency_satisfied_callback(dependent, dependency_and_key_pairs):
+			found_pairs.append((dependent, dependency_and_key_pairs))
+
+		batches = []  # type: List[List[Tuple[str, List[Tuple[str, str]]]]]
+		def on_dependent_dependency_batch_satisfied_callback(dependent_and_dependency_and_key_pairs_pairs):
+			batches.append(dependent_and_dependency_and_key_pairs_pairs)
+
+		manager = AggregateDependentDependencyManager(
+			on_dependent_dependency_satisfied_callback=on_dependent_dependency_satisfied_callback,
+			on_dependent_dependency_batch_satisfied_callback=on_dependent_dependency_batch_satisfied_callback
+		)
+
+		manager.add_dependents(
+			dependent_and_keys_tuples=[
+				("dependent 0", ["reuse"], ["non 0"]),
+				("dependent 1", ["reuse"], []),
+				("dependent 2", [], ["non 0", "non 1"])
+			]
+		)
+		manager.add_dependency(
+			key="reuse",
+			dependency="dep 0",
+			is_reusable=True
+		)
+
+		self.assertEqual([("dependent 1", [("dep 0", "reuse")])], found_pairs)
+		self.assertEqual([], batches)
+
+		manager.add_dependencies(
+			dependency_key_and_is_reusable_tuples=[
+				("dep 1", "non 0", False),
+				("dep 2", "non 1", False),
+				("dep 3", "non 0", False)
+			]
+		)
+
+		self.assertEqual(1, len(batches))
+		self.assertEqual([("dependent 0", [("dep 0", "reuse"), ("dep 1", "non 0")]), ("dependent 2", [("dep 2", "non 1"), ("dep 3", "non 0")])], sorted((dependent, sorted(dependency_and_key_pairs)) for dependent, dependency_and_key_pairs in batches[0]))
+
+		manager.add_dependents(
+			dependent_and_keys_tuples=[
+				("dependent 3", ["reuse"], [])
+			]
+		)
+
+		self.assertEqual([("dependent 3", [("dep 0", "reuse")])], batches[1])
+
+	def test_timing_batches(self):
+
+		def on_dependent_dependency_satisfied_callback(dependent, dependency_and_key_pairs):
+			pass
+
+		manager = AggregateDependentDependencyManager(
+			on_dependent_dependency_satisfied_callback=on_dependent_dependency_satisfied_callback
+		)
+
+		start_time = time.perf_counter()
+		for index in range(100000):
+			manager.add_dependent(
+				dependent=index,
+				reusable_keys=[index % 10],
+				nonreusable_keys=[index % 1000]
+			)
+		print(f"separately: {time.perf_counter() - start_time} seconds")
+
+		manager = AggregateDependentDependencyManager(
+			on_dependent_dependency_satisfied_callback=on_dependent_dependency_satisfied_callback
+		)
+
+		start_time = time.perf_counter()
+		manager.add_dependents(
+			dependent_and_keys_tuples=[(index, [index % 10], [index % 1000]) for index in range(100000)]
+		)
+		print(f"batch: {time.perf_counter() - start_time} seconds")
+
+	def test_unhashable_and_duplicate_dependents(self):
+
+		found_pairs = []  # type: List[Tuple[Dict, List[Tuple[str, str]]]]
+		def on_dependent_dependency_satisfied_callback(dependent, dependency_and_key_pairs):
+			nonlocal found_pairs
+			found_pairs.append((dependent, dependency_and_key_pairs))
+
+		manager = AggregateDependentDependencyManager(
+			on_dependent_dependency_satisfied_callback=on_dependent_dependency_satisfied_callback
+		)
+
+		dependent = {"name": "dependent"}
+		first_handle = manager.add_dependent(
+			dependent=dependent,
+			reusable_keys=[],
+			nonreusable_keys=["key 0", "key 1"]
+		)
+		second_handle = manager.add_dependent(
+			dependent=dependent,
+			reusable_keys=[],
+			nonreusable_keys=["key 0"]
+		)
+
+		self.assertIs(dependent, first_handle.get_dependent())
+		self.assertIs(dependent, second_handle.get_dependent())
+		self.assertEqual(2, first_handle.get_remaining_dependencies_total())
+
+		manager.add_dependency(
+			key="key 0",
+			dependency="dependency 0",
+			is_reusable=False
+		)
+		manager.add_dependency(
+			key="key 0",
+			dependency="dependency 1",
+			is_reusable=False
+		)
+
+		self.assertEqual([(dependent, [("dependency 1", "key 0")])], found_pairs)
+		self.assertEqual(1, first_handle.get_remaining_dependencies_total())
+
+		manager.add_dependency(
+			key="key 1",
+			dependency="dependency 2",
+			is_reusable=False
+		)
+
+		self.assertEqual([(dependent, [("dependency 1", "key 0")]), (dependent, [("dependency 0", "key 0"), ("dependency 2", "key 1")])], found_pairs)
+
+	def test_dependent_without_keys(self):
+
+		found_pairs = []  # type: List[Tuple[str, List[Tuple[str, str]]]]
+		def on_dependent_dependency_satisfied_callback(dependent, dependency_and_key_pairs):
+			nonlocal found_pairs
+			found_pairs.append((dependent, dependency_and_key_pairs))
+
+		manager = AggregateDependentDependencyManager(
+			on_dependent_dependency_satisfied_callback=on_dependent_dependency_satisfied_callback
+		)
+
+		manager.add_dependent(
+			dependent="dependent 0",
+			reusable_keys=[],
+			nonreusable_keys=[]
+		)
+
+		self.assertEqual([("dependent 0", [])], found_pairs)
+
+	def test_callback_adds_to_manager(self):
+
+		found_pairs = []  # type: List[Tuple[str, List[Tuple[str, str]]]]
+		def on_dependent_dependency_satisfied_callback(dependent, dependency_and_key_pairs):
+			nonlocal found_pairs
+			found_pairs.append((dependent, dependency_and_key_pairs))
+			if dependent == "dependent 0":
+				# the callback is called outside of any lock, so it can add to the same keys
+				manager.add_dependency(
+					key="key",
+					dependency="dependency 1",
+					is_reusable=False
+				)
+				manager.add_dependent(
+					dependent="dependent 1",
+					reusable_keys=[],
+					nonreusable_keys=["key"]
+				)
+
+		manager = AggregateDependentDependencyManager(
+			on_dependent_dependency_satisfied_callback=on_dependent_dependency_satisfied_callback
+		)
+
+		manager.add_dependent(
+			dependent="dependent 0",
+			reusable_keys=[],
+			nonreusable_keys=["key"]
+		)
+		manager.add_dependency(
+			key="key",
+			dependency="dependency 0",
+			is_reusable=False
+		)
+
+		self.assertEqual([("dependent 0", [("dependency 0", "key")]), ("dependent 1", [("dependency 1", "key")])], found_pairs)
+
+	def test_threads_satisfy_shared_dependents(self):
+
+		threads_total = 8
+		keys_total = 64
+		dependents_total = 1000
+
+		found_pairs = []  # type: List[Tuple[int, List[Tuple[int, int]]]]
+		def on_dependent_dependency_satisfied_callback(dependent, dependency_and_key_pairs):
+			found_pairs.append((dependent, dependency_and_key_pairs))
+
+		manager = AggregateDependentDependencyManager(
+			on_dependent_dependency_satisfied_callback=on_dependent_dependency_satisfied_callback
+		)
+
+		manager.add_dependents(
+			dependent_and_keys_tuples=[(index, [], list(range(keys_total))) for index in range(dependents_total)]
+		)
+
+		def add_dependencies(thread_index: int):
+			for key in range(thread_index, keys_total, threads_total):
+				for index in range(dependents_total):
+					manager.add_dependency(
+						key=key,
+						dependency=index,
+						is_reusable=False
+					)
+
+		threads = [Thread(target=add_dependencies, args=(thread_index,)) for thread_index in range(threads_total)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+
+		self.assertEqual(dependents_total, len(found_pairs))
+		for dependent, dependency_and_key_pairs in found_pairs:
+			self.assertEqual(list(range(keys_total)), sorted(key for dependency, key in dependency_and_key_pairs))
+
+	def test_threads_add_dependents_with_overlapping_nonreusable_keys(self):
+
+		threads_total = 8
+		dependents_per_thread_total = 500
+
+		satisfied_total = 0
+		satisfied_total_lock = Lock()
+		def on_dependent_dependency_satisfied_callback(dependent, dependency_and_key_pairs):
+			nonlocal satisfied_total
+			with satisfied_total_lock:
+				satisfied_total += 1
+
+		# the keys are in different stripes, so each dependent is added to two stripes
+		manager = AggregateDependentDependencyManager(
+			on_dependent_dependency_satisfied_callback=on_dependent_dependency_satisfied_callback,
+			stripes_total=2
+		)
+
+		def add_dependents(thread_index: int):
+			# half of the threads wait on the keys in the opposite order
+			keys = [0, 1] if thread_index % 2 == 0 else [1, 0]
+			for index in range(dependents_per_thread_total):
+				manager.add_dependent(
+					dependent=(thread_index, index),
+					reusable_keys=[],
+					nonreusable_keys=keys
+				)
+
+		threads = [Thread(target=add_dependents, args=(thread_index,)) for thread_index in range(threads_total)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+
+		# every dependent waits in the same order on both keys, so each pair of dependencies satisfies exactly one dependent instead of being split between two
+		for index in range(threads_total * dependents_per_thread_total):
+			manager.add_dependencies(
+				dependency_key_and_is_reusable_tuples=[(index, 0, False), (index, 1, False)]
+			)
+			self.assertEqual(index + 1, satisfied_total)
+
+		manager.dispose()
+
+	def test_timing_many_keys_per_dependent(self):
+
+		threads_total = 8
+		keys_total = 256
+		dependents_total = 2000
+
+		satisfied_total = 0
+		satisfied_total_lock = Lock()
+		def on_dependent_dependency_satisfied_callback(dependent, dependency_and_key_pairs):
+			nonlocal satisfied_total
+			with satisfied_total_lock:
+				satisfied_total += 1
+
+		manager = AggregateDependentDependencyManager(
+			on_dependent_dependency_satisfied_callback=on_dependent_dependency_satisfied_callback
+		)
+
+		manager.add_dependents(
+			dependent_and_keys_tuples=[(index, [], list(range(keys_total))) for index in range(dependents_total)]
+		)
+
+		def add_dependencies(thread_index: int):
+			manager.add_dependencies(
+				dependency_key_and_is_reusable_tuples=[(index, key, False) for key in range(thread_index, keys_total, threads_total) for index in range(dependents_total)]
+			)
+
+		start_time = time.perf_counter()
+		threads = [Thread(target=add_dependencies, args=(thread_index,)) for thread_index in range(threads_total)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		elapsed_seconds = time.perf_counter() - start_time
+
+		self.assertEqual(dependents_total, satisfied_total)
+		print(f"{keys_total * dependents_total / elapsed_seconds} dependencies per second")
+
+	def test_policies(self):
+
+		found_pairs = []  # type: List[Tuple[str, List[Tuple[str, str]]]]
+		def on_dependent_dependency_satisfied_callback(dependent, dependency_and_key_pairs):
+			found_pairs.append((dependent, dependency_and_key_pairs))
+
+		manager = AggregateDependentDependencyManager(
+			on_dependent_dependency_satisfied_callback=on_dependent_dependency_satisfied_callback,
+			dependent_policy_type=DependencyMatchingPolicyTypeEnum.Priority,
+			reusable_dependency_policy_type=DependencyMatchingPolicyTypeEnum.WeightedRoundRobin
+		)
+
+		manager.add_dependent(dependent="low", reusable_keys=["worker"], nonreusable_keys=["job"], priority=0)
+		manager.add_dependent(dependent="high", reusable_keys=["worker"], nonreusable_keys=["job"], priority=1)
+		manager.add_dependency(key="worker", dependency="worker 0", is_reusable=True, weight=2)
+		manager.add_dependency(key="worker", dependency="worker 1", is_reusable=True, weight=1)
+
+		self.assertEqual([], found_pairs)
+
+		manager.add_dependency(key="job", dependency="job 0", is_reusable=False)
+
+		self.assertEqual([("high", [("worker 0", "worker"), ("job 0", "job")])], found_pairs)
+
+		manager.add_dependency(key="job", dependency="job 1", is_reusable=False)
+
+		self.assertEqual(("low", [("worker 0", "worker"), ("job 1", "job")]), found_pairs[1])
+
+	def test_cancel_returns_nonreusable_dependencies(self):
+
+		found_pairs = []  # type: List[Tuple[str, List[Tuple[str, str]]]]
+		def on_dependent_dependency_satisfied_callback(dependent, dependency_and_key_pairs):
+			found_pairs.append((dependent, dependency_and_key_pairs))
+
+		manager = AggregateDependentDependencyManager(
+			on_dependent_dependency_satisfied_callback=on_dependent_dependency_satisfied_callback
+		)
+
+		handle = manager.add_dependent(
+			dependent="dependent 0",
+			reusable_keys=["worker"],
+			nonreusable_keys=["job", "lock"]
+		)
+		manager.add_dependency(key="worker", dependency="worker 0", is_reusable=True)
+		manager.add_dependency(key="job", dependency="job 0", is_reusable=False)
+
+		self.assertEqual(1, handle.get_remaining_dependencies_total())
+		self.assertTrue(handle.is_waiting())
+		self.assertTrue(manager.cancel(aggregate_dependent_handle=handle))
+		self.assertFalse(handle.is_waiting())
+		self.assertFalse(manager.cancel(aggregate_dependent_handle=handle))
+
+		manager.add_dependency(key="lock", dependency="lock 0", is_reusable=False)
+		manager.add_dependent(
+			dependent="dependent 1",
+			reusable_keys=["worker"],
+			nonreusable_keys=["job", "lock"]
+		)
+
+		self.assertEqual([("dependent 1", [("worker 0", "worker"), ("job 0", "job"), ("lock 0", "lock")])], found_pairs)
+
+		manager.dispose()
+
+	def test_timeout(self):
+
+		found_pairs = []  # type: List[Tuple[str, List[Tuple[str, str]]]]
+		def on_dependent_dependency_satisfied_callback(dependent, dependency_and_key_pairs):
+			found_pairs.append((dependent, dependency_and_key_pairs))
+
+		expired_dependents = []  # type: List[str]
+		def on_dependent_expired_callback(dependent):
+			expired_dependents.append(dependent)
+
+		manager = AggregateDependentDependencyManager(
+			on_dependent_dependency_satisfied_callback=on_dependent_dependency_satisfied_callback,
+			on_dependent_expired_callback=on_dependent_expired_callback
+		)
+
+		manager.add_dependents(
+			dependent_and_keys_tuples=[
+				("dependent 0", [], ["job", "lock"]),
+				("dependent 1", [], ["job"])
+			],
+			timeout_seconds=0.1
+		)
+		manager.add_dependency(key="job", dependency="job 0", is_reusable=False)
+		manager.add_dependency(key="job", dependency="job 1", is_reusable=False)
+
+		self.assertEqual([("dependent 1", [("job 1", "job")])], found_pairs)
+
+		time.sleep(0.5)
+
+		self.assertEqual(["dependent 0"], expired_dependents)
+
+		# the job taken by the expired dependent is available again
+		manager.add_dependent(
+			dependent="dependent 2",
+			reusable_keys=[],
+			nonreusable_keys=["job"]
+		)
+
+		self.assertEqual(("dependent 2", [("job 0", "job")]), found_pairs[1])
+
+		manager.dispose()
+
+	def test_failing_expired_callback_does_not_stop_later_expiries(self):
+
+		def on_dependent_dependency_satisfied_callback(dependent, dependency_and_key_pairs):
+			pass
+
+		expired_dependents = []  # type: List[str]
+		def on_dependent_expired_callback(dependent):
+			expired_dependents.append(dependent)
+			if dependent == "dependent 0":
+				raise Exception("Failed to handle expired dependent.")
+
+		manager = AggregateDependentDependencyManager(
+			on_dependent_dependency_satisfied_callback=on_dependent_dependency_satisfied_callback,
+			on_dependent_expired_callback=on_dependent_expired_callback
+		)
+
+		with self.assertLogs(level="ERROR"):
+			manager.add_dependent(dependent="dependent 0", reusable_keys=[], nonreusable_keys=["job"], timeout_seconds=0.05)
+			manager.add_dependent(dependent="dependent 1", reusable_keys=[], nonreusable_keys=["job"], timeout_seconds=0.3)
+
+			time.sleep(0.5)
+
+		self.assertEqual(["dependent 0", "dependent 1"], expired_dependents)
+
+		manager.dispose()
+
+	def test_timing_abandoned_dependents(self):
+
+		satisfied_total = 0
+		satisfied_total_lock = Lock()
+		def on_dependent_dependency_satisfied_callback(dependent, dependency_and_key_pairs):
+			nonlocal satisfied_total
+			with satisfied_total_lock:
+				satisfied_total += 1
+
+		manager = AggregateDependentDependencyManager(
+			on_dependent_dependency_satisfied_callback=on_dependent_dependency_satisfied_callback
+		)
+
+		start_time = time.perf_counter()
+		for index in range(10000):
+			handle = manager.add_dependent(
+				dependent=index,
+				reusable_keys=[],
+				nonreusable_keys=[index % 100, index % 100 + 100],
+				timeout_seconds=60
+			)
+			manager.add_dependency(key=index % 100, dependency=index, is_reusable=False)
+			manager.cancel(aggregate_dependent_handle=handle)
+		print(f"add, take and cancel: {time.perf_counter() - start_time} seconds")
+
+		self.assertEqual(0, satisfied_total)
+
+		# every nonreusable dependency was returned when its dependent was cancelled
+		manager.add_dependents(
+			dependent_and_keys_tuples=[(index, [], [index % 100]) for index in range(10000)]
+		)
+
+		self.assertEqual(10000, satisfied_total)
+
+		manager.dispose()
+
+	def test_timing_cancel_dependents_of_one_key(self):
+
+		found_pairs = []  # type: List[Tuple[int, List[Tuple[str, str]]]]
+		def on_dependent_dependency_satisfied_callback(dependent, dependency_and_key_pairs):
+			found_pairs.append((dependent, dependency_and_key_pairs))
+
+		manager = AggregateDependentDependencyManager(
+			on_dependent_dependency_satisfied_callback=on_dependent_dependency_satisfied_callback
+		)
+
+		handles = manager.add_dependents(
+			dependent_and_keys_tuples=[(index, ["worker"], ["job"]) for index in range(50000)]
+		)
+		manager.add_dependent(
+			dependent="dependent",
+			reusable_keys=["worker"],
+			nonreusable_keys=["job"]
+		)
+
+		start_time = time.perf_counter()
+		for handle in reversed(handles):
+			self.assertTrue(manager.cancel(aggregate_dependent_handle=handle))
+		print(f"cancel: {time.perf_counter() - start_time} seconds")
+
+		manager.add_dependency(key="worker", dependency="worker 0", is_reusable=True)
+		manager.add_dependency(key="job", dependency="job 0", is_reusable=False)
+
+		self.assertEqual([("dependent", [("worker 0", "worker"), ("job 0", "job")])], found_pairs)
+
+		manager.dispose()
@@ -0,0 +1,306 @@
+from __future__ import annotations
+import unittest
+import asyncio
+import time
+import gc
+import weakref
+from typing import List, Tuple, Dict
+from src.austin_heller_repo.common import AsyncSingleDependentDependencyManager, AsyncAggregateDependentDependencyManager
+
+
+class AsyncSingleDependentDependencyManagerTest(unittest.TestCase):
+
+	def test_wait_for(self):
+
+		async def run():
+			manager = AsyncSingleDependentDependencyManager(
+				is_dependency_reusable=False
+			)
+
+			dependent_task = asyncio.create_task(manager.wait_for(key="key"))
+			await asyncio.sleep(0)
+
+			self.assertFalse(dependent_task.done())
+
+			manager.add_dependency(
+				key="key",
+				dependency="dependency 0"
+			)
+
+			self.assertEqual("dependency 0", await dependent_task)
+
+			manager.add_dependencies(
+				dependency_and_key_pairs=[("dependency 1", "key"), ("dependency 2", "other key")]
+			)
+
+			self.assertEqual("dependency 1", await manager.wait_for(key="key"))
+			self.assertEqual("dependency 2", await manager.wait_for(key="other key"))
+
+		asyncio.run(run())
+
+	def test_reusable_dependency(self):
+
+		async def run():
+			manager = AsyncSingleDependentDependencyManager(
+				is_dependency_reusable=True
+			)
+
+			dependent_tasks = [asyncio.create_task(manager.wait_for(key="key")) for _ in range(3)]
+			await asyncio.sleep(0)
+			manager.add_dependencies(
+				dependency_and_key_pairs=[("dependency 0", "key"), ("dependency 1", "key")]
+			)
+
+			self.assertEqual(["dependency 0", "dependency 0", "dependency 0"], await asyncio.gather(*dependent_tasks))
+			self.assertEqual(["dependency 0", "dependency 1"], [await manager.wait_for(key="key") for _ in range(2)])
+
+		asyncio.run(run())
+
+	def test_cancelled_dependent_does_not_take_dependency(self):
+
+		async def run():
+			manager = AsyncSingleDependentDependencyManager(
+				is_dependency_reusable=False
+			)
+
+			cancelled_task = asyncio.create_task(manager.wait_for(key="key"))
+			dependent_task = asyncio.create_task(manager.wait_for(key="key"))
+			await asyncio.sleep(0)
+			cancelled_task.cancel()
+			await asyncio.sleep(0)
+
+			manager.add_dependency(
+				key="key",
+				dependency="dependency 0"
+			)
+
+			self.assertEqual("dependency 0", await dependent_task)
+			self.assertTrue(cancelled_task.cancelled())
+
+		asyncio.run(run())
+
+	def test_cancelled_dependents_are_released_without_dependencies(self):
+
+		async def run():
+			manager = AsyncSingleDependentDependencyManager(
+				is_dependency_reusable=False
+			)
+
+			dependency_futures = [manager.get_dependency_future(key="key") for _ in range(1000)]
+			dependency_future_references = [weakref.ref(dependency_future) for dependency_future in dependency_futures]
+			for dependency_future_reference in dependency_future_references:
+				dependency_future_reference().cancel()
+			await asyncio.sleep(0)
+			dependency_futures.clear()
+			gc.collect()
+
+			# no dependency ever arrives for the key, yet the cancelled dependents are not kept
+			self.assertEqual(0, sum(dependency_future_reference() is not None for dependency_future_reference in dependency_future_references))
+
+			dependent_task = asyncio.create_task(manager.wait_for(key="key"))
+			await asyncio.sleep(0)
+			manager.add_dependency(
+				key="key",
+				dependency="dependency 0"
+			)
+
+			self.assertEqual("dependency 0", await dependent_task)
+
+		asyncio.run(run())
+
+	def test_callback_is_dispatched_on_event_loop(self):
+
+		async def run():
+			found_pairs = []  # type: List[Tuple[str, str, str]]
+			def on_dependent_dependency_satisfied_callback(dependent, dependency, key):
+				found_pairs.append((dependent, dependency, key))
+
+			manager = AsyncSingleDependentDependencyManager(
+				is_dependency_reusable=False,
+				on_dependent_dependency_satisfied_callback=on_dependent_dependency_satisfied_callback
+			)
+
+			manager.add_dependent(
+				dependent="dependent 0",
+				key="key"
+			)
+			manager.add_dependency(
+				key="key",
+				dependency="dependency 0"
+			)
+
+			self.assertEqual([], found_pairs)
+
+			await asyncio.sleep(0)
+
+			self.assertEqual([("dependent 0", "dependency 0", "key")], found_pairs)
+
+		asyncio.run(run())
+
+	def test_timing_wait_for(self):
+
+		async def run():
+			manager = AsyncSingleDependentDependencyManager(
+				is_dependency_reusable=False
+			)
+
+			start_time = time.perf_counter()
+			dependency_futures = [manager.get_dependency_future(key=index % 1000) for index in range(200000)]
+			manager.add_dependencies(
+				dependency_and_key_pairs=[(index, index % 1000) for index in range(200000)]
+			)
+			dependencies = await asyncio.gather(*dependency_futures)
+			print(f"matched {len(dependencies)} dependents: {time.perf_counter() - start_time} seconds")
+
+		asyncio.run(run())
+
+
+class AsyncAggregateDependentDependencyManagerTest(unittest.TestCase):
+
+	def test_wait_for(self):
+
+		async def run():
+			manager = AsyncAggregateDependentDependencyManager()
+
+			dependent_task = asyncio.create_task(manager.wait_for(reusable_keys=["reuse"], nonreusable_keys=["non 0", "non 1"]))
+			await asyncio.sleep(0)
+			manager.add_dependencies(
+				dependency_key_and_is_reusable_tuples=[("dep 0", "non 1", False), ("dep 1", "reuse", True)]
+			)
+			await asyncio.sleep(0)
+
+			self.assertFalse(dependent_task.done())
+
+			manager.add_dependency(
+				key="non 0",
+				dependency="dep 2",
+				is_reusable=False
+			)
+
+			self.assertEqual([("dep 1", "reuse"), ("dep 2", "non 0"), ("dep 0", "non 1")], await dependent_task)
+			self.assertEqual([("dep 1", "reuse")], await manager.wait_for(reusable_keys=["reuse"], nonreusable_keys=[]))
+			self.assertEqual([], await manager.wait_for(reusable_keys=[], nonreusable_keys=[]))
+
+		asyncio.run(run())
+
+	def test_cancelled_dependent_stops_waiting_for_every_key(self):
+
+		async def run():
+			manager = AsyncAggregateDependentDependencyManager()
+
+			cancelled_task = asyncio.create_task(manager.wait_for(reusable_keys=[], nonreusable_keys=["non 0", "non 1"]))
+			dependent_task = asyncio.create_task(manager.wait_for(reusable_keys=[], nonreusable_keys=["non 1"]))
+			await asyncio.sleep(0)
+			cancelled_task.cancel()
+			await asyncio.sleep(0)
+
+			manager.add_dependency(
+				key="non 1",
+				dependency="dep 0",
+				is_reusable=False
+			)
+
+			self.assertEqual([("dep 0", "non 1")], await dependent_task)
+
+		asyncio.run(run())
+
+	def test_dependency_taken_by_timed_out_dependent_is_given_to_next_dependent(self):
+
+		async def run():
+			manager = AsyncAggregateDependentDependencyManager()
+
+			manager.add_dependency(
+				key="non 0",
+				dependency="dep 0",
+				is_reusable=False
+			)
+
+			with self.assertRaises(asyncio.TimeoutError):
+				await asyncio.wait_for(manager.wait_for(reusable_keys=[], nonreusable_keys=["non 0", "non 1"]), 0.05)
+
+			self.assertEqual([("dep 0", "non 0")], await asyncio.wait_for(manager.wait_for(reusable_keys=[], nonreusable_keys=["non 0"]), 1.0))
+
+		asyncio.run(run())
+
+	def test_cancelled_dependents_are_released_without_dependencies(self):
+
+		async def run():
+			manager = AsyncAggregateDependentDependencyManager()
+
+			manager.add_dependency(
+				key="reuse",
+				dependency="dep 0",
+				is_reusable=True
+			)
+			dependencies_futures = [manager.get_dependencies_future(reusable_keys=["reuse"], nonreusable_keys=["non 0", "non 1"]) for _ in range(1000)]
+			dependencies_future_references = [weakref.ref(dependencies_future) for dependencies_future in dependencies_futures]
+			for dependencies_future_reference in dependencies_future_references:
+				dependencies_future_reference().cancel()
+			await asyncio.sleep(0)
+			dependencies_futures.clear()
+			gc.collect()
+
+			self.assertEqual(0, sum(dependencies_future_reference() is not None for dependencies_future_reference in dependencies_future_references))
+
+			dependent_task = asyncio.create_task(manager.wait_for(reusable_keys=["reuse"], nonreusable_keys=["non 1"]))
+			await asyncio.sleep(0)
+			manager.add_dependency(
+				key="non 1",
+				dependency="dep 1",
+				is_reusable=False
+			)
+
+			self.assertEqual([("dep 0", "reuse"), ("dep 1", "non 1")], await dependent_task)
+
+		asyncio.run(run())
+
+	def test_callback(self):
+
+		async def run():
+			found_pairs = []  # type: List[Tuple[str, List[Tuple[str, str]]]]
+			def on_dependent_dependency_satisfied_callback(dependent, dependency_and_key_pairs):
+				found_pairs.append((dependent, dependency_and_key_pairs))
+
+			manager = AsyncAggregateDependentDependencyManager(
+				on_dependent_dependency_satisfied_callback=on_dependent_dependency_satisfied_callback
+			)
+
+			manager.add_dependent(
+				dependent="dependent 0",
+				reusable_keys=["reuse"],
+				nonreusable_keys=["non 0"]
+			)
+			manager.add_dependency(
+				key="reuse",
+				dependency="dep 0",
+				is_reusable=True
+			)
+			manager.add_dependency(
+				key="non 0",
+				dependency="dep 1",
+				is_reusable=False
+			)
+			await asyncio.sleep(0)
+			await asyncio.sleep(0)
+
+			self.assertEqual([("dependent 0", [("dep 0", "reuse"), ("dep 1", "non 0")])], found_pairs)
+
+		asyncio.run(run())
+
+	def test_timing_wait_for(self):
+
+		async def run():
+			manager = AsyncAggregateDependentDependencyManager()
+
+			start_time = time.perf_counter()
+			dependencies_futures = [manager.get_dependencies_future(reusable_keys=[index % 10], nonreusable_keys=[index % 1000]) for index in range(100000)]
+			manager.add_dependencies(
+				dependency_key_and_is_reusable_tuples=[(index, index, True) for index in range(10)]
+			)
+			manager.add_dependencies(
+				dependency_key_and_is_reusable_tuples=[(index, index % 1000, False) for index in range(100000)]
+			)
+			dependencies = await asyncio.gather(*dependencies_futures)
+			print(f"matched {len(dependencies)} dependents: {time.perf_counter() - start_time} seconds")
+
+		asyncio.run(run())
@@ -0,0 +1,174 @@
+from __future__ import annotations
+import unittest
+import asyncio
+import time
+import tempfile
+from typing import List, Dict
+from src.austin_heller_repo.common import StoredCollection, AsyncStoredCollection, StoredCollectionStorageTypeEnum, StoredCollectionCompressionTypeEnum
+
+
+class AsyncStoredCollectionTest(unittest.TestCase):
+
+	def test_append_and_get(self):
+
+		directory = tempfile.TemporaryDirectory()
+
+		try:
+			async def run():
+				async_stored_collection = AsyncStoredCollection(
+					stored_collection=StoredCollection(
+						directory_path=directory.name,
+						storage_type=StoredCollectionStorageTypeEnum.Segment
+					),
+					prefetch_records_total=4
+				)
+
+				self.assertIsNone(await async_stored_collection.get())
+
+				for index in range(10):
+					await async_stored_collection.append(
+						json_dict={"index": index}
+					)
+
+				self.assertEqual(10, await async_stored_collection.count())
+				self.assertIsNone(await async_stored_collection.get())
+
+				async_stored_collection.reset()
+				actual_json_dicts = []  # type: List[Dict]
+				json_dict = await async_stored_collection.get()
+				while json_dict is not None:
+					actual_json_dicts.append(json_dict)
+					json_dict = await async_stored_collection.get()
+
+				self.assertEqual([{"index": index} for index in range(10)], actual_json_dicts)
+
+				await async_stored_collection.append_many(
+					json_dicts=[{"index": 10}, {"index": 11}]
+				)
+				async_stored_collection.reset()
+				for index in range(3):
+					await async_stored_collection.get()
+				await async_stored_collection.append(
+					json_dict={"index": 12}
+				)
+
+				self.assertIsNone(await async_stored_collection.get())
+
+				await async_stored_collection.dispose()
+
+			asyncio.run(run())
+
+		finally:
+			directory.cleanup()
+
+	def test_async_for(self):
+
+		directory = tempfile.TemporaryDirectory()
+
+		try:
+			async def run():
+				async_stored_collection = AsyncStoredCollection(
+					stored_collection=StoredCollection(
+						directory_path=directory.name
+					)
+				)
+
+				await async_stored_collection.append_many(
+					json_dicts=[{"index": index} for index in range(20)]
+				)
+
+				actual_json_dicts = []  # type: List[Dict]
+				async for json_dict in async_stored_collection:
+					actual_json_dicts.append(json_dict)
+
+				self.assertEqual([{"index": index} for index in range(20)], actual_json_dicts)
+
+				await async_stored_collection.dispose()
+
+			asyncio.run(run())
+
+		finally:
+			directory.cleanup()
+
+	def test_delete_and_compact(self):
+
+		directory = tempfile.TemporaryDirectory()
+
+		try:
+			async def run():
+				async_stored_collection = AsyncStoredCollection(
+					stored_collection=StoredCollection(
+						directory_path=directory.name,
+						storage_type=StoredCollectionStorageTypeEnum.Segment
+					),
+					prefetch_records_total=4
+				)
+
+				await async_stored_collection.append_many(
+					json_dicts=[{"index": index} for index in range(10)]
+				)
+				for index in range(0, 10, 3):
+					self.assertTrue(await async_stored_collection.delete(
+						index=index
+					))
+
+				async_stored_collection.reset()
+				actual_json_dicts = []  # type: List[Dict]
+				json_dict = await async_stored_collection.get()
+				while json_dict is not None:
+					actual_json_dicts.append(json_dict)
+					json_dict = await async_stored_collection.get()
+
+				self.assertEqual([{"index": index} for index in range(10) if index % 3 != 0], actual_json_dicts)
+
+				stored_collection_compaction = await async_stored_collection.compact()
+
+				self.assertEqual(10, stored_collection_compaction.get_records_total())
+				self.assertEqual(4, stored_collection_compaction.get_deleted_records_total())
+				self.assertEqual([{"index": index} for index in range(10) if index % 3 != 0], [json_dict async for json_dict in async_stored_collection])
+
+				await async_stored_collection.dispose()
+
+			asyncio.run(run())
+
+		finally:
+			directory.cleanup()
+
+	def test_timing_prefetch(self):
+
+		directory = tempfile.TemporaryDirectory()
+
+		try:
+			async def run():
+				# decompressing large records makes each read take about as long as processing it
+				stored_collection = StoredCollection(
+					directory_path=directory.name,
+					storage_type=StoredCollectionStorageTypeEnum.Segment,
+					compression_type=StoredCollectionCompressionTypeEnum.Bz2
+				)
+				stored_collection.append_many(
+					json_dicts=[{"index": index, "text": f"text {index} " * 20000} for index in range(50)]
+				)
+				stored_collection.dispose()
+
+				for prefetch_records_total in [0, 8]:
+					# disposing an async stored collection disposes its stored collection, so each one reopens the collection
+					async_stored_collection = AsyncStoredCollection(
+						stored_collection=StoredCollection(
+							directory_path=directory.name
+						),
+						prefetch_records_total=prefetch_records_total
+					)
+
+					start_time = time.perf_counter()
+					async for _ in async_stored_collection:
+						# stands in for the consumer processing the record
+						await asyncio.sleep(0.005)
+					print(f"prefetch_records_total: {prefetch_records_total}: {time.perf_counter() - start_time} seconds")
+
+					await async_stored_collection.dispose()
+
+			asyncio.run(run())
+
+		finally:
+			directory.cleanup()
@@ -1,7 +1,9 @@
 from __future__ import annotations
 import unittest
+import time
+from threading import Thread, Lock
 from typing import List, Tuple, Dict
-from src.austin_heller_repo.common import SingleDependentDependencyManager
+from src.austin_heller_repo.common import SingleDependentDependencyManager, DependencyMatchingPolicyTypeEnum
 
 
 class SingleDependentDependencyManagerTest(unittest.TestCase):
@@ -224,3 +226,427 @@ class SingleDependentDependencyManagerTest(unittest.TestCase):
 			)
 
 			self.assertEqual(index + 1, len(found_pairs))
+
+	def test_stripes_preserve_order_per_key(self):
+
+		found_pairs_per_stripes_total = {}  # type: Dict[int, List[Tuple[str, str, str]]]
+		for stripes_total in [1, 7]:
+
+			found_pairs = []  # type: List[Tuple[str, str, str]]
+			def on_dependent_dependency_satisfied_callback(dependent, dependency, key):
+				found_pairs.append((dependent, dependency, key))
+
+			manager = SingleDependentDependencyManager(
+				on_dependent_dependency_satisfied_callback=on_dependent_dependency_satisfied_callback,
+				is_dependency_reusable=True,
+				stripes_total=stripes_total
+			)
+
+			for index in range(100):
+				manager.add_dependent(
+					key=f"key {index % 13}",
+					dependent=f"dependent {index}"
+				)
+				if index % 3 == 0:
+					manager.add_dependency(
+						key=f"key {index % 11}",
+						dependency=f"dependency {index}"
+					)
+
+			found_pairs_per_stripes_total[stripes_total] = found_pairs
+
+		self.assertEqual(found_pairs_per_stripes_total[1], found_pairs_per_stripes_total[7])
+		self.assertNotEqual([], found_pairs_per_stripes_total[1])
+
+	def test_threads_with_independent_keys(self):
+
+		found_pairs = []  # type: List[Tuple[str, str, str]]
+		found_pairs_lock = Lock()
+		def on_dependent_dependency_satisfied_callback(dependent, dependency, key):
+			with found_pairs_lock:
+				found_pairs.append((dependent, dependency, key))
+
+		manager = SingleDependentDependencyManager(
+			on_dependent_dependency_satisfied_callback=on_dependent_dependency_satisfied_callback,
+			is_dependency_reusable=False,
+			stripes_total=4
+		)
+
+		def run(thread_index: int):
+			for index in range(1000):
+				manager.add_dependent(
+					key=f"key {thread_index}",
+					dependent=f"dependent {thread_index} {index}"
+				)
+				manager.add_dependency(
+					key=f"key {thread_index}",
+					dependency=f"dependency {thread_index} {index}"
+				)
+
+		threads = [Thread(target=run, args=(thread_index,)) for thread_index in range(8)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+
+		self.assertEqual(8000, len(found_pairs))
+		for thread_index in range(8):
+			self.assertEqual([(f"dependent {thread_index} {index}", f"dependency {thread_index} {index}", f"key {thread_index}") for index in range(1000)], [found_pair for found_pair in found_pairs if found_pair[2] == f"key {thread_index}"])
+
+	def test_timing_contention(self):
+
+		operations_total = 64000
+		for stripes_total in [1, 16]:
+			for threads_total in [1, 4, 16, 64]:
+
+				def on_dependent_dependency_satisfied_callback(dependent, dependency, key):
+					pass
+
+				manager = SingleDependentDependencyManager(
+					on_dependent_dependency_satisfied_callback=on_dependent_dependency_satisfied_callback,
+					is_dependency_reusable=False,
+					stripes_total=stripes_total
+				)
+
+				def run(thread_index: int):
+					for index in range(operations_total // threads_total // 2):
+						manager.add_dependent(
+							key=thread_index,
+							dependent=index
+						)
+						manager.add_dependency(
+							key=thread_index,
+							dependency=index
+						)
+
+				threads = [Thread(target=run, args=(thread_index,)) for thread_index in range(threads_total)]
+				start_time = time.perf_counter()
+				for thread in threads:
+					thread.start()
+				for thread in threads:
+					thread.join()
+				elapsed_seconds = time.perf_counter() - start_time
+				print(f"{stripes_total} stripes, {threads_total} threads: {operations_total / elapsed_seconds} operations per second")
+
+	def test_batches_match_as_if_added_separately(self):
+
+		for is_dependency_reusable in [False, True]:
+
+			separately_found_pairs = []  # type: List[Tuple[str, str, str]]
+			def on_dependent_dependency_satisfied_callback(dependent, dependency, key):
+				separately_found_pairs.append((dependent, dependency, key))
+
+			manager = SingleDependentDependencyManager(
+				on_dependent_dependency_satisfied_callback=on_dependent_dependency_satisfied_callback,
+				is_dependency_reusable=is_dependency_reusable
+			)
+
+			dependent_and_key_pairs = [(f"dependent {index}", f"key {index % 3}") for index in range(10)]
+			dependency_and_key_pairs = [(f"dependency {index}", f"key {index % 4}") for index in range(6)]
+			for dependent, key in dependent_and_key_pairs[:4]:
+				manager.add_dependent(
+					dependent=dependent,
+					key=key
+				)
+			for dependency, key in dependency_and_key_pairs:
+				manager.add_dependency(
+					key=key,
+					dependency=dependency
+				)
+			for dependent, key in dependent_and_key_pairs[4:]:
+				manager.add_dependent(
+					dependent=dependent,
+					key=key
+				)
+
+			batches = []  # type: List[List[Tuple[str, str, str]]]
+			def on_dependent_dependency_batch_satisfied_callback(dependent_dependency_key_tuples):
+				batches.append(dependent_dependency_key_tuples)
+
+			manager = SingleDependentDependencyManager(
+				on_dependent_dependency_satisfied_callback=on_dependent_dependency_satisfied_callback,
+				is_dependency_reusable=is_dependency_reusable,
+				on_dependent_dependency_batch_satisfied_callback=on_dependent_dependency_batch_satisfied_callback
+			)
+
+			manager.add_dependents(
+				dependent_and_key_pairs=dependent_and_key_pairs[:4]
+			)
+
+			self.assertEqual([], batches)
+
+			manager.add_dependencies(
+				dependency_and_key_pairs=iter(dependency_and_key_pairs)
+			)
+			manager.add_dependents(
+				dependent_and_key_pairs=dependent_and_key_pairs[4:]
+			)
+
+			self.assertEqual(2, len(batches))
+			self.assertEqual(sorted(separately_found_pairs), sorted(batches[0] + batches[1]))
+			for key_index in range(3):
+				self.assertEqual([found_pair for found_pair in separately_found_pairs if found_pair[2] == f"key {key_index}"], [found_pair for found_pair in batches[0] + batches[1] if found_pair[2] == f"key {key_index}"])
+
+	def test_timing_batches(self):
+
+		def on_dependent_dependency_satisfied_callback(dependent, dependency, key):
+			pass
+
+		manager = SingleDependentDependencyManager(
+			on_dependent_dependency_satisfied_callback=on_dependent_dependency_satisfied_callback,
+			is_dependency_reusable=False
+		)
+
+		start_time = time.perf_counter()
+		for index in range(100000):
+			manager.add_dependent(
+				dependent=index,
+				key=index % 1000
+			)
+		print(f"separately: {time.perf_counter() - start_time} seconds")
+
+		manager = SingleDependentDependencyManager(
+			on_dependent_dependency_satisfied_callback=on_dependent_dependency_satisfied_callback,
+			is_dependency_reusable=False
+		)
+
+		start_time = time.perf_counter()
+		manager.add_dependents(
+			dependent_and_key_pairs=[(index, index % 1000) for index in range(100000)]
+		)
+		print(f"batch: {time.perf_counter() - start_time} seconds")
+
+	def test_priority_dependents(self):
+
+		found_pairs = []  # type: List[Tuple[str, str, str]]
+		def on_dependent_dependency_satisfied_callback(dependent, dependency, key):
+			found_pairs.append((dependent, dependency, key))
+
+		manager = SingleDependentDependencyManager(
+			on_dependent_dependency_satisfied_callback=on_dependent_dependency_satisfied_callback,
+			is_dependency_reusable=False,
+			dependent_policy_type=DependencyMatchingPolicyTypeEnum.Priority
+		)
+
+		manager.add_dependent(dependent="low", key="key", priority=0)
+		manager.add_dependent(dependent="high 0", key="key", priority=5)
+		manager.add_dependent(dependent="middle", key="key", priority=1)
+		manager.add_dependent(dependent="high 1", key="key", priority=5)
+		manager.add_dependencies(
+			dependency_and_key_pairs=[(f"dependency {index}", "key") for index in range(4)]
+		)
+
+		self.assertEqual(["high 0", "high 1", "middle", "low"], [dependent for dependent, dependency, key in found_pairs])
+
+	def test_weighted_round_robin_dependencies(self):
+
+		found_pairs = []  # type: List[Tuple[int, str, str]]
+		def on_dependent_dependency_satisfied_callback(dependent, dependency, key):
+			found_pairs.append((dependent, dependency, key))
+
+		manager = SingleDependentDependencyManager(
+			on_dependent_dependency_satisfied_callback=on_dependent_dependency_satisfied_callback,
+			is_dependency_reusable=True,
+			dependency_policy_type=DependencyMatchingPolicyTypeEnum.WeightedRoundRobin
+		)
+
+		manager.add_dependency(key="key", dependency="a", weight=5)
+		manager.add_dependency(key="key", dependency="b", weight=1)
+		manager.add_dependency(key="key", dependency="c", weight=1)
+		manager.add_dependents(
+			dependent_and_key_pairs=[(index, "key") for index in range(14)]
+		)
+
+		dependencies = [dependency for dependent, dependency, key in found_pairs]
+		self.assertEqual(["a", "a", "b", "a", "c", "a", "a"] * 2, dependencies)
+
+		with self.assertRaises(Exception):
+			manager.add_dependency(key="key", dependency="d", weight=0)
+
+	def test_least_recently_used_dependencies(self):
+
+		found_pairs = []  # type: List[Tuple[int, str, str]]
+		def on_dependent_dependency_satisfied_callback(dependent, dependency, key):
+			found_pairs.append((dependent, dependency, key))
+
+		for policy_type, expected_dependencies in [
+			(DependencyMatchingPolicyTypeEnum.Fifo, ["a", "b", "a", "b", "a"]),
+			(DependencyMatchingPolicyTypeEnum.LeastRecentlyUsed, ["a", "b", "a", "c", "b"])
+		]:
+			found_pairs.clear()
+
+			manager = SingleDependentDependencyManager(
+				on_dependent_dependency_satisfied_callback=on_dependent_dependency_satisfied_callback,
+				is_dependency_reusable=True,
+				dependency_policy_type=policy_type
+			)
+
+			manager.add_dependency(key="key", dependency="a")
+			manager.add_dependency(key="key", dependency="b")
+			manager.add_dependent(dependent=0, key="key")
+			manager.add_dependent(dependent=1, key="key")
+			manager.add_dependent(dependent=2, key="key")
+			# a new dependency is taken before the ones that were already used
+			manager.add_dependency(key="key", dependency="c")
+			manager.add_dependent(dependent=3, key="key")
+			manager.add_dependent(dependent=4, key="key")
+
+			self.assertEqual(expected_dependencies, [dependency for dependent, dependency, key in found_pairs])
+
+	def test_timing_policies(self):
+
+		def on_dependent_dependency_satisfied_callback(dependent, dependency, key):
+			pass
+
+		for policy_type in DependencyMatchingPolicyTypeEnum:
+			manager = SingleDependentDependencyManager(
+				on_dependent_dependency_satisfied_callback=on_dependent_dependency_satisfied_callback,
+				is_dependency_reusable=True,
+				dependent_policy_type=policy_type,
+				dependency_policy_type=policy_type
+			)
+
+			for index in range(16):
+				manager.add_dependency(key="key", dependency=index, weight=index % 4 + 1)
+
+			start_time = time.perf_counter()
+			for index in range(100000):
+				manager.add_dependent(dependent=index, key="key", priority=index % 4 + 1)
+			print(f"{policy_type.value}: {time.perf_counter() - start_time} seconds")
+
+	def test_cancel(self):
+
+		found_pairs = []  # type: List[Tuple[str, str, str]]
+		def on_dependent_dependency_satisfied_callback(dependent, dependency, key):
+			found_pairs.append((dependent, dependency, key))
+
+		for policy_type in DependencyMatchingPolicyTypeEnum:
+			found_pairs.clear()
+
+			manager = SingleDependentDependencyManager(
+				on_dependent_dependency_satisfied_callback=on_dependent_dependency_satisfied_callback,
+				is_dependency_reusable=False,
+				dependent_policy_type=policy_type
+			)
+
+			manager.add_dependent(dependent="dependent 0", key="key", priority=1)
+			manager.add_dependent(dependent="dependent 1", key="key", priority=1, timeout_seconds=60)
+			manager.add_dependent(dependent="dependent 2", key="key", priority=1)
+
+			self.assertTrue(manager.cancel(dependent="dependent 1", key="key"))
+			self.assertFalse(manager.cancel(dependent="dependent 1", key="key"))
+			self.assertFalse(manager.cancel(dependent="dependent 0", key="other key"))
+
+			manager.add_dependencies(
+				dependency_and_key_pairs=[("dependency 0", "key"), ("dependency 1", "key"), ("dependency 2", "key")]
+			)
+
+			self.assertEqual([("dependent 0", "dependency 0", "key"), ("dependent 2", "dependency 1", "key")], found_pairs)
+			self.assertFalse(manager.cancel(dependent="dependent 0", key="key"))
+
+			manager.dispose()
+
+	def test_timeout(self):
+
+		found_pairs = []  # type: List[Tuple[str, str, str]]
+		def on_dependent_dependency_satisfied_callback(dependent, dependency, key):
+			found_pairs.append((dependent, dependency, key))
+
+		expired_pairs = []  # type: List[Tuple[str, str]]
+		def on_dependent_expired_callback(dependent, key):
+			expired_pairs.append((dependent, key))
+
+		manager = SingleDependentDependencyManager(
+			on_dependent_dependency_satisfied_callback=on_dependent_dependency_satisfied_callback,
+			is_dependency_reusable=False,
+			on_dependent_expired_callback=on_dependent_expired_callback
+		)
+
+		manager.add_dependent(dependent="dependent 0", key="key", timeout_seconds=0.1)
+		manager.add_dependents(
+			dependent_and_key_pairs=[("dependent 1", "key"), ("dependent 2", "other key")],
+			timeout_seconds=0.2
+		)
+		manager.add_dependency(key="key", dependency="dependency 0")
+
+		time.sleep(0.5)
+
+		self.assertEqual([("dependent 0", "dependency 0", "key")], found_pairs)
+		self.assertEqual([("dependent 1", "key"), ("dependent 2", "other key")], expired_pairs)
+
+		manager.add_dependency(key="key", dependency="dependency 1")
+
+		self.assertEqual(1, len(found_pairs))
+
+		manager.dispose()
+
+	def test_failing_expired_callback_does_not_stop_later_expiries(self):
+
+		def on_dependent_dependency_satisfied_callback(dependent, dependency, key):
+			pass
+
+		expired_pairs = []  # type: List[Tuple[str, str]]
+		def on_dependent_expired_callback(dependent, key):
+			expired_pairs.append((dependent, key))
+			if dependent == "dependent 0":
+				raise Exception("Failed to handle expired dependent.")
+
+		manager = SingleDependentDependencyManager(
+			on_dependent_dependency_satisfied_callback=on_dependent_dependency_satisfied_callback,
+			is_dependency_reusable=False,
+			on_dependent_expired_callback=on_dependent_expired_callback
+		)
+
+		with self.assertLogs(level="ERROR"):
+			manager.add_dependent(dependent="dependent 0", key="key", timeout_seconds=0.05)
+			manager.add_dependent(dependent="dependent 1", key="key", timeout_seconds=0.3)
+
+			time.sleep(0.5)
+
+		self.assertEqual([("dependent 0", "key"), ("dependent 1", "key")], expired_pairs)
+
+		manager.dispose()
+
+	def test_timing_expire_dependents_of_one_key(self):
+
+		found_pairs = []  # type: List[Tuple[int, str, str]]
+		def on_dependent_dependency_satisfied_callback(dependent, dependency, key):
+			found_pairs.append((dependent, dependency, key))
+
+		expired_total = 0
+		def on_dependent_expired_callback(dependent, key):
+			nonlocal expired_total
+			expired_total += 1
+
+		for policy_type in DependencyMatchingPolicyTypeEnum:
+			found_pairs.clear()
+			expired_total = 0
+
+			manager = SingleDependentDependencyManager(
+				on_dependent_dependency_satisfied_callback=on_dependent_dependency_satisfied_callback,
+				is_dependency_reusable=False,
+				dependent_policy_type=policy_type,
+				on_dependent_expired_callback=on_dependent_expired_callback
+			)
+
+			manager.add_dependents(
+				dependent_and_key_pairs=[(index, "key") for index in range(50000)],
+				priority=1,
+				timeout_seconds=0.1
+			)
+			manager.add_dependent(dependent="dependent", key="key", priority=1)
+
+			start_time = time.perf_counter()
+			while expired_total != 50000 and time.perf_counter() - start_time < 10:
+				time.sleep(0.01)
+			print(f"{policy_type.value}: {time.perf_counter() - start_time} seconds")
+
+			self.assertEqual(50000, expired_total)
+
+			manager.add_dependencies(
+				dependency_and_key_pairs=[("dependency 0", "key"), ("dependency 1", "key")]
+			)
+
+			self.assertEqual([("dependent", "dependency 0", "key")], found_pairs)
+
+			manager.dispose()
@@ -0,0 +1,45 @@
+from __future__ import annotations
+import unittest
+import time
+from typing import List
+from src.austin_heller_repo.common import DeadlineScheduler
+
+
+class DeadlineSchedulerTest(unittest.TestCase):
+
+	def test_deadlines_in_order(self):
+
+		names = []  # type: List[str]
+
+		scheduler = DeadlineScheduler()
+
+		scheduler.schedule(timeout_seconds=0.2, on_deadline_callback=lambda: names.append("second"))
+		scheduler.schedule(timeout_seconds=0.1, on_deadline_callback=lambda: names.append("first"))
+		entry = scheduler.schedule(timeout_seconds=0.1, on_deadline_callback=lambda: names.append("cancelled"))
+
+		self.assertEqual(3, scheduler.get_scheduled_total())
+		self.assertTrue(scheduler.cancel(entry=entry))
+		self.assertFalse(scheduler.cancel(entry=entry))
+		self.assertEqual(2, scheduler.get_scheduled_total())
+
+		time.sleep(0.4)
+
+		self.assertEqual(["first", "second"], names)
+		self.assertEqual(0, scheduler.get_scheduled_total())
+
+		scheduler.dispose()
+
+		with self.assertRaises(Exception):
+			scheduler.schedule(timeout_seconds=0.1, on_deadline_callback=lambda: None)
+
+	def test_cancelled_deadlines_are_removed(self):
+
+		scheduler = DeadlineScheduler()
+
+		entries = [scheduler.schedule(timeout_seconds=60, on_deadline_callback=lambda: None) for _ in range(1000)]
+		for entry in entries:
+			scheduler.cancel(entry=entry)
+
+		self.assertEqual(0, scheduler.get_scheduled_total())
+
+		scheduler.dispose()
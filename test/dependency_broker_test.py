@@ -0,0 +1,349 @@
+from __future__ import annotations
+import unittest
+import os
+import tempfile
+import time
+import multiprocessing
+import stat
+import gc
+import weakref
+import threading
+from threading import Semaphore
+from unittest import mock
+from typing import List, Tuple
+from src.austin_heller_repo.common import DependencyBrokerServer, DependencyBrokerClient
+
+
+def add_dependencies_from_other_process(socket_path: str, dependencies_total: int):
+	client = DependencyBrokerClient(
+		socket_path=socket_path
+	)
+	client.add_dependencies(
+		dependency_and_key_pairs=[(f"dependency {index}", index % 2) for index in range(dependencies_total)]
+	)
+	client.dispose()
+
+
+class DependencyBrokerTest(unittest.TestCase):
+
+	def setUp(self):
+		self.__temporary_directory = tempfile.TemporaryDirectory()
+		self.__socket_path = os.path.join(self.__temporary_directory.name, "broker.sock")
+
+	def tearDown(self):
+		self.__temporary_directory.cleanup()
+
+	def test_dependents_and_dependencies_from_different_clients(self):
+
+		server = DependencyBrokerServer(
+			socket_path=self.__socket_path,
+			is_dependency_reusable=False
+		)
+		server.start()
+
+		found_pairs = []  # type: List[Tuple[object, str, str]]
+		found_semaphore = Semaphore(0)
+		def on_dependent_dependency_satisfied_callback(dependent, dependency, key):
+			found_pairs.append((dependent, dependency, key))
+			found_semaphore.release()
+
+		consumer = DependencyBrokerClient(
+			socket_path=self.__socket_path,
+			on_dependent_dependency_satisfied_callback=on_dependent_dependency_satisfied_callback
+		)
+		producer = DependencyBrokerClient(
+			socket_path=self.__socket_path
+		)
+
+		# dependents stay in their own process, so they do not need to be picklable
+		dependent = lambda: None
+		consumer.add_dependent(dependent=dependent, key="key")
+		consumer.add_dependents(
+			dependent_and_key_pairs=[("dependent 1", "key"), ("dependent 2", "other key")]
+		)
+		producer.add_dependencies(
+			dependency_and_key_pairs=[("dependency 0", "key"), ("dependency 1", "key"), ("dependency 2", "other key")]
+		)
+
+		for _ in range(3):
+			self.assertTrue(found_semaphore.acquire(timeout=5))
+
+		self.assertEqual([(dependent, "dependency 0", "key"), ("dependent 1", "dependency 1", "key"), ("dependent 2", "dependency 2", "other key")], sorted(found_pairs, key=lambda found_pair: found_pair[1]))
+		self.assertEqual(0, consumer.get_waiting_dependents_total())
+
+		with self.assertRaises(Exception):
+			producer.add_dependent(dependent="dependent", key="key")
+
+		consumer.dispose()
+		producer.dispose()
+		server.dispose()
+
+	def test_dependencies_from_other_process(self):
+
+		server = DependencyBrokerServer(
+			socket_path=self.__socket_path,
+			is_dependency_reusable=False
+		)
+		server.start()
+
+		found_semaphore = Semaphore(0)
+		found_dependencies = []  # type: List[str]
+		def on_dependent_dependency_satisfied_callback(dependent, dependency, key):
+			found_dependencies.append(dependency)
+			found_semaphore.release()
+
+		consumer = DependencyBrokerClient(
+			socket_path=self.__socket_path,
+			on_dependent_dependency_satisfied_callback=on_dependent_dependency_satisfied_callback
+		)
+		consumer.add_dependents(
+			dependent_and_key_pairs=[(index, index % 2) for index in range(100)]
+		)
+
+		process = multiprocessing.Process(
+			target=add_dependencies_from_other_process,
+			args=(self.__socket_path, 100)
+		)
+		process.start()
+		process.join()
+
+		self.assertEqual(0, process.exitcode)
+		for _ in range(100):
+			self.assertTrue(found_semaphore.acquire(timeout=5))
+		self.assertEqual(sorted(f"dependency {index}" for index in range(100)), sorted(found_dependencies))
+
+		consumer.dispose()
+		server.dispose()
+
+	def test_cancel_expiry_and_disconnect(self):
+
+		server = DependencyBrokerServer(
+			socket_path=self.__socket_path,
+			is_dependency_reusable=False
+		)
+		server.start()
+
+		found_pairs = []  # type: List[Tuple[str, str, str]]
+		found_semaphore = Semaphore(0)
+		def on_dependent_dependency_satisfied_callback(dependent, dependency, key):
+			found_pairs.append((dependent, dependency, key))
+			found_semaphore.release()
+
+		expired_pairs = []  # type: List[Tuple[str, str]]
+		expired_semaphore = Semaphore(0)
+		def on_dependent_expired_callback(dependent, key):
+			expired_pairs.append((dependent, key))
+			expired_semaphore.release()
+
+		client = DependencyBrokerClient(
+			socket_path=self.__socket_path,
+			on_dependent_dependency_satisfied_callback=on_dependent_dependency_satisfied_callback,
+			on_dependent_expired_callback=on_dependent_expired_callback
+		)
+		client.add_dependent(dependent="cancelled", key="key")
+		client.add_dependent(dependent="expired", key="key", timeout_seconds=0.1)
+
+		self.assertTrue(client.cancel(dependent="cancelled", key="key"))
+		self.assertFalse(client.cancel(dependent="cancelled", key="key"))
+		self.assertTrue(expired_semaphore.acquire(timeout=5))
+		self.assertEqual([("expired", "key")], expired_pairs)
+		self.assertEqual(0, client.get_waiting_dependents_total())
+
+		# the dependents of a client that disconnects stop waiting
+		abandoning_client = DependencyBrokerClient(
+			socket_path=self.__socket_path,
+			on_dependent_dependency_satisfied_callback=on_dependent_dependency_satisfied_callback
+		)
+		abandoning_client.add_dependent(dependent="abandoned", key="key")
+		abandoning_client.dispose()
+		while server.get_connections_total() != 1:
+			time.sleep(0.01)
+
+		client.add_dependency(key="key", dependency="dependency 0")
+		client.add_dependent(dependent="waiting", key="key")
+
+		self.assertTrue(found_semaphore.acquire(timeout=5))
+		self.assertEqual([("waiting", "dependency 0", "key")], found_pairs)
+
+		client.dispose()
+		server.dispose()
+
+	def test_dependencies_offered_again_from_callbacks(self):
+
+		server = DependencyBrokerServer(
+			socket_path=self.__socket_path,
+			is_dependency_reusable=False
+		)
+		server.start()
+
+		dependents_total = 2000
+		found_total = 0
+		found_semaphore = Semaphore(0)
+		def on_dependent_dependency_satisfied_callback(dependent, dependency, key):
+			nonlocal found_total
+			found_total += 1
+			if found_total == dependents_total:
+				found_semaphore.release()
+			# a worker offers itself again once it is done, which writes to the broker while the broker may be writing large results back
+			client.add_dependency(key=key, dependency=dependency)
+
+		client = DependencyBrokerClient(
+			socket_path=self.__socket_path,
+			on_dependent_dependency_satisfied_callback=on_dependent_dependency_satisfied_callback
+		)
+		client.add_dependents(
+			dependent_and_key_pairs=[(index, "key") for index in range(dependents_total)]
+		)
+		client.add_dependencies(
+			dependency_and_key_pairs=[(bytes([index]) * 2**16, "key") for index in range(16)]
+		)
+
+		self.assertTrue(found_semaphore.acquire(timeout=30))
+		self.assertEqual(dependents_total, found_total)
+
+		client.dispose()
+		server.dispose()
+
+	def test_socket_permissions_and_existing_files(self):
+
+		with open(self.__socket_path, "w") as file_handle:
+			file_handle.write("not a socket")
+
+		server = DependencyBrokerServer(
+			socket_path=self.__socket_path,
+			is_dependency_reusable=False
+		)
+
+		with self.assertRaises(Exception):
+			server.start()
+
+		os.unlink(self.__socket_path)
+		server.start()
+
+		self.assertTrue(stat.S_ISSOCK(os.stat(self.__socket_path).st_mode))
+		self.assertEqual(0o600, stat.S_IMODE(os.stat(self.__socket_path).st_mode))
+
+		server.dispose()
+
+		# a socket left behind by a previous broker is replaced
+		other_server = DependencyBrokerServer(
+			socket_path=self.__socket_path,
+			is_dependency_reusable=False
+		)
+		other_server.start()
+		other_server.dispose()
+
+	def test_callback_exception_closes_client(self):
+
+		server = DependencyBrokerServer(
+			socket_path=self.__socket_path,
+			is_dependency_reusable=False
+		)
+		server.start()
+
+		def on_dependent_dependency_satisfied_callback(dependent, dependency, key):
+			raise Exception(f"Failed to process {dependent}.")
+
+		client = DependencyBrokerClient(
+			socket_path=self.__socket_path,
+			on_dependent_dependency_satisfied_callback=on_dependent_dependency_satisfied_callback
+		)
+		client.add_dependent(dependent="failing", key="key")
+		client.add_dependent(dependent="waiting", key="other key")
+		client.add_dependency(key="key", dependency="dependency 0")
+
+		while server.get_connections_total() != 0:
+			time.sleep(0.01)
+
+		with self.assertRaises(Exception):
+			client.cancel(dependent="waiting", key="other key")
+
+		client.dispose()
+		server.dispose()
+
+	def test_closed_connections_release_their_threads(self):
+
+		# the broker starts the threads of each connection from its accept thread, while the clients start theirs from this thread
+		thread_references = []  # type: List[weakref.ref]
+		class RecordingThread(threading.Thread):
+			def __init__(self, *args, **kwargs):
+				super().__init__(*args, **kwargs)
+				if threading.current_thread() is not threading.main_thread():
+					thread_references.append(weakref.ref(self))
+
+		with mock.patch("src.austin_heller_repo.common.Thread", RecordingThread):
+
+			server = DependencyBrokerServer(
+				socket_path=self.__socket_path,
+				is_dependency_reusable=False
+			)
+			server.start()
+
+			for _ in range(10):
+				client = DependencyBrokerClient(
+					socket_path=self.__socket_path
+				)
+				while server.get_connections_total() != 1:
+					time.sleep(0.01)
+				client.dispose()
+				while server.get_connections_total() != 0:
+					time.sleep(0.01)
+
+			# the accept thread refers to the latest connection until it accepts the next one
+			closed_thread_references = list(thread_references)
+			client = DependencyBrokerClient(
+				socket_path=self.__socket_path
+			)
+			while server.get_connections_total() != 1:
+				time.sleep(0.01)
+
+		# the threads are released while the broker is still running, once each thread has exited
+		start_time = time.perf_counter()
+		while any(thread_reference() is not None for thread_reference in closed_thread_references) and time.perf_counter() - start_time < 5:
+			gc.collect()
+			time.sleep(0.01)
+
+		self.assertEqual(20, len(closed_thread_references))
+		self.assertEqual(0, sum(thread_reference() is not None for thread_reference in closed_thread_references))
+
+		client.dispose()
+		server.dispose()
+
+	def test_timing_batches(self):
+
+		dependents_total = 100000
+
+		server = DependencyBrokerServer(
+			socket_path=self.__socket_path,
+			is_dependency_reusable=True
+		)
+		server.start()
+
+		found_semaphore = Semaphore(0)
+		def on_dependent_dependency_satisfied_callback(dependent, dependency, key):
+			if dependent == dependents_total - 1:
+				found_semaphore.release()
+
+		consumer = DependencyBrokerClient(
+			socket_path=self.__socket_path,
+			on_dependent_dependency_satisfied_callback=on_dependent_dependency_satisfied_callback
+		)
+		producer = DependencyBrokerClient(
+			socket_path=self.__socket_path
+		)
+		producer.add_dependencies(
+			dependency_and_key_pairs=[(index, index) for index in range(100)]
+		)
+
+		for batch_size in [1, 1000]:
+			start_time = time.perf_counter()
+			for index in range(0, dependents_total, batch_size):
+				consumer.add_dependents(
+					dependent_and_key_pairs=[(dependent_index, dependent_index % 100) for dependent_index in range(index, index + batch_size)]
+				)
+			self.assertTrue(found_semaphore.acquire(timeout=60))
+			print(f"batch size {batch_size}: {dependents_total / (time.perf_counter() - start_time)} dependents per second")
+
+		consumer.dispose()
+		producer.dispose()
+		server.dispose()
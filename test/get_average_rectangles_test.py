@@ -1,6 +1,13 @@
 from __future__ import annotations
 import unittest
+import random
+import time
+from typing import List, Tuple
 from src.austin_heller_repo.common import get_average_rectangles
+try:
+	import numpy
+except ImportError:
+	numpy = None
 
 
 class GetAverageRectanglesTest(unittest.TestCase):
@@ -68,3 +75,87 @@ class GetAverageRectanglesTest(unittest.TestCase):
 
 		print(f"actual_rectangles: {actual_rectangles}")
 		self.assertEqual(1, len(actual_rectangles))
+
+	def test_chained_rectangles(self):
+
+		rectangles = [
+			(0, 0, 2, 2),
+			(0.5, 0, 2, 2),
+			(1.0, 0, 2, 2),
+			(1.5, 0, 2, 2)
+		]
+
+		actual_rectangles = get_average_rectangles(
+			rectangles=rectangles,
+			overlap_threshold=0.5,
+			is_clustered=False
+		)
+
+		self.assertEqual(2, len(actual_rectangles))
+
+		actual_rectangles = get_average_rectangles(
+			rectangles=rectangles,
+			overlap_threshold=0.5,
+			is_clustered=True
+		)
+
+		self.assertEqual([(0.75, 0, 2, 2)], actual_rectangles)
+
+	def test_overlapping_rectangles_callback(self):
+
+		found_overlaps = []  # type: List[Tuple[int, int, float]]
+		def on_overlapping_rectangles_callback(index: int, other_index: int, overlap: float):
+			found_overlaps.append((index, other_index, overlap))
+
+		get_average_rectangles(
+			rectangles=[
+				(1, 2, 3, 4),
+				(1.1, 2.1, 3, 4),
+				(5, 2, 3, 4)
+			],
+			overlap_threshold=0.75,
+			on_overlapping_rectangles_callback=on_overlapping_rectangles_callback
+		)
+
+		self.assertEqual([(0, 1)], [(index, other_index) for index, other_index, _ in found_overlaps])
+
+	@unittest.skipIf(numpy is None, "numpy is not installed")
+	def test_numpy_matches_python(self):
+
+		random_instance = random.Random(0)
+		for rectangles_total, extent, overlap_threshold in [(2, 5, 0.01), (100, 30, 0.2), (400, 50, 0.4), (200, 20, 0.0)]:
+			rectangles = []  # type: List[Tuple[float, float, float, float]]
+			for _ in range(rectangles_total):
+				rectangles.append((random_instance.uniform(0, extent), random_instance.uniform(0, extent), random_instance.uniform(1, 10), random_instance.uniform(1, 10)))
+
+			for is_clustered in [False, True]:
+				expected_rectangles = get_average_rectangles(
+					rectangles=rectangles,
+					overlap_threshold=overlap_threshold,
+					is_numpy_preferred=False,
+					is_clustered=is_clustered
+				)
+				actual_rectangles = get_average_rectangles(
+					rectangles=rectangles,
+					overlap_threshold=overlap_threshold,
+					is_numpy_preferred=True,
+					is_clustered=is_clustered
+				)
+
+				self.assertEqual(expected_rectangles, actual_rectangles)
+
+	def test_timing(self):
+
+		random_instance = random.Random(0)
+		rectangles = []  # type: List[Tuple[float, float, float, float]]
+		for _ in range(5000):
+			rectangles.append((random_instance.uniform(0, 700), random_instance.uniform(0, 700), random_instance.uniform(1, 10), random_instance.uniform(1, 10)))
+
+		for is_numpy_preferred in [False, True]:
+			start_time = time.perf_counter()
+			get_average_rectangles(
+				rectangles=rectangles,
+				overlap_threshold=0.3,
+				is_numpy_preferred=is_numpy_preferred
+			)
+			print(f"is_numpy_preferred: {is_numpy_preferred}: {time.perf_counter() - start_time} seconds")
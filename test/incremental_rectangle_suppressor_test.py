@@ -0,0 +1,216 @@
+from __future__ import annotations
+import unittest
+import random
+import time
+from typing import List, Tuple, Dict
+from src.austin_heller_repo.common import IncrementalRectangleSuppressor, get_non_maximum_suppression_rectangles
+
+
+def get_random_rectangle(*, random_instance: random.Random, extent: float) -> Tuple[float, float, float, float]:
+	return (random_instance.uniform(0, extent), random_instance.uniform(0, extent), random_instance.uniform(1, 10), random_instance.uniform(1, 10))
+
+
+class IncrementalRectangleSuppressorTest(unittest.TestCase):
+
+	def test_initialize(self):
+
+		suppressor = IncrementalRectangleSuppressor(
+			overlap_threshold=0.5
+		)
+
+		self.assertIsNotNone(suppressor)
+		self.assertEqual([], suppressor.get_rectangles())
+
+	def test_negative_overlap_threshold(self):
+
+		with self.assertRaises(Exception):
+			IncrementalRectangleSuppressor(
+				overlap_threshold=-0.1
+			)
+
+	def test_removing_suppressor_restores_rectangle(self):
+
+		suppressor = IncrementalRectangleSuppressor(
+			overlap_threshold=0.5
+		)
+
+		rectangle_ids = suppressor.update(
+			added_rectangles=[
+				(1, 2, 3, 4),
+				(1.1, 2.1, 3, 4),
+				(10, 2, 3, 4)
+			],
+			added_scores=[0.1, 0.9, 0.5]
+		)
+
+		self.assertEqual([(1.1, 2.1, 3, 4), (10, 2, 3, 4)], suppressor.get_rectangles())
+
+		suppressor.update(
+			removed_rectangle_ids=[rectangle_ids[1]]
+		)
+
+		self.assertEqual([rectangle_ids[0], rectangle_ids[2]], suppressor.get_rectangle_ids())
+
+	def test_chain_cascades(self):
+
+		suppressor = IncrementalRectangleSuppressor(
+			overlap_threshold=0.5
+		)
+
+		rectangle_ids = suppressor.update(
+			added_rectangles=[
+				(0, 0, 2, 2),
+				(0.5, 0, 2, 2),
+				(1.0, 0, 2, 2)
+			]
+		)
+
+		self.assertEqual([rectangle_ids[0], rectangle_ids[2]], suppressor.get_rectangle_ids())
+
+		suppressor.update(
+			removed_rectangle_ids=[rectangle_ids[0]]
+		)
+
+		self.assertEqual([rectangle_ids[1]], suppressor.get_rectangle_ids())
+
+	def test_matches_score_ordered_suppression(self):
+
+		random_instance = random.Random(0)
+		suppressor = IncrementalRectangleSuppressor(
+			overlap_threshold=0.3
+		)
+		score_per_rectangle_id = {}  # type: Dict[int, float]
+
+		for frame_index in range(50):
+			removed_rectangle_ids = random_instance.sample(sorted(score_per_rectangle_id), min(len(score_per_rectangle_id), random_instance.randrange(10)))
+			added_rectangles = [get_random_rectangle(random_instance=random_instance, extent=60) for _ in range(random_instance.randrange(12))]
+			added_scores = [random_instance.choice([0.25, 0.5, 0.75]) for _ in added_rectangles]
+
+			added_rectangle_ids = suppressor.update(
+				added_rectangles=added_rectangles,
+				added_scores=added_scores,
+				removed_rectangle_ids=removed_rectangle_ids
+			)
+
+			for rectangle_id in removed_rectangle_ids:
+				del score_per_rectangle_id[rectangle_id]
+			for rectangle_id, score in zip(added_rectangle_ids, added_scores):
+				score_per_rectangle_id[rectangle_id] = score
+
+			rectangle_ids = sorted(score_per_rectangle_id)
+			expected_rectangles = get_non_maximum_suppression_rectangles(
+				rectangles=[suppressor.get_rectangle(rectangle_id=rectangle_id) for rectangle_id in rectangle_ids],
+				overlap_threshold=0.3,
+				scores=[score_per_rectangle_id[rectangle_id] for rectangle_id in rectangle_ids]
+			)
+
+			self.assertEqual(expected_rectangles, suppressor.get_rectangles())
+
+	def test_rectangle_sizes_change_between_updates(self):
+
+		random_instance = random.Random(2)
+		suppressor = IncrementalRectangleSuppressor(
+			overlap_threshold=0.3
+		)
+		score_per_rectangle_id = {}  # type: Dict[int, float]
+
+		# the rectangles grow a hundredfold and then shrink again, with an occasional rectangle far larger than the rest
+		for scale in [0.1, 0.1, 1, 10, 10, 10, 10, 1, 0.1, 0.1, 0.1, 0.1]:
+			removed_rectangle_ids = random_instance.sample(sorted(score_per_rectangle_id), len(score_per_rectangle_id) // 2)
+			added_rectangles = [tuple(value * scale for value in get_random_rectangle(random_instance=random_instance, extent=100)) for _ in range(40)]
+			added_rectangles.append((0, 0, 1000 * scale, 1000 * scale))
+			added_scores = [random_instance.random() for _ in added_rectangles]
+
+			added_rectangle_ids = suppressor.update(
+				added_rectangles=added_rectangles,
+				added_scores=added_scores,
+				removed_rectangle_ids=removed_rectangle_ids
+			)
+
+			for rectangle_id in removed_rectangle_ids:
+				del score_per_rectangle_id[rectangle_id]
+			for rectangle_id, score in zip(added_rectangle_ids, added_scores):
+				score_per_rectangle_id[rectangle_id] = score
+
+			rectangle_ids = sorted(score_per_rectangle_id)
+			expected_rectangles = get_non_maximum_suppression_rectangles(
+				rectangles=[suppressor.get_rectangle(rectangle_id=rectangle_id) for rectangle_id in rectangle_ids],
+				overlap_threshold=0.3,
+				scores=[score_per_rectangle_id[rectangle_id] for rectangle_id in rectangle_ids]
+			)
+
+			self.assertEqual(expected_rectangles, suppressor.get_rectangles())
+
+	def test_remove_unknown_rectangle(self):
+
+		suppressor = IncrementalRectangleSuppressor(
+			overlap_threshold=0.5
+		)
+
+		rectangle_ids = suppressor.update(
+			added_rectangles=[(1, 2, 3, 4), (10, 2, 3, 4)]
+		)
+		suppressor.update(
+			removed_rectangle_ids=[rectangle_ids[0]]
+		)
+
+		for removed_rectangle_ids in [[rectangle_ids[0]], [100], [rectangle_ids[1], rectangle_ids[1]]]:
+			with self.assertRaises(Exception) as context:
+				suppressor.update(
+					removed_rectangle_ids=removed_rectangle_ids
+				)
+			self.assertNotIsInstance(context.exception, KeyError)
+
+		# a rejected update changes nothing
+		self.assertEqual([rectangle_ids[1]], suppressor.get_rectangle_ids())
+
+	def test_timing_rectangles_larger_than_first_update(self):
+
+		random_instance = random.Random(3)
+
+		suppressor = IncrementalRectangleSuppressor(
+			overlap_threshold=0.3
+		)
+		suppressor.update(
+			added_rectangles=[get_random_rectangle(random_instance=random_instance, extent=10) for _ in range(10)]
+		)
+
+		start_time = time.perf_counter()
+		for _ in range(10):
+			suppressor.update(
+				added_rectangles=[tuple(value * 20 for value in get_random_rectangle(random_instance=random_instance, extent=1000)) for _ in range(500)]
+			)
+		print(f"larger rectangles: {time.perf_counter() - start_time} seconds")
+
+	def test_timing_frames(self):
+
+		random_instance = random.Random(1)
+		rectangles = [get_random_rectangle(random_instance=random_instance, extent=1000) for _ in range(5000)]
+
+		suppressor = IncrementalRectangleSuppressor(
+			overlap_threshold=0.3
+		)
+		rectangle_ids = suppressor.update(
+			added_rectangles=rectangles
+		)
+
+		start_time = time.perf_counter()
+		for _ in range(100):
+			removed_indexes = random_instance.sample(range(len(rectangles)), 50)
+			added_rectangles = [get_random_rectangle(random_instance=random_instance, extent=1000) for _ in removed_indexes]
+			added_rectangle_ids = suppressor.update(
+				added_rectangles=added_rectangles,
+				removed_rectangle_ids=[rectangle_ids[index] for index in removed_indexes]
+			)
+			for index, rectangle_id, rectangle in zip(removed_indexes, added_rectangle_ids, added_rectangles):
+				rectangle_ids[index] = rectangle_id
+				rectangles[index] = rectangle
+		print(f"incremental: {(time.perf_counter() - start_time) / 100} seconds per frame")
+
+		start_time = time.perf_counter()
+		get_non_maximum_suppression_rectangles(
+			rectangles=rectangles,
+			overlap_threshold=0.3,
+			scores=[0.0] * len(rectangles)
+		)
+		print(f"from scratch: {time.perf_counter() - start_time} seconds per frame")
@@ -1,6 +1,40 @@
 from __future__ import annotations
 import unittest
+import random
+import time
+from typing import List, Tuple
 from src.austin_heller_repo.common import get_non_maximum_suppression_rectangles
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+
+def get_random_rectangles(*, random_instance: random.Random, rectangles_total: int, extent: float) -> List[Tuple[float, float, float, float]]:
+	rectangles = []  # type: List[Tuple[float, float, float, float]]
+	for _ in range(rectangles_total):
+		rectangles.append((
+			random_instance.uniform(0, extent),
+			random_instance.uniform(0, extent),
+			random_instance.uniform(1, 10),
+			random_instance.uniform(1, 10)
+		))
+	return rectangles
+
+
+def get_baseline_non_maximum_suppression_rectangles(*, rectangles: List[Tuple[float, float, float, float]], overlap_threshold: float) -> List[Tuple[float, float, float, float]]:
+	# the implementation that both engines must agree with, including the error raised when two rectangles without area are compared
+	areas = [rectangle[2] * rectangle[3] for rectangle in rectangles]
+	indexes = list(range(len(areas)))
+	for index, rectangle in enumerate(rectangles):
+		for temp_index in [i for i in indexes if i != index]:
+			w = max(0, min(rectangle[0] + rectangle[2], rectangles[temp_index][0] + rectangles[temp_index][2]) - max(rectangle[0], rectangles[temp_index][0]))
+			h = max(0, min(rectangle[1] + rectangle[3], rectangles[temp_index][1] + rectangles[temp_index][3]) - max(rectangle[1], rectangles[temp_index][1]))
+			overlap = (w * h) / (areas[temp_index] + areas[index] - (w * h))
+			if overlap > overlap_threshold:
+				indexes.remove(index)
+				break
+	return [rectangle for rectangle_index, rectangle in enumerate(rectangles) if rectangle_index in indexes]
 
 
 class NonMaximumSuppressionTest(unittest.TestCase):
@@ -50,3 +84,231 @@ class NonMaximumSuppressionTest(unittest.TestCase):
 		)
 
 		print(f"actual_rectangles: {actual_rectangles}")
+
+	@unittest.skipIf(numpy is None, "numpy is not installed")
+	def test_numpy_matches_python(self):
+
+		random_instance = random.Random(0)
+		for rectangles_total, extent, overlap_threshold in [(2, 5, 0.01), (50, 20, 0.1), (600, 100, 0.3), (600, 40, 0.5)]:
+			rectangles = get_random_rectangles(
+				random_instance=random_instance,
+				rectangles_total=rectangles_total,
+				extent=extent
+			)
+
+			expected_rectangles = get_non_maximum_suppression_rectangles(
+				rectangles=rectangles,
+				overlap_threshold=overlap_threshold,
+				is_numpy_preferred=False
+			)
+			actual_rectangles = get_non_maximum_suppression_rectangles(
+				rectangles=rectangles,
+				overlap_threshold=overlap_threshold,
+				is_numpy_preferred=True
+			)
+
+			self.assertEqual(expected_rectangles, actual_rectangles)
+
+	def test_rectangles_without_area(self):
+
+		random_rectangles = get_random_rectangles(
+			random_instance=random.Random(0),
+			rectangles_total=50,
+			extent=20
+		)
+		for rectangles, overlap_threshold in [
+			([(0, 0, 0, 5), (0, 0, 4, 4), (2, 2, 4, 4)], 0.1),
+			([(1, 1, 3, 0), (0, 0, 4, 4)], 0.0),
+			([(0, 0, 0, 0), (0, 0, 0, 0)], 0.5),
+			([(0, 0, 4, 4), (0.5, 0.5, 4, 4), (1, 1, 0, 3), (5, 5, 2, 0)], 0.3),
+			([(0, 0, 0, 5), (0, 0, 4, 4), (3, 3, 0, 0)], -0.5),
+			([(0, 0, 0, 0), (1, 1, 0, 0), (0, 0, 4, 4)], -0.5),
+			([(0, 0, 4, 4), (1, 1, 0, 0), (2, 2, 0, 0)], -0.5),
+			([(x, y, 0 if index == 10 else width, height) for index, (x, y, width, height) in enumerate(random_rectangles)], 0.3),
+			([(x, y, 0 if index == 10 else width, 0 if index == 20 else height) for index, (x, y, width, height) in enumerate(random_rectangles)], 0.3),
+			([(x, y, 0 if index % 7 == 0 else width, height) for index, (x, y, width, height) in enumerate(random_rectangles)], -0.5)
+		]:
+			try:
+				expected_rectangles = get_baseline_non_maximum_suppression_rectangles(
+					rectangles=rectangles,
+					overlap_threshold=overlap_threshold
+				)
+			except ZeroDivisionError:
+				expected_rectangles = None
+
+			for is_numpy_preferred in [False, True]:
+				if expected_rectangles is None:
+					with self.assertRaises(ZeroDivisionError):
+						get_non_maximum_suppression_rectangles(
+							rectangles=rectangles,
+							overlap_threshold=overlap_threshold,
+							is_numpy_preferred=is_numpy_preferred
+						)
+				else:
+					actual_rectangles = get_non_maximum_suppression_rectangles(
+						rectangles=rectangles,
+						overlap_threshold=overlap_threshold,
+						is_numpy_preferred=is_numpy_preferred
+					)
+					self.assertEqual(expected_rectangles, [tuple(rectangle) for rectangle in actual_rectangles])
+
+	@unittest.skipIf(numpy is None, "numpy is not installed")
+	def test_numpy_array(self):
+
+		rectangles = numpy.array([
+			(1, 2, 3, 4),
+			(1.1, 2.1, 3, 4),
+			(10, 2, 3, 4)
+		])
+
+		actual_rectangles = get_non_maximum_suppression_rectangles(
+			rectangles=rectangles,
+			overlap_threshold=0.5
+		)
+
+		self.assertIsInstance(actual_rectangles, numpy.ndarray)
+		self.assertEqual([[1.1, 2.1, 3, 4], [10, 2, 3, 4]], actual_rectangles.tolist())
+
+	@unittest.skipIf(numpy is None, "numpy is not installed")
+	def test_timing_numpy(self):
+
+		rectangles = get_random_rectangles(
+			random_instance=random.Random(0),
+			rectangles_total=1000,
+			extent=300
+		)
+
+		for is_numpy_preferred in [False, True]:
+			start_time = time.perf_counter()
+			get_non_maximum_suppression_rectangles(
+				rectangles=rectangles,
+				overlap_threshold=0.3,
+				is_numpy_preferred=is_numpy_preferred
+			)
+			print(f"is_numpy_preferred: {is_numpy_preferred}: {time.perf_counter() - start_time} seconds")
+
+	def test_scores_keep_highest_score(self):
+
+		actual_rectangles = get_non_maximum_suppression_rectangles(
+			rectangles=[
+				(1, 2, 3, 4),
+				(1.1, 2.1, 3, 4),
+				(10, 2, 3, 4)
+			],
+			overlap_threshold=0.5,
+			scores=[0.9, 0.1, 0.5]
+		)
+
+		self.assertEqual([(1, 2, 3, 4), (10, 2, 3, 4)], actual_rectangles)
+
+	def test_scores_match_greedy(self):
+
+		def get_overlap(rectangle, other_rectangle) -> float:
+			w = max(0, min(rectangle[0] + rectangle[2], other_rectangle[0] + other_rectangle[2]) - max(rectangle[0], other_rectangle[0]))
+			h = max(0, min(rectangle[1] + rectangle[3], other_rectangle[1] + other_rectangle[3]) - max(rectangle[1], other_rectangle[1]))
+			return (w * h) / (rectangle[2] * rectangle[3] + other_rectangle[2] * other_rectangle[3] - w * h)
+
+		random_instance = random.Random(1)
+		for rectangles_total, extent, overlap_threshold in [(1, 5, 0.5), (50, 20, 0.1), (500, 100, 0.3), (500, 30, 0.6)]:
+			rectangles = get_random_rectangles(
+				random_instance=random_instance,
+				rectangles_total=rectangles_total,
+				extent=extent
+			)
+			scores = [random_instance.random() for _ in range(rectangles_total)]
+
+			kept_indexes = []  # type: List[int]
+			for index in sorted(range(rectangles_total), key=scores.__getitem__, reverse=True):
+				if all(get_overlap(rectangles[index], rectangles[kept_index]) <= overlap_threshold for kept_index in kept_indexes):
+					kept_indexes.append(index)
+			expected_rectangles = [rectangles[index] for index in sorted(kept_indexes)]
+
+			actual_rectangles = get_non_maximum_suppression_rectangles(
+				rectangles=rectangles,
+				overlap_threshold=overlap_threshold,
+				scores=scores
+			)
+
+			self.assertEqual(expected_rectangles, actual_rectangles)
+
+	def test_scores_with_huge_rectangles(self):
+
+		def get_overlap(rectangle, other_rectangle) -> float:
+			w = max(0, min(rectangle[0] + rectangle[2], other_rectangle[0] + other_rectangle[2]) - max(rectangle[0], other_rectangle[0]))
+			h = max(0, min(rectangle[1] + rectangle[3], other_rectangle[1] + other_rectangle[3]) - max(rectangle[1], other_rectangle[1]))
+			return (w * h) / (rectangle[2] * rectangle[3] + other_rectangle[2] * other_rectangle[3] - w * h)
+
+		random_instance = random.Random(2)
+		for overlap_threshold in [0.0, 0.001, 0.3]:
+			rectangles = get_random_rectangles(
+				random_instance=random_instance,
+				rectangles_total=500,
+				extent=100
+			)
+			# a few rectangles are far larger than the rest, as with a detection of the whole frame
+			rectangles.extend([(-10, -10, 120, 120), (20, 20, 60, 70), (0, 50, 1000, 5)])
+			scores = [random_instance.random() for _ in range(len(rectangles))]
+
+			kept_indexes = []  # type: List[int]
+			for index in sorted(range(len(rectangles)), key=scores.__getitem__, reverse=True):
+				if all(get_overlap(rectangles[index], rectangles[kept_index]) <= overlap_threshold for kept_index in kept_indexes):
+					kept_indexes.append(index)
+			expected_rectangles = [rectangles[index] for index in sorted(kept_indexes)]
+
+			actual_rectangles = get_non_maximum_suppression_rectangles(
+				rectangles=rectangles,
+				overlap_threshold=overlap_threshold,
+				scores=scores
+			)
+
+			self.assertEqual(expected_rectangles, actual_rectangles)
+
+	def test_timing_scores_with_huge_rectangles(self):
+
+		random_instance = random.Random(0)
+		rectangles = get_random_rectangles(
+			random_instance=random_instance,
+			rectangles_total=100000,
+			extent=10 * 100000 ** 0.5
+		)
+		rectangles.extend((0, 0, 1000000, 1000000) for _ in range(10))
+		# the huge rectangles score lowest, so they are compared with every kept rectangle but suppress nothing
+		scores = [random_instance.random() for _ in range(100000)] + [-1] * 10
+
+		start_time = time.perf_counter()
+		get_non_maximum_suppression_rectangles(
+			rectangles=rectangles,
+			overlap_threshold=0.3,
+			scores=scores
+		)
+		print(f"scores with huge rectangles: {time.perf_counter() - start_time} seconds")
+
+	def test_timing_scores(self):
+
+		random_instance = random.Random(0)
+		for rectangles_total in [1000, 10000, 100000]:
+			# the same density of detections regardless of how many there are
+			rectangles = get_random_rectangles(
+				random_instance=random_instance,
+				rectangles_total=rectangles_total,
+				extent=10 * rectangles_total ** 0.5
+			)
+			scores = [random_instance.random() for _ in range(rectangles_total)]
+
+			start_time = time.perf_counter()
+			get_non_maximum_suppression_rectangles(
+				rectangles=rectangles,
+				overlap_threshold=0.3,
+				scores=scores
+			)
+			print(f"scores: {rectangles_total}: {time.perf_counter() - start_time} seconds")
+
+			# the original function compares every pair, so it is only timed where it finishes in a reasonable time
+			if rectangles_total <= 1000:
+				start_time = time.perf_counter()
+				get_non_maximum_suppression_rectangles(
+					rectangles=rectangles,
+					overlap_threshold=0.3,
+					is_numpy_preferred=False
+				)
+				print(f"original: {rectangles_total}: {time.perf_counter() - start_time} seconds")
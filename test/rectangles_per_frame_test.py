@@ -0,0 +1,162 @@
+from __future__ import annotations
+import unittest
+import random
+import time
+from typing import List, Tuple
+from src.austin_heller_repo.common import get_non_maximum_suppression_rectangles, get_average_rectangles, get_non_maximum_suppression_rectangles_per_frame, get_average_rectangles_per_frame
+
+
+def get_random_rectangles_per_frame(*, random_instance: random.Random, frames_total: int, rectangles_total: int) -> List[List[Tuple[float, float, float, float]]]:
+	rectangles_per_frame = []  # type: List[List[Tuple[float, float, float, float]]]
+	for _ in range(frames_total):
+		rectangles = []  # type: List[Tuple[float, float, float, float]]
+		for _ in range(random_instance.randrange(rectangles_total + 1)):
+			rectangles.append((random_instance.uniform(0, 50), random_instance.uniform(0, 50), random_instance.uniform(1, 10), random_instance.uniform(1, 10)))
+		rectangles_per_frame.append(rectangles)
+	return rectangles_per_frame
+
+
+class RectanglesPerFrameTest(unittest.TestCase):
+
+	def test_no_frames(self):
+
+		self.assertEqual([], get_non_maximum_suppression_rectangles_per_frame(
+			overlap_threshold=0.5,
+			rectangles_per_frame=[]
+		))
+		self.assertEqual([], get_average_rectangles_per_frame(
+			overlap_threshold=0.5,
+			rectangles_per_frame=[]
+		))
+
+	def test_missing_rectangles(self):
+
+		with self.assertRaises(Exception):
+			get_non_maximum_suppression_rectangles_per_frame(
+				overlap_threshold=0.5,
+				rectangles=[]
+			)
+
+	def test_invalid_frame_offsets(self):
+
+		rectangles = [(0, 0, 1, 1), (5, 5, 1, 1), (10, 10, 1, 1)]
+		for frame_offsets in [[1, 2], [0, 2, 1], [0, 4], [0, -1], []]:
+			with self.assertRaises(Exception):
+				get_non_maximum_suppression_rectangles_per_frame(
+					overlap_threshold=0.5,
+					rectangles=rectangles,
+					frame_offsets=frame_offsets
+				)
+
+		with self.assertRaises(Exception):
+			get_non_maximum_suppression_rectangles_per_frame(
+				overlap_threshold=0.5,
+				rectangles=rectangles,
+				frame_offsets=[0, 2],
+				scores=[0.5, 0.5]
+			)
+
+		# empty frames, including at the end, are allowed
+		self.assertEqual([[(0, 0, 1, 1)], [], [(5, 5, 1, 1), (10, 10, 1, 1)], []], get_non_maximum_suppression_rectangles_per_frame(
+			overlap_threshold=0.5,
+			rectangles=rectangles,
+			frame_offsets=[0, 1, 1, 3]
+		))
+		self.assertEqual([], get_non_maximum_suppression_rectangles_per_frame(
+			overlap_threshold=0.5,
+			rectangles=[],
+			frame_offsets=[]
+		))
+
+	def test_ragged_matches_single_frame(self):
+
+		rectangles_per_frame = get_random_rectangles_per_frame(
+			random_instance=random.Random(0),
+			frames_total=20,
+			rectangles_total=30
+		)
+
+		actual_rectangles_per_frame = get_non_maximum_suppression_rectangles_per_frame(
+			overlap_threshold=0.3,
+			rectangles_per_frame=rectangles_per_frame
+		)
+
+		self.assertEqual([get_non_maximum_suppression_rectangles(rectangles=rectangles, overlap_threshold=0.3) for rectangles in rectangles_per_frame], actual_rectangles_per_frame)
+
+		actual_rectangles_per_frame = get_average_rectangles_per_frame(
+			overlap_threshold=0.3,
+			rectangles_per_frame=rectangles_per_frame
+		)
+
+		self.assertEqual([get_average_rectangles(rectangles=rectangles, overlap_threshold=0.3) for rectangles in rectangles_per_frame], actual_rectangles_per_frame)
+
+	def test_frame_offsets_match_ragged(self):
+
+		random_instance = random.Random(1)
+		rectangles_per_frame = get_random_rectangles_per_frame(
+			random_instance=random_instance,
+			frames_total=20,
+			rectangles_total=30
+		)
+		scores_per_frame = [[random_instance.random() for _ in rectangles] for rectangles in rectangles_per_frame]
+
+		rectangles = []  # type: List[Tuple[float, float, float, float]]
+		scores = []  # type: List[float]
+		frame_offsets = []  # type: List[int]
+		for frame_rectangles, frame_scores in zip(rectangles_per_frame, scores_per_frame):
+			frame_offsets.append(len(rectangles))
+			rectangles.extend(frame_rectangles)
+			scores.extend(frame_scores)
+
+		expected_rectangles_per_frame = get_non_maximum_suppression_rectangles_per_frame(
+			overlap_threshold=0.3,
+			rectangles_per_frame=rectangles_per_frame,
+			scores_per_frame=scores_per_frame
+		)
+		actual_rectangles_per_frame = get_non_maximum_suppression_rectangles_per_frame(
+			overlap_threshold=0.3,
+			rectangles=rectangles,
+			frame_offsets=frame_offsets,
+			scores=scores
+		)
+
+		self.assertEqual(expected_rectangles_per_frame, actual_rectangles_per_frame)
+
+	def test_processes_match_single_process(self):
+
+		rectangles_per_frame = get_random_rectangles_per_frame(
+			random_instance=random.Random(2),
+			frames_total=40,
+			rectangles_total=30
+		)
+
+		for method in [get_non_maximum_suppression_rectangles_per_frame, get_average_rectangles_per_frame]:
+			expected_rectangles_per_frame = method(
+				overlap_threshold=0.3,
+				rectangles_per_frame=rectangles_per_frame
+			)
+			actual_rectangles_per_frame = method(
+				overlap_threshold=0.3,
+				rectangles_per_frame=rectangles_per_frame,
+				processes_total=2
+			)
+
+			self.assertEqual(expected_rectangles_per_frame, actual_rectangles_per_frame)
+
+	def test_timing_processes(self):
+
+		rectangles_per_frame = get_random_rectangles_per_frame(
+			random_instance=random.Random(3),
+			frames_total=100,
+			rectangles_total=100
+		)
+
+		for processes_total in [1, 2, 4]:
+			start_time = time.perf_counter()
+			get_non_maximum_suppression_rectangles_per_frame(
+				overlap_threshold=0.3,
+				rectangles_per_frame=rectangles_per_frame,
+				is_numpy_preferred=False,
+				processes_total=processes_total
+			)
+			print(f"processes_total: {processes_total}: {time.perf_counter() - start_time} seconds")
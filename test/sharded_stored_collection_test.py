@@ -0,0 +1,244 @@
+from __future__ import annotations
+import unittest
+import os
+import time
+import tempfile
+from typing import List, Dict
+from src.austin_heller_repo.common import StoredCollection, ShardedStoredCollection, ShardedStoredCollectionPartitionTypeEnum, StoredCollectionStorageTypeEnum, StoredCollectionException, StoredCollectionReader, ExecutorTypeEnum
+
+
+def get_stored_collections(*, directory_path: str, shards_total: int) -> List[StoredCollection]:
+	return [StoredCollection(directory_path=os.path.join(directory_path, f"shard_{shard_index}"), storage_type=StoredCollectionStorageTypeEnum.Segment) for shard_index in range(shards_total)]
+
+
+def process_in_worker(json_dict: Dict) -> Dict:
+	return {"index": json_dict["index"], "process_id": os.getpid()}
+
+
+class ShardedStoredCollectionTest(unittest.TestCase):
+
+	def test_round_robin(self):
+
+		directory = tempfile.TemporaryDirectory()
+
+		try:
+			sharded_stored_collection = ShardedStoredCollection(
+				directory_path=directory.name,
+				stored_collections=get_stored_collections(
+					directory_path=directory.name,
+					shards_total=3
+				),
+				chunk_records_total=4
+			)
+
+			sharded_stored_collection.append(
+				json_dict={"index": 0}
+			)
+			sharded_stored_collection.append_many(
+				json_dicts=[{"index": index} for index in range(1, 20)]
+			)
+
+			self.assertEqual(20, sharded_stored_collection.count())
+			self.assertEqual([7, 7, 6], sharded_stored_collection.get_shard_counts())
+			self.assertEqual([{"index": index} for index in range(20)], list(sharded_stored_collection.iterate(is_ordered=True)))
+			self.assertEqual(list(range(20)), sorted(json_dict["index"] for json_dict in sharded_stored_collection))
+
+			def scan_method(reader: StoredCollectionReader) -> int:
+				return sum(json_dict["index"] for json_dict in reader)
+
+			self.assertEqual([63, 70, 57], sharded_stored_collection.scan(scan_method))
+
+			self.assertEqual(20, sharded_stored_collection.process_all(lambda json_dict: {"index": json_dict["index"] * 2}))
+			self.assertEqual([{"index": index * 2} for index in range(20)], list(sharded_stored_collection.iterate(is_ordered=True)))
+
+			self.assertEqual(20, sharded_stored_collection.process_all(process_in_worker, workers_total=2, executor_type=ExecutorTypeEnum.Process))
+			json_dicts = list(sharded_stored_collection.iterate(is_ordered=True))
+			self.assertEqual([index * 2 for index in range(20)], [json_dict["index"] for json_dict in json_dicts])
+			self.assertNotIn(os.getpid(), [json_dict["process_id"] for json_dict in json_dicts])
+
+			self.assertEqual(20, sharded_stored_collection.process_all(lambda json_dict: {"index": json_dict["index"]}))
+
+			sharded_stored_collection.commit()
+			sharded_stored_collection.dispose()
+
+			sharded_stored_collection = ShardedStoredCollection(
+				directory_path=directory.name,
+				stored_collections=get_stored_collections(
+					directory_path=directory.name,
+					shards_total=3
+				)
+			)
+
+			sharded_stored_collection.append(
+				json_dict={"index": 40}
+			)
+
+			self.assertEqual([7, 7, 7], sharded_stored_collection.get_shard_counts())
+			self.assertEqual([{"index": index * 2} for index in range(21)], list(sharded_stored_collection.iterate(is_ordered=True)))
+
+			sharded_stored_collection.dispose()
+
+		finally:
+			directory.cleanup()
+
+	def test_hash(self):
+
+		directory = tempfile.TemporaryDirectory()
+
+		try:
+			with self.assertRaises(StoredCollectionException):
+				ShardedStoredCollection(
+					directory_path=directory.name,
+					stored_collections=[],
+					partition_type=ShardedStoredCollectionPartitionTypeEnum.Hash,
+					partition_path=("user",)
+				)
+
+			stored_collections = get_stored_collections(
+				directory_path=directory.name,
+				shards_total=4
+			)
+
+			with self.assertRaises(StoredCollectionException):
+				ShardedStoredCollection(
+					directory_path=directory.name,
+					stored_collections=stored_collections,
+					partition_type=ShardedStoredCollectionPartitionTypeEnum.Hash
+				)
+
+			sharded_stored_collection = ShardedStoredCollection(
+				directory_path=directory.name,
+				stored_collections=stored_collections,
+				partition_type=ShardedStoredCollectionPartitionTypeEnum.Hash,
+				partition_path=("user",)
+			)
+
+			sharded_stored_collection.append_many(
+				json_dicts=[{"index": index, "user": index % 5} for index in range(100)]
+			)
+
+			self.assertEqual([{"index": index, "user": index % 5} for index in range(100)], list(sharded_stored_collection.iterate(is_ordered=True)))
+
+			def scan_method(reader: StoredCollectionReader) -> List[int]:
+				return sorted(set(json_dict["user"] for json_dict in reader))
+
+			users_per_shard = sharded_stored_collection.scan(scan_method)
+
+			self.assertEqual(list(range(5)), sorted(user for users in users_per_shard for user in users))
+
+			for json_dict in [{"index": 100}, {"index": 100, "user": [0]}, {"index": 100, "user": {"id": 0}}]:
+				with self.assertRaises(StoredCollectionException):
+					sharded_stored_collection.append_many(
+						json_dicts=[{"index": 100, "user": 0}, json_dict]
+					)
+
+			self.assertEqual(100, sharded_stored_collection.count())
+			self.assertEqual(100, sum(sharded_stored_collection.get_shard_counts()))
+
+			sharded_stored_collection.dispose()
+
+			with self.assertRaises(StoredCollectionException):
+				ShardedStoredCollection(
+					directory_path=directory.name,
+					stored_collections=stored_collections,
+					partition_type=ShardedStoredCollectionPartitionTypeEnum.RoundRobin
+				)
+
+			with self.assertRaises(StoredCollectionException):
+				ShardedStoredCollection(
+					directory_path=directory.name,
+					stored_collections=stored_collections[:3]
+				)
+
+		finally:
+			directory.cleanup()
+
+	def test_recovery_and_deletion(self):
+
+		directory = tempfile.TemporaryDirectory()
+
+		try:
+			sharded_stored_collection = ShardedStoredCollection(
+				directory_path=directory.name,
+				stored_collections=get_stored_collections(
+					directory_path=directory.name,
+					shards_total=2
+				)
+			)
+
+			sharded_stored_collection.append_many(
+				json_dicts=[{"index": index} for index in range(6)]
+			)
+
+			sharded_stored_collection.dispose()
+
+			# the sequence refers to records that were lost and misses records that were appended
+			with open(os.path.join(directory.name, ".sequence"), "ab") as file_handle:
+				file_handle.write(b"\x00\x00\x01\x00\x01")
+
+			stored_collections = get_stored_collections(
+				directory_path=directory.name,
+				shards_total=2
+			)
+			stored_collections[1].append(
+				json_dict={"index": 6}
+			)
+			stored_collections[0].delete(
+				index=1
+			)
+
+			sharded_stored_collection = ShardedStoredCollection(
+				directory_path=directory.name,
+				stored_collections=stored_collections
+			)
+
+			self.assertEqual(7, sharded_stored_collection.count())
+			self.assertEqual([{"index": index} for index in [0, 1, 3, 4, 5, 6]], list(sharded_stored_collection.iterate(is_ordered=True)))
+			self.assertEqual(14, os.path.getsize(os.path.join(directory.name, ".sequence")))
+
+			sharded_stored_collection.dispose()
+
+		finally:
+			directory.cleanup()
+
+	def test_timing_shards(self):
+
+		for shards_total in [1, 4]:
+
+			directory = tempfile.TemporaryDirectory()
+
+			try:
+				sharded_stored_collection = ShardedStoredCollection(
+					directory_path=directory.name,
+					stored_collections=get_stored_collections(
+						directory_path=directory.name,
+						shards_total=shards_total
+					)
+				)
+
+				start_time = time.perf_counter()
+				for start_index in range(0, 40000, 4000):
+					sharded_stored_collection.append_many(
+						json_dicts=[{"index": index, "text": "text " * 20} for index in range(start_index, start_index + 4000)]
+					)
+				sharded_stored_collection.commit()
+				print(f"{shards_total} shards append: {time.perf_counter() - start_time} seconds")
+
+				start_time = time.perf_counter()
+				for _ in sharded_stored_collection.iterate(is_ordered=False):
+					pass
+				print(f"{shards_total} shards unordered iteration: {time.perf_counter() - start_time} seconds")
+
+				start_time = time.perf_counter()
+				for _ in sharded_stored_collection.iterate(is_ordered=True):
+					pass
+				print(f"{shards_total} shards ordered iteration: {time.perf_counter() - start_time} seconds")
+
+				start_time = time.perf_counter()
+				sharded_stored_collection.scan(lambda reader: sum(1 for _ in reader))
+				print(f"{shards_total} shards scan: {time.perf_counter() - start_time} seconds")
+
+				sharded_stored_collection.dispose()
+
+			finally:
+				directory.cleanup()
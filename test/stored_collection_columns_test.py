@@ -0,0 +1,225 @@
+from __future__ import annotations
+import unittest
+import os
+import time
+import tempfile
+from src.austin_heller_repo.common import StoredCollection, StoredCollectionColumns, StoredCollectionColumnTypeEnum, StoredCollectionStorageTypeEnum, StoredCollectionException
+
+
+class StoredCollectionColumnsTest(unittest.TestCase):
+
+	def test_export_and_scan(self):
+
+		directory = tempfile.TemporaryDirectory()
+
+		try:
+			stored_collection = StoredCollection(
+				directory_path=os.path.join(directory.name, "collection"),
+				storage_type=StoredCollectionStorageTypeEnum.Segment
+			)
+
+			stored_collection.append_many(
+				json_dicts=[
+					{"index": 0, "score": 1.5, "name": "first", "is_active": True, "tags": ["a"], "mixed": 1},
+					{"index": 1, "score": 2.0, "name": "sécond", "is_active": False, "mixed": "1"},
+					{"index": 2, "name": None, "tags": {"b": 2}, "large": 2**70},
+					{"index": 3, "score": -4.5, "name": "", "is_active": True}
+				]
+			)
+			stored_collection.delete(
+				index=2
+			)
+
+			stored_collection_columns = stored_collection.export_columns(
+				directory_path=os.path.join(directory.name, "columns")
+			)
+
+			self.assertEqual(4, stored_collection_columns.count())
+			self.assertEqual(["index", "score", "name", "is_active", "tags", "mixed"], stored_collection_columns.get_fields())
+			self.assertEqual(StoredCollectionColumnTypeEnum.Integer, stored_collection_columns.get_column_type(field="index"))
+			self.assertEqual(StoredCollectionColumnTypeEnum.Float, stored_collection_columns.get_column_type(field="score"))
+			self.assertEqual(StoredCollectionColumnTypeEnum.String, stored_collection_columns.get_column_type(field="name"))
+			self.assertEqual(StoredCollectionColumnTypeEnum.Boolean, stored_collection_columns.get_column_type(field="is_active"))
+			self.assertEqual(StoredCollectionColumnTypeEnum.Json, stored_collection_columns.get_column_type(field="tags"))
+			self.assertEqual(StoredCollectionColumnTypeEnum.Json, stored_collection_columns.get_column_type(field="mixed"))
+
+			self.assertEqual([(0, 1.5), (1, 2.0), (3, -4.5)], list(stored_collection_columns.scan(fields=["index", "score"])))
+			self.assertEqual([("first", True, ["a"]), ("sécond", False, None), ("", True, None)], list(stored_collection_columns.scan(fields=["name", "is_active", "tags"])))
+			self.assertEqual([1, "1", None], [values[0] for values in stored_collection_columns.scan(fields=["mixed"])])
+			self.assertEqual([0, 1, 0, 3], stored_collection_columns.get_values_column(field="index").tolist())
+			self.assertEqual([1, 1, 0, 1], stored_collection_columns.get_is_valid_column(field="index").tolist())
+
+			self.assertEqual(4, stored_collection_columns.get_sum(field="index"))
+			self.assertEqual(-1.0, stored_collection_columns.get_sum(field="score"))
+			self.assertEqual(-4.5, stored_collection_columns.get_minimum(field="score"))
+			self.assertEqual(2.0, stored_collection_columns.get_maximum(field="score"))
+			self.assertEqual(2, stored_collection_columns.get_sum(field="is_active"))
+			self.assertEqual(3, stored_collection_columns.get_valid_count(field="score"))
+			with self.assertRaises(StoredCollectionException):
+				stored_collection_columns.get_sum(field="name")
+			with self.assertRaises(StoredCollectionException):
+				stored_collection_columns.get_sum(field="missing")
+
+			stored_collection_columns.dispose()
+
+			stored_collection_columns = stored_collection.export_columns(
+				directory_path=os.path.join(directory.name, "projected_columns"),
+				fields=["score", "missing"]
+			)
+
+			self.assertEqual(["score", "missing"], stored_collection_columns.get_fields())
+			self.assertEqual(0, stored_collection_columns.get_valid_count(field="missing"))
+			self.assertEqual([(1.5, None), (2.0, None), (-4.5, None)], list(stored_collection_columns.scan(fields=["score", "missing"])))
+
+			stored_collection_columns.dispose()
+			stored_collection.dispose()
+
+		finally:
+			directory.cleanup()
+
+	def test_import(self):
+
+		directory = tempfile.TemporaryDirectory()
+
+		try:
+			stored_collection = StoredCollection(
+				directory_path=os.path.join(directory.name, "collection")
+			)
+
+			json_dicts = [{"index": index, "name": f"name {index}", "values": [index]} for index in range(10)]
+			stored_collection.append_many(
+				json_dicts=json_dicts
+			)
+			stored_collection.export_columns(
+				directory_path=os.path.join(directory.name, "columns")
+			).dispose()
+			stored_collection.dispose()
+
+			stored_collection_columns = StoredCollectionColumns(
+				directory_path=os.path.join(directory.name, "columns")
+			)
+			stored_collection = StoredCollection(
+				directory_path=os.path.join(directory.name, "imported_collection"),
+				storage_type=StoredCollectionStorageTypeEnum.Segment
+			)
+
+			stored_collection.import_columns(
+				stored_collection_columns=stored_collection_columns,
+				chunk_records_total=3
+			)
+
+			self.assertEqual(json_dicts, stored_collection[:])
+
+			stored_collection_columns.dispose()
+			stored_collection.dispose()
+
+		finally:
+			directory.cleanup()
+
+	def test_round_trip_non_uniform_records(self):
+
+		directory = tempfile.TemporaryDirectory()
+
+		try:
+			stored_collection = StoredCollection(
+				directory_path=os.path.join(directory.name, "collection"),
+				storage_type=StoredCollectionStorageTypeEnum.Segment
+			)
+
+			json_dicts = [
+				{"number": 1, "flag": True, "name": "first", "always_null": None},
+				{"number": 2.5, "flag": 1, "name": None},
+				{},
+				{"number": None, "nested": {"values": [1, None]}, "large": 2**70},
+				{"number": 3, "flag": None, "always_null": None},
+				{"number": 4.0, "name": "deleted"},
+				{"number": -5, "name": ""},
+				{"name": "deleted at the end"}
+			]
+			stored_collection.append_many(
+				json_dicts=json_dicts
+			)
+			for index in [2, 5, 7]:
+				stored_collection.delete(
+					index=index
+				)
+				json_dicts[index] = None
+
+			stored_collection_columns = stored_collection.export_columns(
+				directory_path=os.path.join(directory.name, "columns")
+			)
+
+			self.assertEqual(8, stored_collection_columns.count())
+			self.assertEqual(StoredCollectionColumnTypeEnum.Json, stored_collection_columns.get_column_type(field="number"))
+			self.assertEqual(StoredCollectionColumnTypeEnum.Json, stored_collection_columns.get_column_type(field="flag"))
+			self.assertEqual(StoredCollectionColumnTypeEnum.String, stored_collection_columns.get_column_type(field="name"))
+			self.assertEqual([0, 1, 0, 0, 0, 0, 0, 0], stored_collection_columns.get_is_null_column(field="name").tolist())
+			self.assertEqual([1, 0, 0, 0, 1, 0, 0, 0], stored_collection_columns.get_is_null_column(field="always_null").tolist())
+			self.assertEqual([json_dict for json_dict in json_dicts if json_dict is not None], list(stored_collection_columns))
+			self.assertEqual(json_dicts, list(stored_collection_columns.iterate(is_deleted_included=True)))
+
+			stored_collection.dispose()
+
+			stored_collection = StoredCollection(
+				directory_path=os.path.join(directory.name, "imported_collection")
+			)
+
+			stored_collection.import_columns(
+				stored_collection_columns=stored_collection_columns,
+				chunk_records_total=3
+			)
+
+			self.assertEqual(8, stored_collection.count())
+			self.assertEqual(3, stored_collection.deleted_count())
+			for index, json_dict in enumerate(json_dicts):
+				self.assertEqual(json_dict, stored_collection[index])
+			self.assertEqual([int, float, int, int], [type(json_dict["number"]) for json_dict in stored_collection[:] if json_dict is not None and json_dict.get("number", None) is not None])
+			self.assertEqual([bool, int], [type(json_dict["flag"]) for json_dict in stored_collection[:] if json_dict is not None and json_dict.get("flag", None) is not None])
+
+			stored_collection_columns.dispose()
+			stored_collection.dispose()
+
+		finally:
+			directory.cleanup()
+
+	def test_timing_aggregation(self):
+
+		directory = tempfile.TemporaryDirectory()
+
+		try:
+			stored_collection = StoredCollection(
+				directory_path=os.path.join(directory.name, "collection"),
+				storage_type=StoredCollectionStorageTypeEnum.Segment
+			)
+
+			stored_collection.append_many(
+				json_dicts=[{"index": index, "score": index / 2, "name": f"name {index}", "text": "text " * 20} for index in range(50000)]
+			)
+
+			start_time = time.perf_counter()
+			stored_collection_columns = stored_collection.export_columns(
+				directory_path=os.path.join(directory.name, "columns")
+			)
+			print(f"export: {time.perf_counter() - start_time} seconds")
+
+			start_time = time.perf_counter()
+			json_sum = sum(json_dict["score"] for json_dict in stored_collection[:])
+			json_seconds = time.perf_counter() - start_time
+
+			start_time = time.perf_counter()
+			column_sum = stored_collection_columns.get_sum(field="score")
+			column_seconds = time.perf_counter() - start_time
+
+			self.assertEqual(json_sum, column_sum)
+			print(f"sum from records: {json_seconds} seconds, sum from column: {column_seconds} seconds")
+
+			start_time = time.perf_counter()
+			for _ in stored_collection_columns.scan(fields=["index", "score"]):
+				pass
+			print(f"projected scan: {time.perf_counter() - start_time} seconds")
+
+			stored_collection_columns.dispose()
+			stored_collection.dispose()
+
+		finally:
+			directory.cleanup()
@@ -0,0 +1,1474 @@
+from __future__ import annotations
+import unittest
+import os
+import time
+import json
+import tempfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from typing import List, Dict, Tuple
+from src.austin_heller_repo.common import StoredCollection, StoredCollectionStorageTypeEnum, StoredCollectionException, ExecutorTypeEnum, StoredCollectionCodecTypeEnum, get_stored_collection_codec, get_fastest_stored_collection_codec_type, StoredCollectionCompressionTypeEnum
+
+
+def process_odd_index(json_dict: Dict) -> Dict:
+	if json_dict["index"] % 2 == 0:
+		return None
+	json_dict["squared"] = json_dict["index"] ** 2
+	return json_dict
+
+
+def process_slowly(json_dict: Dict) -> Dict:
+	total = 0
+	for value in range(20000):
+		total += value * json_dict["index"]
+	json_dict["total"] = total
+	return json_dict
+
+
+class StoredCollectionTest(unittest.TestCase):
+
+	def test_initialize(self):
+
+		for storage_type in StoredCollectionStorageTypeEnum:
+
+			directory = tempfile.TemporaryDirectory()
+
+			try:
+				stored_collection = StoredCollection(
+					directory_path=directory.name,
+					storage_type=storage_type
+				)
+
+				self.assertEqual(0, stored_collection.count())
+				self.assertIsNone(stored_collection.get())
+
+				stored_collection.dispose()
+
+			finally:
+				directory.cleanup()
+
+	def test_append_and_get(self):
+
+		for storage_type in StoredCollectionStorageTypeEnum:
+
+			directory = tempfile.TemporaryDirectory()
+
+			try:
+				stored_collection = StoredCollection(
+					directory_path=directory.name,
+					storage_type=storage_type
+				)
+
+				expected_json_dicts = [{"index": index, "name": f"name {index}"} for index in range(10)]
+				for json_dict in expected_json_dicts:
+					stored_collection.append(
+						json_dict=json_dict
+					)
+
+				self.assertEqual(10, stored_collection.count())
+
+				stored_collection.reset()
+				actual_json_dicts = []  # type: List[Dict]
+				json_dict = stored_collection.get()
+				while json_dict is not None:
+					actual_json_dicts.append(json_dict)
+					json_dict = stored_collection.get()
+
+				self.assertEqual(expected_json_dicts, actual_json_dicts)
+
+				stored_collection.dispose()
+
+			finally:
+				directory.cleanup()
+
+	def test_try_process(self):
+
+		for storage_type in StoredCollectionStorageTypeEnum:
+
+			directory = tempfile.TemporaryDirectory()
+
+			try:
+				stored_collection = StoredCollection(
+					directory_path=directory.name,
+					storage_type=storage_type
+				)
+
+				for index in range(5):
+					stored_collection.append(
+						json_dict={"index": index}
+					)
+
+				def process_method(json_dict: Dict) -> Dict:
+					if json_dict["index"] % 2 == 0:
+						return None
+					json_dict["is_processed"] = True
+					return json_dict
+
+				stored_collection.reset()
+				processed_total = 0
+				while stored_collection.try_process(process_method):
+					processed_total += 1
+
+				self.assertEqual(5, processed_total)
+
+				stored_collection.reset()
+				actual_json_dicts = [stored_collection.get() for _ in range(5)]
+
+				self.assertEqual([{"index": 0}, {"index": 1, "is_processed": True}, {"index": 2}, {"index": 3, "is_processed": True}, {"index": 4}], actual_json_dicts)
+				self.assertIsNone(stored_collection.get())
+
+				stored_collection.dispose()
+
+			finally:
+				directory.cleanup()
+
+	def test_segment_rollover(self):
+
+		directory = tempfile.TemporaryDirectory()
+
+		try:
+			stored_collection = StoredCollection(
+				directory_path=directory.name,
+				storage_type=StoredCollectionStorageTypeEnum.Segment,
+				maximum_segment_bytes_length=100
+			)
+
+			for index in range(20):
+				stored_collection.append(
+					json_dict={"index": index}
+				)
+
+			self.assertLess(1, len(os.listdir(os.path.join(directory.name, "segments"))))
+
+			stored_collection.reset()
+			self.assertEqual([{"index": index} for index in range(20)], [stored_collection.get() for _ in range(20)])
+
+			stored_collection.dispose()
+
+		finally:
+			directory.cleanup()
+
+	def test_storage_type_mismatch(self):
+
+		directory = tempfile.TemporaryDirectory()
+
+		try:
+			stored_collection = StoredCollection(
+				directory_path=directory.name,
+				storage_type=StoredCollectionStorageTypeEnum.Segment
+			)
+			stored_collection.dispose()
+
+			with self.assertRaises(StoredCollectionException):
+				StoredCollection(
+					directory_path=directory.name,
+					storage_type=StoredCollectionStorageTypeEnum.File
+				)
+
+		finally:
+			directory.cleanup()
+
+	def test_random_access(self):
+
+		for storage_type in StoredCollectionStorageTypeEnum:
+
+			directory = tempfile.TemporaryDirectory()
+
+			try:
+				stored_collection = StoredCollection(
+					directory_path=directory.name,
+					storage_type=storage_type
+				)
+
+				for index in range(10):
+					stored_collection.append(
+						json_dict={"index": index}
+					)
+
+				self.assertEqual(10, len(stored_collection))
+				self.assertEqual({"index": 3}, stored_collection[3])
+				self.assertEqual({"index": 9}, stored_collection[-1])
+				self.assertEqual([{"index": 2}, {"index": 4}, {"index": 6}], stored_collection[2:8:2])
+				self.assertEqual([], stored_collection[20:])
+
+				with self.assertRaises(IndexError):
+					stored_collection[10]
+
+				stored_collection.append(
+					json_dict={"index": 10}
+				)
+
+				self.assertEqual({"index": 10}, stored_collection[10])
+
+				stored_collection.dispose()
+
+			finally:
+				directory.cleanup()
+
+	def test_reopen(self):
+
+		for storage_type in StoredCollectionStorageTypeEnum:
+
+			directory = tempfile.TemporaryDirectory()
+
+			try:
+				stored_collection = StoredCollection(
+					directory_path=directory.name,
+					storage_type=storage_type
+				)
+
+				for index in range(5):
+					stored_collection.append(
+						json_dict={"index": index}
+					)
+
+				stored_collection.reset()
+				stored_collection.try_process(lambda json_dict: {"index": json_dict["index"], "is_processed": True})
+
+				stored_collection.dispose()
+
+				stored_collection = StoredCollection(
+					directory_path=directory.name
+				)
+
+				self.assertEqual(5, stored_collection.count())
+				self.assertIsNone(stored_collection.get())
+
+				stored_collection.append(
+					json_dict={"index": 5}
+				)
+
+				stored_collection.reset()
+				self.assertEqual([{"index": 0, "is_processed": True}] + [{"index": index} for index in range(1, 6)], [stored_collection.get() for _ in range(6)])
+
+				stored_collection.dispose()
+
+			finally:
+				directory.cleanup()
+
+	def test_append_many(self):
+
+		for storage_type in StoredCollectionStorageTypeEnum:
+
+			directory = tempfile.TemporaryDirectory()
+
+			try:
+				stored_collection = StoredCollection(
+					directory_path=directory.name,
+					storage_type=storage_type,
+					maximum_segment_bytes_length=100
+				)
+
+				stored_collection.append_many(
+					json_dicts=[{"index": index} for index in range(20)]
+				)
+				stored_collection.append_many(
+					json_dicts=[]
+				)
+				stored_collection.append(
+					json_dict={"index": 20}
+				)
+
+				self.assertEqual(21, stored_collection.count())
+				self.assertEqual([{"index": index} for index in range(21)], stored_collection[:])
+
+				stored_collection.dispose()
+
+			finally:
+				directory.cleanup()
+
+	def test_commit_policies(self):
+
+		for storage_type in StoredCollectionStorageTypeEnum:
+			for commit_records_total, commit_milliseconds in [(None, None), (3, None), (None, 0), (None, 60000)]:
+
+				directory = tempfile.TemporaryDirectory()
+
+				try:
+					stored_collection = StoredCollection(
+						directory_path=directory.name,
+						storage_type=storage_type,
+						commit_records_total=commit_records_total,
+						commit_milliseconds=commit_milliseconds
+					)
+
+					for index in range(10):
+						stored_collection.append(
+							json_dict={"index": index}
+						)
+					stored_collection.commit()
+
+					# a second opening reads what was committed without the first opening being disposed
+					other_stored_collection = StoredCollection(
+						directory_path=directory.name
+					)
+
+					self.assertEqual([{"index": index} for index in range(10)], other_stored_collection[:])
+
+					other_stored_collection.dispose()
+					stored_collection.dispose()
+
+				finally:
+					directory.cleanup()
+
+	def test_commit_synchronizes_records_written_before_checkpoints(self):
+
+		directory = tempfile.TemporaryDirectory()
+
+		try:
+			stored_collection = StoredCollection(
+				directory_path=directory.name,
+				storage_type=StoredCollectionStorageTypeEnum.File,
+				checkpoint_records_total=2
+			)
+
+			synchronized_inodes = set()
+			fsync = os.fsync
+			def record_fsync(file_descriptor: int):
+				synchronized_inodes.add(os.fstat(file_descriptor).st_ino)
+				fsync(file_descriptor)
+
+			with mock.patch("os.fsync", record_fsync):
+				for index in range(3):
+					stored_collection.append(
+						json_dict={"index": index}
+					)
+				# the checkpoints taken while appending are not durable, so the records written before them must still be synchronized by the commit
+				self.assertEqual(set(), synchronized_inodes)
+				stored_collection.commit()
+
+			record_inodes = set()
+			for root_path, _, file_names in os.walk(directory.name):
+				for file_name in file_names:
+					if file_name.endswith(".ser"):
+						record_inodes.add(os.stat(os.path.join(root_path, file_name)).st_ino)
+
+			self.assertEqual(3, len(record_inodes))
+			self.assertEqual(set(), record_inodes - synchronized_inodes)
+
+			stored_collection.dispose()
+
+		finally:
+			directory.cleanup()
+
+	def test_process_all(self):
+
+		for storage_type in StoredCollectionStorageTypeEnum:
+			for workers_total, executor_type in [(1, ExecutorTypeEnum.Thread), (3, ExecutorTypeEnum.Thread), (2, ExecutorTypeEnum.Process), (2, "thread")]:
+
+				directory = tempfile.TemporaryDirectory()
+
+				try:
+					stored_collection = StoredCollection(
+						directory_path=directory.name,
+						storage_type=storage_type
+					)
+
+					stored_collection.append_many(
+						json_dicts=[{"index": index} for index in range(95)]
+					)
+
+					progress = []  # type: List[Tuple[int, int]]
+					def on_progress_callback(processed_total: int, records_total: int):
+						progress.append((processed_total, records_total))
+
+					processed_total = stored_collection.process_all(
+						process_odd_index,
+						workers_total=workers_total,
+						executor_type=executor_type,
+						chunk_records_total=10,
+						on_progress_callback=on_progress_callback
+					)
+
+					self.assertEqual(95, processed_total)
+					self.assertEqual([(processed_total, 95) for processed_total in list(range(10, 95, 10)) + [95]], progress)
+					self.assertEqual([{"index": index} if index % 2 == 0 else {"index": index, "squared": index ** 2} for index in range(95)], stored_collection[:])
+
+					with self.assertRaises(StoredCollectionException):
+						stored_collection.process_all(
+							process_odd_index,
+							executor_type="fiber"
+						)
+
+					stored_collection.dispose()
+
+				finally:
+					directory.cleanup()
+
+	def test_codecs(self):
+
+		for codec_type in StoredCollectionCodecTypeEnum:
+
+			try:
+				get_stored_collection_codec(
+					codec_type=codec_type
+				)
+			except StoredCollectionException:
+				continue
+
+			directory = tempfile.TemporaryDirectory()
+
+			try:
+				stored_collection = StoredCollection(
+					directory_path=directory.name,
+					storage_type=StoredCollectionStorageTypeEnum.Segment,
+					codec_type=codec_type
+				)
+
+				expected_json_dicts = [{"index": index, "name": f"name {index}", "values": [1.5, None, True, "text"], "child": {"key": "value"}} for index in range(10)]
+				stored_collection.append_many(
+					json_dicts=expected_json_dicts
+				)
+				stored_collection.dispose()
+
+				stored_collection = StoredCollection(
+					directory_path=directory.name
+				)
+
+				self.assertEqual(expected_json_dicts, stored_collection[:])
+
+				stored_collection.dispose()
+
+				with self.assertRaises(StoredCollectionException):
+					StoredCollection(
+						directory_path=directory.name,
+						codec_type=StoredCollectionCodecTypeEnum.Pickle if codec_type != StoredCollectionCodecTypeEnum.Pickle else StoredCollectionCodecTypeEnum.Json
+					)
+
+			finally:
+				directory.cleanup()
+
+	def test_fastest_codec(self):
+
+		codec_type = get_fastest_stored_collection_codec_type()
+
+		self.assertIsNotNone(get_stored_collection_codec(
+			codec_type=codec_type
+		))
+
+	def test_compression(self):
+
+		for storage_type, compression_block_bytes_length in [(StoredCollectionStorageTypeEnum.File, None), (StoredCollectionStorageTypeEnum.Segment, None), (StoredCollectionStorageTypeEnum.Segment, 200)]:
+			for compression_type in StoredCollectionCompressionTypeEnum:
+
+				directory = tempfile.TemporaryDirectory()
+
+				try:
+					stored_collection = StoredCollection(
+						directory_path=directory.name,
+						storage_type=storage_type,
+						compression_type=compression_type,
+						compression_level=1,
+						compression_block_bytes_length=compression_block_bytes_length,
+						compression_cached_blocks_total=2
+					)
+
+					expected_json_dicts = [{"index": index, "text": "repeated text " * 5} for index in range(30)]
+					stored_collection.append_many(
+						json_dicts=expected_json_dicts[:20]
+					)
+
+					self.assertEqual(expected_json_dicts[:20], stored_collection[:])
+
+					stored_collection.append_many(
+						json_dicts=expected_json_dicts[20:]
+					)
+					stored_collection.reset()
+					stored_collection.try_process(lambda json_dict: {"index": json_dict["index"], "is_processed": True})
+					expected_json_dicts[0] = {"index": 0, "is_processed": True}
+
+					self.assertEqual(expected_json_dicts, stored_collection[:])
+
+					stored_collection.dispose()
+
+					stored_collection = StoredCollection(
+						directory_path=directory.name
+					)
+
+					self.assertEqual(expected_json_dicts, stored_collection[:])
+					self.assertEqual(list(reversed(expected_json_dicts)), stored_collection[::-1])
+
+					stored_collection.dispose()
+
+					with self.assertRaises(StoredCollectionException):
+						StoredCollection(
+							directory_path=directory.name,
+							compression_type=StoredCollectionCompressionTypeEnum.Zlib if compression_type != StoredCollectionCompressionTypeEnum.Zlib else StoredCollectionCompressionTypeEnum.Bz2
+						)
+					with self.assertRaises(StoredCollectionException):
+						StoredCollection(
+							directory_path=directory.name,
+							compression_level=2
+						)
+
+					stored_collection = StoredCollection(
+						directory_path=directory.name,
+						compression_type=compression_type,
+						compression_level=1
+					)
+
+					self.assertEqual(expected_json_dicts, stored_collection[:])
+
+					stored_collection.dispose()
+
+				finally:
+					directory.cleanup()
+
+	def test_compression_level_requires_compression_type(self):
+
+		directory = tempfile.TemporaryDirectory()
+
+		try:
+			with self.assertRaises(StoredCollectionException):
+				StoredCollection(
+					directory_path=directory.name,
+					compression_level=1
+				)
+
+		finally:
+			directory.cleanup()
+
+	def test_compression_reads_while_appending(self):
+
+		for compression_block_bytes_length in [None, 50]:
+
+			directory = tempfile.TemporaryDirectory()
+
+			try:
+				stored_collection = StoredCollection(
+					directory_path=directory.name,
+					storage_type=StoredCollectionStorageTypeEnum.Segment,
+					compression_type=StoredCollectionCompressionTypeEnum.Zlib,
+					compression_block_bytes_length=compression_block_bytes_length,
+					maximum_segment_bytes_length=200
+				)
+
+				# each read maps the active segment again after it has grown, which requires the previous read to have released its view
+				for index in range(30):
+					stored_collection.append(
+						json_dict={"index": index}
+					)
+					stored_collection.commit()
+					self.assertEqual({"index": index}, stored_collection[index])
+					self.assertEqual({"index": 0}, stored_collection[0])
+
+				stored_collection.dispose()
+
+			finally:
+				directory.cleanup()
+
+	def test_compression_block_requires_segment(self):
+
+		directory = tempfile.TemporaryDirectory()
+
+		try:
+			with self.assertRaises(StoredCollectionException):
+				StoredCollection(
+					directory_path=directory.name,
+					storage_type=StoredCollectionStorageTypeEnum.File,
+					compression_type=StoredCollectionCompressionTypeEnum.Zlib,
+					compression_block_bytes_length=1000
+				)
+
+		finally:
+			directory.cleanup()
+
+	def test_secondary_index(self):
+
+		for storage_type in StoredCollectionStorageTypeEnum:
+
+			directory = tempfile.TemporaryDirectory()
+
+			try:
+				stored_collection = StoredCollection(
+					directory_path=directory.name,
+					storage_type=storage_type
+				)
+
+				stored_collection.append_many(
+					json_dicts=[{"index": index, "user": {"id": index % 3}} for index in range(6)]
+				)
+
+				with self.assertRaises(StoredCollectionException):
+					stored_collection.find(
+						path=("user", "id"),
+						value=1
+					)
+
+				stored_collection.add_secondary_index(
+					path=("user", "id")
+				)
+				stored_collection.append_many(
+					json_dicts=[{"index": 6, "user": {"id": 1}}, {"index": 7}, {"index": 8, "user": {"id": "1"}}, {"index": 9, "user": {"id": True}}]
+				)
+
+				self.assertEqual([1, 4, 6], stored_collection.find_indexes(path=("user", "id"), value=1))
+				self.assertEqual([{"index": 8, "user": {"id": "1"}}], stored_collection.find(path=("user", "id"), value="1"))
+				self.assertEqual([9], stored_collection.find_indexes(path=("user", "id"), value=True))
+				self.assertEqual([], stored_collection.find_indexes(path=("user", "id"), value=5))
+
+				def process_method(json_dict: Dict) -> Dict:
+					if json_dict["index"] == 1:
+						json_dict["user"]["id"] = 2
+						return json_dict
+					if json_dict["index"] == 4:
+						del json_dict["user"]
+						return json_dict
+					return None
+
+				stored_collection.reset()
+				while stored_collection.try_process(process_method):
+					pass
+
+				self.assertEqual([6], stored_collection.find_indexes(path=("user", "id"), value=1))
+				self.assertEqual([1, 2, 5], stored_collection.find_indexes(path=("user", "id"), value=2))
+				self.assertEqual([0, 3, 6, 1, 2, 5], stored_collection.find_range_indexes(path=["user", "id"], minimum_value=0, maximum_value=2))
+				self.assertEqual([6, 1, 2, 5], stored_collection.find_range_indexes(path=("user", "id"), minimum_value=0.5))
+				self.assertEqual([0, 3], stored_collection.find_range_indexes(path=("user", "id"), maximum_value=0))
+
+				stored_collection.dispose()
+
+				stored_collection = StoredCollection(
+					directory_path=directory.name
+				)
+
+				self.assertEqual([1, 2, 5], stored_collection.find_indexes(path=("user", "id"), value=2))
+				self.assertEqual([8], stored_collection.find_indexes(path=("user", "id"), value="1"))
+
+				stored_collection.append(
+					json_dict={"index": 10, "user": {"id": 2}}
+				)
+
+				self.assertEqual([1, 2, 5, 10], stored_collection.find_indexes(path=("user", "id"), value=2))
+
+				stored_collection.dispose()
+
+			finally:
+				directory.cleanup()
+
+	def test_secondary_index_not_a_number(self):
+
+		directory = tempfile.TemporaryDirectory()
+
+		try:
+			stored_collection = StoredCollection(
+				directory_path=directory.name
+			)
+
+			stored_collection.add_secondary_index(
+				path=("score",)
+			)
+			stored_collection.append_many(
+				json_dicts=[{"score": float("nan")}, {"score": 1.5}, {"score": float("inf")}, {"score": float("nan")}, {"score": -1}]
+			)
+
+			# a record whose value becomes or stops being NaN moves between keys like any other record
+			def process_method(json_dict: Dict) -> Dict:
+				if json_dict["score"] == 1.5:
+					json_dict["score"] = float("nan")
+					return json_dict
+				if json_dict["score"] != json_dict["score"]:
+					json_dict["score"] = 2
+					return json_dict
+				return None
+
+			self.assertEqual([0, 3], stored_collection.find_indexes(path=("score",), value=float("nan")))
+			self.assertEqual([4, 1, 2], stored_collection.find_range_indexes(path=("score",), minimum_value=-10))
+			self.assertEqual([1, 2], stored_collection.find_range_indexes(path=("score",), minimum_value=0, maximum_value=float("inf")))
+
+			stored_collection.reset()
+			self.assertTrue(stored_collection.try_process(process_method))
+			self.assertTrue(stored_collection.try_process(process_method))
+
+			self.assertEqual([1, 3], stored_collection.find_indexes(path=("score",), value=float("nan")))
+			self.assertEqual([4, 0, 2], stored_collection.find_range_indexes(path=("score",), minimum_value=-10))
+
+			stored_collection.dispose()
+
+			stored_collection = StoredCollection(
+				directory_path=directory.name
+			)
+
+			self.assertEqual([1, 3], stored_collection.find_indexes(path=("score",), value=float("nan")))
+			self.assertEqual([0], stored_collection.find_indexes(path=("score",), value=2))
+
+			stored_collection.dispose()
+
+		finally:
+			directory.cleanup()
+
+	def test_recovery_truncates_unwritten_records(self):
+
+		for storage_type in StoredCollectionStorageTypeEnum:
+			for compression_type in [None, StoredCollectionCompressionTypeEnum.Zlib]:
+				if compression_type is not None and storage_type != StoredCollectionStorageTypeEnum.Segment:
+					continue
+
+				directory = tempfile.TemporaryDirectory()
+
+				try:
+					stored_collection = StoredCollection(
+						directory_path=directory.name,
+						storage_type=storage_type,
+						compression_type=compression_type,
+						compression_block_bytes_length=None if compression_type is None else 64
+					)
+
+					stored_collection.append_many(
+						json_dicts=[{"index": index} for index in range(10)]
+					)
+
+					stored_collection.dispose()
+
+					index_file_path = os.path.join(directory.name, ".index")
+					with open(index_file_path, "rb") as file_handle:
+						index_bytes = file_handle.read()
+					index_entry_length = len(index_bytes) // 10
+
+					# a failure after the checkpoint leaves an index entry for a record that was never written and a partially written entry
+					with open(os.path.join(directory.name, ".checkpoint"), "w") as file_handle:
+						json.dump({"count": 8}, file_handle)
+					with open(index_file_path, "ab") as file_handle:
+						file_handle.write(b"\xfe" * index_entry_length)
+						file_handle.write(b"\x01" * (index_entry_length // 2))
+
+					stored_collection = StoredCollection(
+						directory_path=directory.name
+					)
+
+					self.assertEqual(10, stored_collection.count())
+					self.assertEqual([{"index": index} for index in range(10)], stored_collection[:])
+
+					stored_collection.append(
+						json_dict={"index": 10}
+					)
+
+					self.assertEqual({"index": 10}, stored_collection[10])
+
+					stored_collection.dispose()
+
+					self.assertEqual(11 * index_entry_length, os.path.getsize(index_file_path))
+					with open(os.path.join(directory.name, ".checkpoint"), "r") as file_handle:
+						self.assertEqual(11, json.load(file_handle)["count"])
+
+				finally:
+					directory.cleanup()
+
+	def test_recovery_replays_log(self):
+
+		for storage_type in StoredCollectionStorageTypeEnum:
+
+			directory = tempfile.TemporaryDirectory()
+
+			try:
+				stored_collection = StoredCollection(
+					directory_path=directory.name,
+					storage_type=storage_type
+				)
+
+				stored_collection.add_secondary_index(
+					path=("index",)
+				)
+				stored_collection.append_many(
+					json_dicts=[{"index": index} for index in range(3)]
+				)
+
+				stored_collection.dispose()
+
+				with open(os.path.join(directory.name, ".index"), "rb") as file_handle:
+					index_bytes = file_handle.read()
+				index_entry_length = len(index_bytes) // 3
+
+				# the log replaces the first entry with the last, then has an entry with a bad checksum and a partially written entry
+				log_entry_bytes = StoredCollection.log_entry_index_struct.pack(0) + index_bytes[2 * index_entry_length:]
+				bad_log_entry_bytes = StoredCollection.log_entry_index_struct.pack(1) + index_bytes[2 * index_entry_length:]
+				with open(os.path.join(directory.name, ".wal"), "wb") as file_handle:
+					file_handle.write(StoredCollection.log_entry_header_struct.pack(len(log_entry_bytes), zlib.crc32(log_entry_bytes)) + log_entry_bytes)
+					file_handle.write(StoredCollection.log_entry_header_struct.pack(len(bad_log_entry_bytes), zlib.crc32(bad_log_entry_bytes) ^ 1) + bad_log_entry_bytes)
+					file_handle.write(StoredCollection.log_entry_header_struct.pack(len(log_entry_bytes), 0)[:5])
+
+				stored_collection = StoredCollection(
+					directory_path=directory.name
+				)
+
+				self.assertEqual([{"index": 2}, {"index": 1}, {"index": 2}], stored_collection[:])
+				self.assertEqual(0, os.path.getsize(os.path.join(directory.name, ".wal")))
+
+				stored_collection.reset()
+				while stored_collection.try_process(lambda json_dict: {"index": 1, "is_processed": True} if json_dict["index"] == 1 else None):
+					pass
+
+				self.assertEqual([1], stored_collection.find_indexes(path=("index",), value=1))
+
+				stored_collection.dispose()
+
+				stored_collection = StoredCollection(
+					directory_path=directory.name
+				)
+
+				self.assertEqual([{"index": 2}, {"index": 1, "is_processed": True}, {"index": 2}], stored_collection[:])
+
+				stored_collection.dispose()
+
+			finally:
+				directory.cleanup()
+
+	def test_recovery_removes_lost_secondary_index_entries(self):
+
+		directory = tempfile.TemporaryDirectory()
+
+		try:
+			stored_collection = StoredCollection(
+				directory_path=directory.name,
+				storage_type=StoredCollectionStorageTypeEnum.Segment
+			)
+
+			stored_collection.add_secondary_index(
+				path=("user",)
+			)
+			stored_collection.append_many(
+				json_dicts=[{"user": index} for index in range(4)]
+			)
+
+			stored_collection.dispose()
+
+			# the last two records are lost, but their secondary index entries were written
+			index_file_path = os.path.join(directory.name, ".index")
+			with open(index_file_path, "r+b") as file_handle:
+				file_handle.truncate(os.path.getsize(index_file_path) // 2)
+			with open(os.path.join(directory.name, ".checkpoint"), "w") as file_handle:
+				json.dump({"count": 2}, file_handle)
+
+			stored_collection = StoredCollection(
+				directory_path=directory.name
+			)
+
+			self.assertEqual(2, stored_collection.count())
+			self.assertEqual([], stored_collection.find_indexes(path=("user",), value=3))
+
+			stored_collection.append(
+				json_dict={"user": 0}
+			)
+
+			stored_collection.dispose()
+
+			stored_collection = StoredCollection(
+				directory_path=directory.name
+			)
+
+			self.assertEqual([0, 2], stored_collection.find_indexes(path=("user",), value=0))
+			self.assertEqual([], stored_collection.find_indexes(path=("user",), value=2))
+
+			stored_collection.dispose()
+
+		finally:
+			directory.cleanup()
+
+	def test_reader(self):
+
+		for storage_type in StoredCollectionStorageTypeEnum:
+			for compression_type in [None, StoredCollectionCompressionTypeEnum.Zlib]:
+				if compression_type is not None and storage_type != StoredCollectionStorageTypeEnum.Segment:
+					continue
+
+				directory = tempfile.TemporaryDirectory()
+
+				try:
+					stored_collection = StoredCollection(
+						directory_path=directory.name,
+						storage_type=storage_type,
+						compression_type=compression_type,
+						compression_block_bytes_length=None if compression_type is None else 64
+					)
+
+					stored_collection.append_many(
+						json_dicts=[{"index": index} for index in range(5)]
+					)
+
+					first_reader = stored_collection.reader()
+
+					stored_collection.reset()
+					stored_collection.try_process(lambda json_dict: {"index": json_dict["index"], "is_processed": True})
+					stored_collection.append(
+						json_dict={"index": 5}
+					)
+
+					second_reader = stored_collection.reader()
+
+					stored_collection.commit()
+					stored_collection.reset()
+					stored_collection.get()
+					stored_collection.try_process(lambda json_dict: {"index": json_dict["index"], "is_processed": True})
+
+					self.assertEqual(5, first_reader.count())
+					self.assertEqual({"index": 0}, first_reader.get())
+					self.assertEqual({"index": 1}, first_reader.get())
+					self.assertEqual({"index": 4}, first_reader[-1])
+					with self.assertRaises(IndexError):
+						first_reader[5]
+
+					self.assertEqual(6, len(second_reader))
+					self.assertEqual([{"index": 0, "is_processed": True}, {"index": 1}, {"index": 2}, {"index": 3}, {"index": 4}, {"index": 5}], list(second_reader))
+
+					second_reader.dispose()
+
+					first_reader.reset()
+					self.assertEqual([{"index": index} for index in range(5)], [first_reader.get() for _ in range(5)])
+					self.assertIsNone(first_reader.get())
+
+					first_reader.dispose()
+
+					self.assertEqual([{"index": 0, "is_processed": True}, {"index": 1, "is_processed": True}, {"index": 2}, {"index": 3}, {"index": 4}, {"index": 5}], stored_collection[:])
+
+					stored_collection.dispose()
+
+				finally:
+					directory.cleanup()
+
+	def test_reader_while_writing(self):
+
+		for storage_type in StoredCollectionStorageTypeEnum:
+
+			directory = tempfile.TemporaryDirectory()
+
+			try:
+				stored_collection = StoredCollection(
+					directory_path=directory.name,
+					storage_type=storage_type,
+					maximum_segment_bytes_length=1024
+				)
+
+				stored_collection.append_many(
+					json_dicts=[{"index": index} for index in range(200)]
+				)
+
+				reader = stored_collection.reader()
+
+				def read_all(offset: int) -> List[Dict]:
+					return reader[offset::4]
+
+				with ThreadPoolExecutor(max_workers=4) as executor:
+					futures = [executor.submit(read_all, offset) for offset in range(4)]
+					stored_collection.reset()
+					while stored_collection.try_process(lambda json_dict: {"index": -json_dict["index"]}):
+						stored_collection.append(
+							json_dict={"index": 1000}
+						)
+						if stored_collection.count() == 300:
+							break
+					json_dicts_per_offset = [future.result() for future in futures]
+
+				for offset in range(4):
+					self.assertEqual([{"index": index} for index in range(offset, 200, 4)], json_dicts_per_offset[offset])
+
+				reader.dispose()
+				stored_collection.dispose()
+
+			finally:
+				directory.cleanup()
+
+	def test_delete(self):
+
+		for storage_type in StoredCollectionStorageTypeEnum:
+
+			directory = tempfile.TemporaryDirectory()
+
+			try:
+				stored_collection = StoredCollection(
+					directory_path=directory.name,
+					storage_type=storage_type
+				)
+
+				stored_collection.add_secondary_index(
+					path=("is_even",)
+				)
+				stored_collection.append_many(
+					json_dicts=[{"index": index, "is_even": index % 2 == 0} for index in range(6)]
+				)
+
+				self.assertTrue(stored_collection.delete(index=1))
+				self.assertTrue(stored_collection.delete(index=-2))
+				self.assertFalse(stored_collection.delete(index=4))
+				with self.assertRaises(IndexError):
+					stored_collection.delete(index=6)
+
+				self.assertEqual(6, stored_collection.count())
+				self.assertEqual(2, stored_collection.deleted_count())
+				self.assertIsNone(stored_collection[1])
+				self.assertEqual([0, 2], stored_collection.find_indexes(path=("is_even",), value=True))
+				self.assertEqual([3, 5], stored_collection.find_indexes(path=("is_even",), value=False))
+
+				stored_collection.reset()
+				self.assertEqual([0, 2, 3, 5], [stored_collection.get()["index"] for _ in range(4)])
+				self.assertIsNone(stored_collection.get())
+
+				processed_indexes = []  # type: List[int]
+
+				def process_method(json_dict: Dict) -> Dict:
+					processed_indexes.append(json_dict["index"])
+					return None
+
+				stored_collection.reset()
+				while stored_collection.try_process(process_method):
+					pass
+				stored_collection.process_all(process_method)
+
+				self.assertEqual([0, 2, 3, 5, 0, 2, 3, 5], processed_indexes)
+
+				reader = stored_collection.reader()
+				stored_collection.delete(
+					index=0
+				)
+
+				self.assertEqual([{"index": index, "is_even": index % 2 == 0} for index in [0, 2, 3, 5]], list(reader))
+
+				reader.dispose()
+				stored_collection.dispose()
+
+				stored_collection = StoredCollection(
+					directory_path=directory.name
+				)
+
+				self.assertEqual(3, stored_collection.deleted_count())
+				self.assertEqual([None, None, {"index": 2, "is_even": True}, {"index": 3, "is_even": False}, None, {"index": 5, "is_even": False}], stored_collection[:])
+
+				stored_collection.add_secondary_index(
+					path=("index",)
+				)
+
+				self.assertEqual([2, 3], stored_collection.find_range_indexes(path=("index",), maximum_value=4))
+
+				stored_collection.dispose()
+
+				# the log holding the latest deletion is left behind as if the collection had failed during a checkpoint
+				with open(os.path.join(directory.name, ".wal"), "wb") as file_handle:
+					file_handle.write(b"\x00")
+				with open(os.path.join(directory.name, ".checkpoint"), "r") as file_handle:
+					checkpoint = json.load(file_handle)
+				checkpoint["deleted_records_total"] = 2
+				with open(os.path.join(directory.name, ".checkpoint"), "w") as file_handle:
+					json.dump(checkpoint, file_handle)
+
+				stored_collection = StoredCollection(
+					directory_path=directory.name
+				)
+
+				self.assertEqual(3, stored_collection.deleted_count())
+
+				stored_collection.dispose()
+
+			finally:
+				directory.cleanup()
+
+	def test_compact(self):
+
+		for storage_type in StoredCollectionStorageTypeEnum:
+			for compression_type in [None, StoredCollectionCompressionTypeEnum.Zlib]:
+				if compression_type is not None and storage_type != StoredCollectionStorageTypeEnum.Segment:
+					continue
+
+				directory = tempfile.TemporaryDirectory()
+
+				try:
+					stored_collection = StoredCollection(
+						directory_path=directory.name,
+						storage_type=storage_type,
+						maximum_segment_bytes_length=1024,
+						compression_type=compression_type,
+						compression_block_bytes_length=None if compression_type is None else 256
+					)
+
+					stored_collection.append_many(
+						json_dicts=[{"index": index, "text": "text " * 10} for index in range(40)]
+					)
+					stored_collection.process_all(lambda json_dict: {"index": json_dict["index"]} if json_dict["index"] % 2 == 0 else None)
+					for index in range(1, 40, 2):
+						stored_collection.delete(
+							index=index
+						)
+
+					expected_json_dicts = [{"index": index} if index % 2 == 0 else None for index in range(40)]
+					reader = stored_collection.reader()
+
+					stored_collection_compaction = stored_collection.compact()
+
+					self.assertEqual(40, stored_collection_compaction.get_records_total())
+					self.assertEqual(20, stored_collection_compaction.get_deleted_records_total())
+					self.assertLess(stored_collection_compaction.get_bytes_length(), stored_collection_compaction.get_previous_bytes_length())
+					self.assertGreater(stored_collection_compaction.get_reclaimed_bytes_length(), 0)
+					self.assertGreater(stored_collection_compaction.get_records_per_second(), 0)
+					self.assertEqual(expected_json_dicts, stored_collection[:])
+
+					# the reader still reads the files that the compaction replaced until it is disposed
+					stored_collection.delete(
+						index=0
+					)
+
+					self.assertEqual(expected_json_dicts, reader[:])
+					self.assertTrue(os.path.exists(os.path.join(directory.name, ".index")))
+
+					reader.dispose()
+
+					self.assertFalse(os.path.exists(os.path.join(directory.name, ".index")))
+					self.assertTrue(os.path.exists(os.path.join(directory.name, ".index.1")))
+
+					stored_collection.append(
+						json_dict={"index": 40}
+					)
+					stored_collection.compact()
+					stored_collection.dispose()
+
+					self.assertFalse(os.path.exists(os.path.join(directory.name, ".index.1")))
+
+					stored_collection = StoredCollection(
+						directory_path=directory.name
+					)
+
+					self.assertEqual([None] + expected_json_dicts[1:] + [{"index": 40}], stored_collection[:])
+					self.assertEqual(21, stored_collection.deleted_count())
+
+					stored_collection.dispose()
+
+				finally:
+					directory.cleanup()
+
+	def test_compact_interrupted(self):
+
+		directory = tempfile.TemporaryDirectory()
+
+		try:
+			stored_collection = StoredCollection(
+				directory_path=directory.name,
+				storage_type=StoredCollectionStorageTypeEnum.Segment
+			)
+
+			stored_collection.append_many(
+				json_dicts=[{"index": index} for index in range(5)]
+			)
+
+			stored_collection.dispose()
+
+			# a compaction that failed before its checkpoint leaves files of a generation that is not in use
+			os.mkdir(os.path.join(directory.name, "segments.1"))
+			with open(os.path.join(directory.name, "segments.1", "00000000.seg"), "wb") as file_handle:
+				file_handle.write(b"\x00" * 8)
+			with open(os.path.join(directory.name, ".index.1"), "wb") as file_handle:
+				file_handle.write(b"\x00" * 8)
+
+			stored_collection = StoredCollection(
+				directory_path=directory.name
+			)
+
+			self.assertFalse(os.path.exists(os.path.join(directory.name, "segments.1")))
+			self.assertFalse(os.path.exists(os.path.join(directory.name, ".index.1")))
+			self.assertEqual([{"index": index} for index in range(5)], stored_collection[:])
+
+			stored_collection.compact()
+
+			self.assertEqual([{"index": index} for index in range(5)], stored_collection[:])
+
+			stored_collection.dispose()
+
+		finally:
+			directory.cleanup()
+
+	def test_timing_storage_types(self):
+
+		for storage_type in StoredCollectionStorageTypeEnum:
+
+			directory = tempfile.TemporaryDirectory()
+
+			try:
+				stored_collection = StoredCollection(
+					directory_path=directory.name,
+					storage_type=storage_type
+				)
+
+				records_total = 5000
+				start_time = time.perf_counter()
+				for index in range(records_total):
+					stored_collection.append(
+						json_dict={"index": index, "name": f"name {index}"}
+					)
+				appends_per_second = records_total / (time.perf_counter() - start_time)
+
+				start_time = time.perf_counter()
+				stored_collection.append_many(
+					json_dicts=[{"index": index, "name": f"name {index}"} for index in range(records_total)]
+				)
+				append_many_per_second = records_total / (time.perf_counter() - start_time)
+
+				stored_collection.reset()
+				start_time = time.perf_counter()
+				while stored_collection.get() is not None:
+					pass
+				reads_per_second = stored_collection.count() / (time.perf_counter() - start_time)
+
+				start_time = time.perf_counter()
+				for index in range(stored_collection.count() - 1, -1, -1):
+					stored_collection[index]
+				random_reads_per_second = stored_collection.count() / (time.perf_counter() - start_time)
+
+				print(f"{storage_type.value}: appends per second: {appends_per_second}, append_many per second: {append_many_per_second}, reads per second: {reads_per_second}, random reads per second: {random_reads_per_second}")
+
+				stored_collection.dispose()
+
+			finally:
+				directory.cleanup()
+
+	def test_timing_commit_policies(self):
+
+		for commit_records_total, commit_milliseconds in [(1, None), (100, None), (None, 10)]:
+
+			directory = tempfile.TemporaryDirectory()
+
+			try:
+				stored_collection = StoredCollection(
+					directory_path=directory.name,
+					storage_type=StoredCollectionStorageTypeEnum.Segment,
+					commit_records_total=commit_records_total,
+					commit_milliseconds=commit_milliseconds
+				)
+
+				records_total = 1000
+				start_time = time.perf_counter()
+				for index in range(records_total):
+					stored_collection.append(
+						json_dict={"index": index, "name": f"name {index}"}
+					)
+				print(f"commit_records_total: {commit_records_total}, commit_milliseconds: {commit_milliseconds}: appends per second: {records_total / (time.perf_counter() - start_time)}")
+
+				stored_collection.dispose()
+
+			finally:
+				directory.cleanup()
+
+	def test_timing_process_all(self):
+
+		directory = tempfile.TemporaryDirectory()
+
+		try:
+			stored_collection = StoredCollection(
+				directory_path=directory.name,
+				storage_type=StoredCollectionStorageTypeEnum.Segment
+			)
+
+			stored_collection.append_many(
+				json_dicts=[{"index": index} for index in range(400)]
+			)
+
+			for workers_total, executor_type in [(1, ExecutorTypeEnum.Thread), (4, ExecutorTypeEnum.Thread), (4, ExecutorTypeEnum.Process)]:
+				start_time = time.perf_counter()
+				stored_collection.process_all(
+					process_slowly,
+					workers_total=workers_total,
+					executor_type=executor_type,
+					chunk_records_total=25
+				)
+				print(f"workers_total: {workers_total}, executor_type: {executor_type.value}: {time.perf_counter() - start_time} seconds")
+
+			stored_collection.dispose()
+
+		finally:
+			directory.cleanup()
+
+	def test_timing_codecs(self):
+
+		json_dicts = [{"index": index, "name": f"name {index}", "values": [index * 0.5, None, True, "text"], "child": {"key": "value", "other": index}} for index in range(10000)]
+
+		for codec_type in StoredCollectionCodecTypeEnum:
+
+			try:
+				codec = get_stored_collection_codec(
+					codec_type=codec_type
+				)
+			except StoredCollectionException:
+				print(f"{codec_type.value}: not installed")
+				continue
+
+			start_time = time.perf_counter()
+			records_bytes = [codec.encode(json_dict=json_dict) for json_dict in json_dicts]
+			encodes_per_second = len(json_dicts) / (time.perf_counter() - start_time)
+
+			start_time = time.perf_counter()
+			for record_bytes in records_bytes:
+				codec.decode(record_bytes=record_bytes)
+			decodes_per_second = len(json_dicts) / (time.perf_counter() - start_time)
+
+			print(f"{codec_type.value}: encodes per second: {encodes_per_second}, decodes per second: {decodes_per_second}, bytes: {sum(len(record_bytes) for record_bytes in records_bytes)}")
+
+	def test_timing_compression(self):
+
+		json_dicts = [{"index": index, "name": f"name {index}", "description": f"a record that describes item {index} in some detail", "tags": ["alpha", "beta", "gamma"]} for index in range(5000)]
+
+		for compression_type, compression_block_bytes_length in [(None, None), (StoredCollectionCompressionTypeEnum.Zlib, None), (StoredCollectionCompressionTypeEnum.Zlib, 2**16), (StoredCollectionCompressionTypeEnum.Lzma, 2**16), (StoredCollectionCompressionTypeEnum.Bz2, 2**16)]:
+
+			directory = tempfile.TemporaryDirectory()
+
+			try:
+				stored_collection = StoredCollection(
+					directory_path=directory.name,
+					storage_type=StoredCollectionStorageTypeEnum.Segment,
+					compression_type=compression_type,
+					compression_block_bytes_length=compression_block_bytes_length
+				)
+
+				start_time = time.perf_counter()
+				stored_collection.append_many(
+					json_dicts=json_dicts
+				)
+				stored_collection.commit()
+				writes_per_second = len(json_dicts) / (time.perf_counter() - start_time)
+
+				stored_collection.reset()
+				start_time = time.perf_counter()
+				while stored_collection.get() is not None:
+					pass
+				reads_per_second = len(json_dicts) / (time.perf_counter() - start_time)
+
+				segments_directory_path = os.path.join(directory.name, "segments")
+				bytes_length = sum(os.path.getsize(os.path.join(segments_directory_path, file_name)) for file_name in os.listdir(segments_directory_path))
+				uncompressed_bytes_length = sum(len(json.dumps(json_dict)) for json_dict in json_dicts)
+
+				print(f"compression_type: {None if compression_type is None else compression_type.value}, compression_block_bytes_length: {compression_block_bytes_length}: ratio: {uncompressed_bytes_length / bytes_length}, writes per second: {writes_per_second}, reads per second: {reads_per_second}")
+
+				stored_collection.dispose()
+
+			finally:
+				directory.cleanup()
+
+	def test_timing_secondary_index(self):
+
+		directory = tempfile.TemporaryDirectory()
+
+		try:
+			stored_collection = StoredCollection(
+				directory_path=directory.name,
+				storage_type=StoredCollectionStorageTypeEnum.Segment
+			)
+
+			stored_collection.add_secondary_index(
+				path=("user", "id")
+			)
+			stored_collection.append_many(
+				json_dicts=[{"index": index, "user": {"id": index % 1000}} for index in range(20000)]
+			)
+
+			start_time = time.perf_counter()
+			for user_id in range(100):
+				stored_collection.find(
+					path=("user", "id"),
+					value=user_id
+				)
+			print(f"indexed find: {(time.perf_counter() - start_time) / 100} seconds")
+
+			start_time = time.perf_counter()
+			stored_collection.reset()
+			json_dict = stored_collection.get()
+			while json_dict is not None:
+				json_dict = stored_collection.get()
+			print(f"full scan: {time.perf_counter() - start_time} seconds")
+
+			stored_collection.dispose()
+
+		finally:
+			directory.cleanup()
+
+	def test_timing_reopen(self):
+
+		directory = tempfile.TemporaryDirectory()
+
+		try:
+			stored_collection = StoredCollection(
+				directory_path=directory.name,
+				storage_type=StoredCollectionStorageTypeEnum.Segment
+			)
+
+			stored_collection.append_many(
+				json_dicts=[{"index": index} for index in range(50000)]
+			)
+
+			stored_collection.reset()
+			for _ in range(1000):
+				stored_collection.try_process(lambda json_dict: {"index": json_dict["index"], "is_processed": True})
+
+			stored_collection.dispose()
+
+			start_time = time.perf_counter()
+			stored_collection = StoredCollection(
+				directory_path=directory.name
+			)
+			print(f"reopen after checkpoint: {time.perf_counter() - start_time} seconds")
+
+			stored_collection.dispose()
+
+			os.remove(os.path.join(directory.name, ".checkpoint"))
+
+			start_time = time.perf_counter()
+			stored_collection = StoredCollection(
+				directory_path=directory.name
+			)
+			print(f"reopen without checkpoint: {time.perf_counter() - start_time} seconds")
+
+			stored_collection.dispose()
+
+		finally:
+			directory.cleanup()
+
+	def test_timing_reader(self):
+
+		directory = tempfile.TemporaryDirectory()
+
+		try:
+			stored_collection = StoredCollection(
+				directory_path=directory.name,
+				storage_type=StoredCollectionStorageTypeEnum.Segment,
+				compression_type=StoredCollectionCompressionTypeEnum.Zlib
+			)
+
+			stored_collection.append_many(
+				json_dicts=[{"index": index, "text": "text " * 20} for index in range(20000)]
+			)
+
+			for workers_total in [1, 4]:
+				reader = stored_collection.reader()
+				start_time = time.perf_counter()
+				with ThreadPoolExecutor(max_workers=workers_total) as executor:
+					for _ in executor.map(lambda offset: reader[offset::workers_total], range(workers_total)):
+						pass
+				print(f"reader scan with {workers_total} threads: {time.perf_counter() - start_time} seconds")
+				reader.dispose()
+
+			stored_collection.dispose()
+
+		finally:
+			directory.cleanup()
+
+	def test_timing_compact(self):
+
+		for storage_type in StoredCollectionStorageTypeEnum:
+
+			directory = tempfile.TemporaryDirectory()
+
+			try:
+				stored_collection = StoredCollection(
+					directory_path=directory.name,
+					storage_type=storage_type
+				)
+
+				stored_collection.append_many(
+					json_dicts=[{"index": index, "text": "text " * 20} for index in range(5000)]
+				)
+				for index in range(0, 5000, 2):
+					stored_collection.delete(
+						index=index
+					)
+
+				stored_collection_compaction = stored_collection.compact()
+				print(f"{storage_type.value} compaction: {stored_collection_compaction.get_elapsed_seconds()} seconds, {stored_collection_compaction.get_records_per_second()} records per second, {stored_collection_compaction.get_bytes_per_second()} bytes per second, {stored_collection_compaction.get_reclaimed_bytes_length()} bytes reclaimed")
+
+				stored_collection.dispose()
+
+			finally:
+				directory.cleanup()